@@ -100,6 +100,16 @@ DATABASES = {
     )
 }
 
+# --- CACHE ---
+# Pakai tabel database supaya cache dibagi ke semua worker gunicorn
+# (tabelnya dibuat lewat migrasi sistem 0002)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'mmds_cache',
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -159,6 +169,16 @@ STORAGES = {
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Kompres foto nota/transfer di thread latar belakang (operasional/antrean.py)
+# Set GAMBAR_ASYNC=False untuk memproses langsung setelah commit
+GAMBAR_ASYNC = os.getenv('GAMBAR_ASYNC', 'True') == 'True'
+GAMBAR_WORKER = int(os.getenv('GAMBAR_WORKER', '2'))
+
+# Stream KPI dashboard (operasional/siaran.py) hanya jalan di mode ASGI. Di WSGI
+# feed perubahannya tidak ditulis sama sekali. Set STREAM_KPI=True/False untuk
+# memaksa, mis. proses worker yang berbagi database dengan web ASGI.
+STREAM_KPI = os.getenv('STREAM_KPI', str(os.getenv('MODE_SERVER') == 'asgi')) == 'True'
+
 JAZZMIN_SETTINGS = {
     "site_title": "Dayung Sari",
     "site_header": "Dayung Sari",
@@ -19,12 +19,17 @@ from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect # buka langsung ke admin
+from operasional.admin import dashboard_hari_ini, stream_kpi_view
+from operasional.asinkron import admin_view_async
 
 def redirect_to_admin(request):
     return redirect('admin/')
 
 urlpatterns = [
     path('', redirect_to_admin), # Ini akan mengarahkan halaman kosong ke admin
+    # Dashboard "Hari Ini" (view async) menggantikan halaman index admin
+    path('admin/', admin_view_async(admin.site, dashboard_hari_ini), name='dashboard_hari_ini'),
+    path('admin/stream-kpi/', admin_view_async(admin.site, stream_kpi_view), name='stream_kpi'),
     path('admin/', admin.site.urls),
 ]
 
@@ -1,44 +1,81 @@
+from django.conf import settings
 from django.contrib import admin
-from django.db.models import Q, Sum, Count, FloatField, ExpressionWrapper
-from django.shortcuts import render
+from django.core.exceptions import PermissionDenied
+import json
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.urls import path, reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
 from django.template.response import TemplateResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.utils.safestring import mark_safe
-from .models import LHCabang, DetailLH, PengeluaranLH, SetorPusat, RekapLaporan
-from perusahaan.models import Karyawan
+from .asinkron import admin_view_async
+from .dashboard import akpi_hari_ini
+from .ekspor import HEADER_DETAIL, HEADER_REKAP, baris_detail, baris_rekap, respons_ekspor
+from .forms import DetailLHFormSet, MitraAutocomplete, PengeluaranFormSet, PilihanBersamaField, PilihanBersamaForm
+from .kiriman import kirim_laporan
+from .models import LHCabang, DetailLH, PengeluaranLH, SetorPusat, RekapLaporan, PeriodeGaji, SlipGaji
+from .pilihan import PERAN_JENIS, acari_mitra, pilihan_mitra
+from .rekap import arekap_tersimpan, astatistik_cache_rekap, rekap_tersimpan
+from .ringkasan import anotasi_ringkasan, ambil_ringkasan, tunda_ringkasan
+from .siaran import buka_stream
+from perusahaan.akses import saring_cabang
+from perusahaan.models import Cabang, Karyawan
 
-def dashboard_hari_ini(request, extra_context=None):
+async def dashboard_hari_ini(request, extra_context=None):
     hari_ini = timezone.localtime(timezone.now()).date()
-    
-    laporan_induk = LHCabang.objects.filter(tanggal=hari_ini)
-    if not request.user.is_superuser:
-        laporan_induk = laporan_induk.filter(cabang__kepala_cabang__user=request.user)
-    
-    detail_laporan = DetailLH.objects.filter(
-        laporan_induk__in=laporan_induk, 
-        status_kehadiran='H'
-    )
-    
-    context = {
-        **admin.site.each_context(request), # Ambil context asli admin secara manual
-        'title': 'Hari Ini',
-        'total_cabang': laporan_induk.count(),
-        'total_karyawan': detail_laporan.count(),
-        'total_omzet': detail_laporan.aggregate(total=Sum('omzet_bruto_rp'))['total'] or 0,
-        'total_minus': detail_laporan.filter(selisih_rp__lt=0).count(),
-    }
+
+    context_admin = await sync_to_async(admin.site.each_context)(request) # Ambil context asli admin secara manual
+    # 1 query agregat, lalu di-cache per tanggal & user (operasional/dashboard.py)
+    kpi = await akpi_hari_ini(hari_ini, request.user)
+    context = {**context_admin, 'title': 'Hari Ini', **kpi}
     
     if extra_context:
         context.update(extra_context)
     
-    # Gunakan TemplateResponse langsung ke index.html
+    # Gunakan TemplateResponse langsung ke index.html (dirender Django di thread sync)
     return TemplateResponse(request, "admin/index.html", context)
 
-# Tetap gunakan ini untuk menimpa halaman utama
-admin.site.index = dashboard_hari_ini
+# Halaman utama admin menimpa /admin/ lewat mmds_project/urls.py (view async,
+# admin.site.index bawaan hanya bisa membungkus view sync)
+
+async def stream_kpi_view(request):
+    # Server-sent events untuk kartu KPI dashboard (operasional/siaran.py)
+    if not settings.STREAM_KPI or not isinstance(request, ASGIRequest):
+        # Di WSGI stream async dibaca habis dulu sebelum dikirim (dan feed tidak
+        # ditulis); 204 = EventSource berhenti
+        return HttpResponse(status=204)
+    hari_ini = timezone.localtime(timezone.now()).date()
+    aliran = await buka_stream(request.user, hari_ini, request.headers.get('Last-Event-ID'))
+    if aliran is None:
+        return HttpResponse("Terlalu banyak koneksi dashboard.", status=503, headers={'Retry-After': '30'})
+    response = StreamingHttpResponse(aliran, content_type='text/event-stream')
+    response['X-Accel-Buffering'] = 'no'  # nginx: jangan tahan event di buffer
+    return response
+
+def widget_mitra(db_field, request, admin_site, jenis):
+    # Field mitra: autocomplete ke endpoint cari mitra, pilihan sama dengan validasinya
+    resolved = request.resolver_match
+    laporan_id = resolved.kwargs.get('object_id') if resolved else None
+    params = {'jenis': jenis}
+    if laporan_id:
+        params['laporan'] = laporan_id
+    url = reverse('admin:operasional_lhcabang_cari_mitra', current_app=admin_site.name)
+    return {
+        'form_class': PilihanBersamaField,
+        'queryset': pilihan_mitra(request.user, jenis, laporan_id),
+        'peran': PERAN_JENIS[jenis],
+        'widget': MitraAutocomplete(db_field, admin_site, url=f"{url}?{urlencode(params)}"),
+    }
 
 class DetailLHInline(admin.TabularInline):     
     model = DetailLH
+    form = PilihanBersamaForm
+    formset = DetailLHFormSet # validasi & simpan semua baris sekaligus
     extra = 7
     max_num = 7
 
@@ -51,16 +88,10 @@ class DetailLHInline(admin.TabularInline):
         'display_omzet', 'display_selisih')
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
-        if db_field.name == "mitra" and not request.user.is_superuser:
-            # SUPER KETAT:
-            # 1. Harus Mitra
-            # 2. Harus Aktif
-            # 3. Harus yang bertugas di cabang yang dipimpin oleh user login
-            kwargs["queryset"] = Karyawan.objects.filter(
-                jabatan__icontains='mitra',
-                status='AKTIF',
-                cabang_tugas__kepala_cabang__user=request.user
-            )
+        if db_field.name == "mitra":
+            # SUPER KETAT (untuk kacab): harus Mitra, Aktif, dan bertugas di cabangnya.
+            # Pilihan dicari lewat autocomplete, lihat operasional/pilihan.py
+            kwargs.update(widget_mitra(db_field, request, self.admin_site, 'detail'))
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
     # semua display di bawah ini, datanya kita ambil langsung dari field database
@@ -98,64 +129,47 @@ class DetailLHInline(admin.TabularInline):
     
 class PengeluaranInline(admin.TabularInline):
     model = PengeluaranLH
+    form = PilihanBersamaForm
+    formset = PengeluaranFormSet
     extra = 1
-    fields = ('kategori', 'mitra', 'item', 'nominal', 'bukti_nota')
+    fields = ('kategori', 'mitra', 'item', 'nominal', 'bukti_nota', 'status_gambar')
+    readonly_fields = ('status_gambar',)
 
     # Bonus dan Kasbon hanya boleh dari mitra dan kacab yang bertugas
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "mitra":
-            resolved = request.resolver_match
-            if resolved and 'object_id' in resolved.kwargs:
-                laporan_id = resolved.kwargs['object_id']
-                laporan = LHCabang.objects.get(pk=laporan_id)
-
-                # Kita ambil Kacab yang terdaftar di tabel Cabang perusahaan
-                kacab_cabang = laporan.cabang.kepala_cabang 
-                
-                # Ambil semua Mitra yang bertugas di tabel atas
-                id_mitra_bertugas = DetailLH.objects.filter(
-                    laporan_induk=laporan
-                ).values_list('mitra_id', flat=True)
-                
-                # Filter: Hanya Mitra hari itu DAN Kacab pemilik cabang tersebut
-                kwargs["queryset"] = Karyawan.objects.filter(
-                    Q(id_staff__in=id_mitra_bertugas) | 
-                    Q(id_staff=kacab_cabang.id_staff if kacab_cabang else None)
-                ).distinct()
-            else:
-                kwargs["queryset"] = Karyawan.objects.none()                
+            kwargs.update(widget_mitra(db_field, request, self.admin_site, 'pengeluaran'))
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 class SetorPusatInline(admin.StackedInline):
     model = SetorPusat
     extra = 1
     max_num = 1
-    readonly_fields = ('display_cash', 'display_pengeluaran', 'display_wajib_setor')
-    fields = ('display_cash', 'display_pengeluaran', 'display_wajib_setor', 'bukti_transfer')
+    readonly_fields = ('display_cash', 'display_pengeluaran', 'display_wajib_setor', 'status_gambar')
+    fields = ('display_cash', 'display_pengeluaran', 'display_wajib_setor', 'bukti_transfer', 'status_gambar')
 
-    def display_cash(self, obj):
+    def _ringkasan(self, obj):
         # Ambil laporannya langsung dari parent (induk) yang sedang dibuka
         # obj.laporan_induk bekerja baik saat EDIT maupun saat baru mau ADD
         induk = obj.laporan_induk if hasattr(obj, 'laporan_induk') else None
-        if not induk: return "Rp 0"
-        
-        total = induk.detail_lh.aggregate(Sum('cash_diterima'))['cash_diterima__sum'] or 0
-        return f"Rp {total:,}"
+        if not induk or not induk.pk: return None
+        # Satu baris RingkasanLH, di-cache di induk untuk ketiga kolom
+        return ambil_ringkasan(induk)
+
+    def display_cash(self, obj):
+        ringkasan = self._ringkasan(obj)
+        if not ringkasan: return "Rp 0"
+        return f"Rp {ringkasan.total_cash:,}"
 
     def display_pengeluaran(self, obj):
-        induk = obj.laporan_induk if hasattr(obj, 'laporan_induk') else None
-        if not induk: return "Rp 0"
-        
-        total = induk.pengeluaran_op.aggregate(Sum('nominal'))['nominal__sum'] or 0
-        return f"Rp {total:,}"
+        ringkasan = self._ringkasan(obj)
+        if not ringkasan: return "Rp 0"
+        return f"Rp {ringkasan.total_pengeluaran:,}"
 
     def display_wajib_setor(self, obj):
-        induk = obj.laporan_induk if hasattr(obj, 'laporan_induk') else None
-        if not induk: return "Rp 0"
-
-        cash = induk.detail_lh.aggregate(Sum('cash_diterima'))['cash_diterima__sum'] or 0
-        keluar = induk.pengeluaran_op.aggregate(Sum('nominal'))['nominal__sum'] or 0
-        nilai = cash - keluar
+        ringkasan = self._ringkasan(obj)
+        if not ringkasan: return "Rp 0"
+        nilai = ringkasan.wajib_setor
         
         return mark_safe(f"""
             <div style="margin: 5px 0;">
@@ -172,23 +186,79 @@ class SetorPusatInline(admin.StackedInline):
         """)
     display_wajib_setor.short_description = "JUMLAH TRANSFER"
 
+class SetorFilter(admin.SimpleListFilter):
+    title = "status setor"
+    parameter_name = 'setor'
+
+    def lookups(self, request, model_admin):
+        return (('sudah', "Sudah setor"), ('belum', "Belum setor"))
+
+    def queryset(self, request, queryset):
+        if self.value() in ('sudah', 'belum'):
+            return queryset.filter(sudah_setor=self.value() == 'sudah')
+        return queryset
+
+class MinusFilter(admin.SimpleListFilter):
+    title = "mitra minus"
+    parameter_name = 'minus'
+
+    def lookups(self, request, model_admin):
+        return (('ada', "Ada yang minus"), ('tidak', "Tidak ada"))
+
+    def queryset(self, request, queryset):
+        if self.value() == 'ada':
+            return queryset.filter(jumlah_minus__gt=0)
+        if self.value() == 'tidak':
+            return queryset.filter(jumlah_minus=0)
+        return queryset
+
 @admin.register(LHCabang)
 class LHCabangAdmin(admin.ModelAdmin):
-    list_display = ('tanggal', 'cabang', 'dibuat_oleh')
+    list_display = (
+        'tanggal', 'cabang', 'dibuat_oleh', 'display_omzet', 'display_cash',
+        'display_pengeluaran', 'display_setor', 'display_minus',
+    )
+    list_select_related = ('cabang', 'dibuat_oleh')
+    list_filter = (SetorFilter, MinusFilter, ('cabang', admin.RelatedOnlyFieldListFilter))
+    date_hierarchy = 'tanggal'
+    ordering = ('-tanggal', 'cabang')
+    show_full_result_count = False  # hemat satu COUNT(*) seluruh tabel saat memfilter
     inlines = [DetailLHInline, PengeluaranInline, SetorPusatInline]
 
     # 1. KETAT: Hanya lihat laporan cabang miliknya
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        if request.user.is_superuser: 
-            return qs
-        return qs.filter(cabang__kepala_cabang__user=request.user)
+        # kode cabang user dihitung sekali per request (perusahaan/akses.py)
+        # total per baris ikut di query yang sama (operasional/ringkasan.py)
+        return anotasi_ringkasan(saring_cabang(qs, request.user))
+
+    # kolom daftar, datanya dari anotasi get_queryset
+    @admin.display(description="Omzet", ordering='total_omzet')
+    def display_omzet(self, obj):
+        return f"Rp {obj.total_omzet:,}"
+
+    @admin.display(description="Cash", ordering='total_cash')
+    def display_cash(self, obj):
+        return f"Rp {obj.total_cash:,}"
+
+    @admin.display(description="Pengeluaran", ordering='total_pengeluaran')
+    def display_pengeluaran(self, obj):
+        return f"Rp {obj.total_pengeluaran:,}"
+
+    @admin.display(description="Setor", boolean=True, ordering='sudah_setor')
+    def display_setor(self, obj):
+        return obj.sudah_setor
+
+    @admin.display(description="Mitra Minus", ordering='jumlah_minus')
+    def display_minus(self, obj):
+        if obj.jumlah_minus:
+            return mark_safe(f'<b style="color: red">{obj.jumlah_minus}</b>')
+        return 0
 
     # 2. KETAT: Saat klik "Add", hanya muncul cabang miliknya di pilihan
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "cabang" and not request.user.is_superuser:
-            from perusahaan.models import Cabang
-            kwargs["queryset"] = Cabang.objects.filter(kepala_cabang__user=request.user)
+            kwargs["queryset"] = saring_cabang(Cabang.objects.all(), request.user, 'kode_cabang')
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
     # 3. OTOMATIS: Catat siapa yang login (ID Staff)
@@ -197,46 +267,153 @@ class LHCabangAdmin(admin.ModelAdmin):
             obj.dibuat_oleh = request.user
         super().save_model(request, obj, form, change)    
 
+    # 4. Ringkasan laporan dihitung sekali setelah semua inline tersimpan
+    def save_related(self, request, form, formsets, change):
+        with tunda_ringkasan():
+            super().save_related(request, form, formsets, change)
+
+    # 5. EKSPOR: Data mentah harian (CSV/XLSX), ikut batasan cabang di get_queryset
+    def get_urls(self):
+        urls = [
+            path('ekspor/', self.admin_site.admin_view(self.ekspor_view), name='operasional_lhcabang_ekspor'),
+            path('cari-mitra/', admin_view_async(self.admin_site, self.cari_mitra_view), name='operasional_lhcabang_cari_mitra'),
+            path('kirim/', self.admin_site.admin_view(self.kirim_view), name='operasional_lhcabang_kirim'),
+        ]
+        return urls + super().get_urls()
+
+    def ekspor_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        detail = DetailLH.objects.filter(laporan_induk__in=self.get_queryset(request))
+        dari, sampai = request.GET.get('dari'), request.GET.get('sampai')
+        for nama, nilai in (('dari', dari), ('sampai', sampai)):
+            try:
+                valid = not nilai or parse_date(nilai) is not None
+            except ValueError:  # format benar tapi tanggalnya tidak ada, mis. 2026-02-30
+                valid = False
+            if not valid:
+                return HttpResponseBadRequest(f"Tanggal '{nama}' tidak valid, pakai format YYYY-MM-DD.")
+        if dari:
+            detail = detail.filter(laporan_induk__tanggal__gte=dari)
+        if sampai:
+            detail = detail.filter(laporan_induk__tanggal__lte=sampai)
+        nama = f"laporan_harian_{dari or 'awal'}_{sampai or timezone.localdate()}"
+        return respons_ekspor(
+            request, nama, HEADER_DETAIL, baris_detail(detail), request.GET.get('format'), 'Laporan Harian',
+        )
+
+    # 6. AUTOCOMPLETE: JSON pencarian mitra untuk inline (format select2)
+    async def cari_mitra_view(self, request):
+        if not await sync_to_async(self.has_view_permission)(request):
+            raise PermissionDenied
+        try:
+            halaman = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            halaman = 1
+        hasil = await acari_mitra(
+            request.user, request.GET.get('jenis', 'detail'), request.GET.get('laporan'),
+            request.GET.get('term', ''), halaman,
+        )
+        respons = JsonResponse(hasil)
+        patch_cache_control(respons, private=True, max_age=30)
+        return respons
+
+    # 7. KIRIM: satu laporan harian lengkap dalam satu POST JSON (operasional/kiriman.py)
+    def kirim_view(self, request):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        kunci = request.headers.get('Idempotency-Key', '').strip()
+        if not kunci or len(kunci) > 64:
+            return JsonResponse({'errors': {'__all__': [
+                {'message': "Header Idempotency-Key wajib diisi (maksimal 64 karakter).", 'code': 'kunci_wajib'},
+            ]}}, status=400)
+        # JSON biasa, atau multipart (field `data` + file foto)
+        if request.content_type == 'multipart/form-data':
+            mentah, berkas = request.POST.get('data', ''), request.FILES
+        else:
+            mentah, berkas = request.body, {}
+        try:
+            isi = json.loads(mentah)
+        except ValueError:
+            return JsonResponse({'errors': {'__all__': [
+                {'message': "Isi kiriman bukan JSON yang valid.", 'code': 'invalid'},
+            ]}}, status=400)
+        status, hasil, ulangan = kirim_laporan(
+            request.user, isi, berkas, kunci, boleh_ubah=self.has_change_permission(request),
+        )
+        respons = JsonResponse(hasil, status=status)
+        if ulangan:
+            respons['Idempotent-Replayed'] = 'true'
+        return respons
+
 @admin.register(RekapLaporan)
 class RekapLaporanAdmin(admin.ModelAdmin):
-    def changelist_view(self, request, extra_context=None):
+    # View async (mode ASGI), lihat operasional/asinkron.py
+    async def changelist_view(self, request, extra_context=None):
         # Ambil input tanggal dari form
         tgl_mulai = request.GET.get('dari')
         tgl_selesai = request.GET.get('sampai')
-        hasil = None # jika tgl belum dipilih, maka data kosong
 
+        context_admin = await sync_to_async(self.admin_site.each_context)(request)
+        hasil = None # jika tgl belum dipilih, maka data kosong
         if tgl_mulai and tgl_selesai:
-            data_lh = DetailLH.objects.filter(laporan_induk__tanggal__range=[tgl_mulai, tgl_selesai])
-    
-            if not request.user.is_superuser:
-                data_lh = data_lh.filter(laporan_induk__cabang__kepala_cabang__user=request.user)
-
-            # Menghitung Rekap per Mitra
-            rekap_mitra = data_lh.values('mitra__nama_lengkap').annotate(
-                total_jam=ExpressionWrapper(
-                    Sum('durasi_kerja') / 60.0, 
-                    output_field=FloatField()
-                ),
-                total_minus=Sum('selisih_rp', filter=Q(selisih_rp__lt=0)),
-                total_omset=Sum('omzet_bruto_rp'),
-                kehadiran=Count('id')
-            ).order_by('-total_jam')
-
-            rekap_cabang = data_lh.values('laporan_induk__cabang__nama_cabang').annotate(
-                jumlah_berangkat=Count('id')
-            ).order_by('-jumlah_berangkat')
-
-            hasil = {
-                'rekap_mitra': rekap_mitra,
-                'rekap_cabang': rekap_cabang,
-            }
-
+            # Dibaca dari tabel rollup harian, hasilnya di-cache per rentang (operasional/rekap.py)
+            hasil = await arekap_tersimpan(tgl_mulai, tgl_selesai, request.user)
+        statistik = await astatistik_cache_rekap() if request.user.is_superuser else None
         context = {
-            **self.admin_site.each_context(request), 
+            **context_admin,
             'title': "Evaluasi Kinerja Mitra",
             'hasil': hasil, # Langsung kirim dictionary hasil yang sudah lengkap
             'tgl_mulai': tgl_mulai,
             'tgl_selesai': tgl_selesai,
+            'statistik_cache': statistik,
         }
 
-        return render(request, 'admin/rekap_dashboard.html', context)
\ No newline at end of file
+        return TemplateResponse(request, 'admin/rekap_dashboard.html', context)
+
+    def get_urls(self):
+        urls = [
+            # Menimpa changelist bawaan: wrapper ModelAdmin hanya untuk view sync
+            path('', admin_view_async(self.admin_site, self.changelist_view), name='operasional_rekaplaporan_changelist'),
+            path('ekspor/', self.admin_site.admin_view(self.ekspor_view), name='operasional_rekaplaporan_ekspor'),
+        ]
+        return urls + super().get_urls()
+
+    def ekspor_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        tgl_mulai = request.GET.get('dari')
+        tgl_selesai = request.GET.get('sampai')
+        hasil = rekap_tersimpan(tgl_mulai, tgl_selesai, request.user)
+        if hasil is None:
+            return redirect('admin:operasional_rekaplaporan_changelist')
+        return respons_ekspor(
+            request, f"rekap_mitra_{tgl_mulai}_{tgl_selesai}", HEADER_REKAP, baris_rekap(hasil['rekap_mitra']),
+            request.GET.get('format'), 'Rekap Mitra',
+        )
+
+# --- PENGGAJIAN ---
+# Slip dibuat/diperbarui lewat `manage.py proses_gaji --bulan YYYY-MM` (operasional/gaji.py)
+@admin.register(PeriodeGaji)
+class PeriodeGajiAdmin(admin.ModelAdmin):
+    list_display = ('bulan', 'status', 'diproses_pada')
+    list_filter = ('status',)
+
+@admin.register(SlipGaji)
+class SlipGajiAdmin(admin.ModelAdmin):
+    list_display = (
+        'periode', 'karyawan', 'cabang', 'jumlah_hadir', 'jumlah_alfa', 'gaji_pokok',
+        'insentif_kehadiran', 'bonus', 'potongan_kasbon', 'total',
+    )
+    list_filter = ('periode', ('cabang', admin.RelatedOnlyFieldListFilter))
+    list_select_related = ('periode', 'karyawan', 'cabang')
+    search_fields = ('karyawan__id_staff', 'karyawan__nama_lengkap')
+    readonly_fields = [f.name for f in SlipGaji._meta.fields]
+
+    def get_queryset(self, request):
+        return saring_cabang(super().get_queryset(request), request.user)
+
+    def has_add_permission(self, request):
+        return False
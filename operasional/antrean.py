@@ -0,0 +1,79 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from .gambar import MENUNGGU, PROSES, SELESAI, GAGAL, olah_gambar
+
+logger = logging.getLogger(__name__)
+
+# Antrean foto: file mentah disimpan dulu saat form disubmit, lalu kompres +
+# thumbnail dikerjakan thread terpisah supaya response admin tidak menunggu.
+# Status di database (status_gambar) sekaligus jadi antrean cadangan:
+# kalau worker mati sebelum selesai, `manage.py proses_gambar` akan menghabiskannya.
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'GAMBAR_WORKER', 2),
+            thread_name_prefix='gambar',
+        )
+    return _pool
+
+
+def antrekan_gambar(obj):
+    model, pk = type(obj), obj.pk
+
+    def _kirim():
+        if getattr(settings, 'GAMBAR_ASYNC', True):
+            _get_pool().submit(_jalankan, model, pk)
+        else:
+            proses_gambar(model, pk)
+
+    # Tunggu commit, kalau tidak thread bisa membaca baris yang belum ada
+    transaction.on_commit(_kirim)
+
+
+def _jalankan(model, pk):
+    try:
+        proses_gambar(model, pk)
+    finally:
+        # Thread pool punya koneksi DB sendiri, tutup supaya tidak bocor
+        close_old_connections()
+
+
+def proses_gambar(model, pk):
+    # Klaim baris dulu, supaya satu foto tidak diproses dua worker sekaligus
+    diklaim = model.objects.filter(pk=pk, status_gambar=MENUNGGU).update(status_gambar=PROSES)
+    if not diklaim:
+        return False
+
+    obj = model.objects.get(pk=pk)
+    berkas = getattr(obj, model.FIELD_GAMBAR)
+    thumbnail = getattr(obj, model.FIELD_THUMBNAIL)
+    nama_mentah = berkas.name
+    thumbnail_lama = thumbnail.name  # milik foto sebelumnya kalau fotonya diganti
+    try:
+        with berkas.open('rb'):
+            hasil, kecil = olah_gambar(berkas)
+        berkas.save(hasil.name, hasil, save=False)
+        thumbnail.save(kecil.name, kecil, save=False)
+    except Exception:
+        logger.exception("Gagal memproses foto %s #%s", model.__name__, pk)
+        model.objects.filter(pk=pk).update(status_gambar=GAGAL)
+        return False
+
+    # Pakai update() agar save() model (dan antrean) tidak terpicu lagi
+    model.objects.filter(pk=pk).update(**{
+        model.FIELD_GAMBAR: berkas.name,
+        model.FIELD_THUMBNAIL: thumbnail.name,
+        'status_gambar': SELESAI,
+    })
+    # Storage yang menimpa berkas bisa memberi nama yang sama: jangan hapus hasil kompres
+    if berkas.name != nama_mentah:
+        berkas.storage.delete(nama_mentah)
+    if thumbnail_lama and thumbnail_lama != thumbnail.name:
+        thumbnail.storage.delete(thumbnail_lama)
+    return True
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class OperasionalConfig(AppConfig):
     name = 'operasional'
-    verbose_name = 'OPERASIONAL'
\ No newline at end of file
+    verbose_name = 'OPERASIONAL'
+
+    def ready(self):
+        from . import signals  # noqa: F401 jaga ringkasan laporan tetap terkini
\ No newline at end of file
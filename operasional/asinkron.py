@@ -0,0 +1,33 @@
+from functools import update_wrapper
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.urls import reverse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_protect
+from perusahaan.akses import cabang_diizinkan
+
+# View admin async untuk mode ASGI (uvicorn, lihat README). admin_view bawaan
+# Django hanya bisa membungkus view sync, jadi cek login & izin staf untuk view
+# async dibuat di sini. Di dalam view async semua akses database lewat ORM async
+# (aaggregate, async for, cache.aget) atau sync_to_async. Cabang milik user diisi
+# dulu di sini, jadi saring_cabang/cakupan setelahnya tidak menyentuh database.
+# ORM async & sync_to_async menjalankan query di satu thread sync per request
+# (thread_sensitive), jadi asyncio.gather tidak membuat query berjalan paralel;
+# view di sini cukup memanggilnya berurutan.
+
+
+def admin_view_async(admin_site, view, cacheable=False):
+    async def inner(request, *args, **kwargs):
+        request.user = await request.auser()
+        if not admin_site.has_permission(request):
+            return redirect_to_login(
+                request.get_full_path(), reverse('admin:login', current_app=admin_site.name),
+            )
+        await sync_to_async(cabang_diizinkan)(request.user)
+        return await view(request, *args, **kwargs)
+
+    if not cacheable:
+        inner = never_cache(inner)
+    if not getattr(view, 'csrf_exempt', False):
+        inner = csrf_protect(inner)
+    return update_wrapper(inner, view)
@@ -0,0 +1,119 @@
+import datetime
+from bisect import bisect_right
+from collections import defaultdict
+from django.db import transaction
+from sistem.aturan import get_aturan
+
+# Bonus pekanan dari tier di Aturan Perusahaan (TierBonusMitra / TierBonusCabang).
+# Satu pekan = Senin s/d Minggu. Semua DetailLH sepekan diambil dengan satu query,
+# tier dicari dengan bisect di ambang yang sudah terurut (sistem/aturan.py).
+# Tier yang dipakai adalah versi aturan yang berlaku di hari terakhir pekan.
+#   - Mitra : rata-rata omzet per hari hadir >= min_omset_harian
+#   - Cabang: rata-rata mitra berangkat (hadir) per hari laporan >= min_mitra_berangkat,
+#             dibayarkan ke kepala cabang
+# Hasilnya draft (list dict) untuk dicek dulu, lalu diposting sebagai PengeluaranLH
+# kategori BONUS di laporan terakhir cabangnya pada pekan itu.
+
+
+def awal_pekan(tanggal):
+    return tanggal - datetime.timedelta(days=tanggal.weekday())
+
+
+def nama_pekan(mulai):
+    tahun, pekan, _ = mulai.isocalendar()
+    return f"{tahun}-W{pekan:02d}"
+
+
+def _cari_tier(tier, nilai):
+    # tier: ((ambang, nominal), ...) terurut naik; ambil tier tertinggi yang terlewati
+    if not tier:
+        return 0
+    ambang = [t[0] for t in tier]
+    posisi = bisect_right(ambang, nilai)
+    return int(round(tier[posisi - 1][1])) if posisi else 0
+
+
+def hitung_bonus(tanggal):
+    from perusahaan.models import Cabang
+    from .models import DetailLH
+
+    mulai = awal_pekan(tanggal)
+    selesai = mulai + datetime.timedelta(days=6)
+    aturan = get_aturan(selesai)  # tier yang berlaku di akhir pekan
+    pekan = nama_pekan(mulai)
+
+    baris = DetailLH.objects.filter(
+        laporan_induk__tanggal__range=(mulai, selesai),
+    ).values_list(
+        'laporan_induk_id', 'laporan_induk__tanggal', 'laporan_induk__cabang_id',
+        'mitra_id', 'mitra__nama_lengkap', 'status_kehadiran', 'omzet_bruto_rp',
+    )
+
+    mitra = {}  # id -> data
+    hadir_harian = defaultdict(lambda: defaultdict(int))  # cabang -> tanggal -> jumlah hadir
+    laporan_terakhir = {}  # cabang -> (tanggal, laporan_id)
+    for laporan_id, tgl, cabang_id, mitra_id, nama, status, omzet in baris.iterator():
+        data = mitra.setdefault(mitra_id, {
+            'nama': nama, 'hari_hadir': 0, 'omzet': 0, 'cabang': cabang_id, 'tanggal_terakhir': tgl,
+        })
+        if status == 'H':
+            data['hari_hadir'] += 1
+            data['omzet'] += omzet
+            hadir_harian[cabang_id][tgl] += 1
+        else:
+            hadir_harian[cabang_id].setdefault(tgl, 0)
+        if tgl >= data['tanggal_terakhir']:
+            data['cabang'], data['tanggal_terakhir'] = cabang_id, tgl
+        if cabang_id not in laporan_terakhir or tgl > laporan_terakhir[cabang_id][0]:
+            laporan_terakhir[cabang_id] = (tgl, laporan_id)
+
+    draft_mitra = []
+    for mitra_id, data in sorted(mitra.items()):
+        rata = data['omzet'] / data['hari_hadir'] if data['hari_hadir'] else 0
+        nominal = _cari_tier(aturan['tier_mitra'], rata)
+        if nominal:
+            draft_mitra.append({
+                'jenis': 'mitra', 'mitra': mitra_id, 'nama': data['nama'], 'cabang': data['cabang'],
+                'laporan': laporan_terakhir[data['cabang']][1], 'dasar': round(rata),
+                'hari': data['hari_hadir'], 'nominal': nominal, 'item': f"Bonus Pekanan {pekan}",
+            })
+
+    kepala = dict(Cabang.objects.filter(pk__in=hadir_harian).values_list('pk', 'kepala_cabang_id'))
+    draft_cabang = []
+    for cabang_id, per_hari in sorted(hadir_harian.items()):
+        rata = sum(per_hari.values()) / len(per_hari)
+        nominal = _cari_tier(aturan['tier_cabang'], rata)
+        if nominal:
+            draft_cabang.append({
+                'jenis': 'cabang', 'mitra': kepala.get(cabang_id), 'nama': cabang_id, 'cabang': cabang_id,
+                'laporan': laporan_terakhir[cabang_id][1], 'dasar': round(rata, 1),
+                'hari': len(per_hari), 'nominal': nominal, 'item': f"Bonus Cabang {pekan}",
+            })
+
+    return {'mulai': mulai, 'selesai': selesai, 'pekan': pekan, 'baris': draft_mitra + draft_cabang}
+
+
+def posting_bonus(draft):
+    # Idempoten: baris yang sudah pernah diposting (item + mitra/laporan sama) dilewati
+    from .models import PengeluaranLH
+    from .ringkasan import tandai_berubah, tunda_ringkasan
+
+    item = {b['item'] for b in draft['baris']}
+    sudah = set(PengeluaranLH.objects.filter(
+        kategori='BONUS', item__in=item,
+        laporan_induk__tanggal__range=(draft['mulai'], draft['selesai']),
+    ).values_list('item', 'mitra_id', 'laporan_induk__cabang_id'))
+
+    baru = [
+        PengeluaranLH(
+            laporan_induk_id=b['laporan'], kategori='BONUS', mitra_id=b['mitra'],
+            item=b['item'], nominal=b['nominal'],
+        )
+        for b in draft['baris'] if (b['item'], b['mitra'], b['cabang']) not in sudah
+    ]
+    with transaction.atomic(), tunda_ringkasan():
+        PengeluaranLH.objects.bulk_create(baru)
+        # bulk_create tidak mengirim signal, tandai manual
+        for laporan_id in {p.laporan_induk_id for p in baru}:
+            tandai_berubah(laporan_id)
+    return len(baru)
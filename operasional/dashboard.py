@@ -0,0 +1,98 @@
+import datetime
+import uuid
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from perusahaan.akses import cakupan, saring_cabang
+from .models import LHCabang
+
+# KPI "Hari Ini" di-cache per tanggal & cakupan user. Kunci KPI memuat versi
+# tanggalnya; invalidasi cukup ganti versi itu. Versi dibaca sebelum menghitung,
+# jadi hasil hitungan yang keburu basi tersimpan di versi lama dan tidak terbaca.
+WAKTU_CACHE = 300  # detik, batas basi kalau ada invalidasi yang terlewat
+WAKTU_VERSI = 24 * 3600
+
+
+def tanggal_laporan(nilai):
+    # LHCabang.tanggal bisa masih datetime (default timezone.now) sebelum dimuat ulang
+    if isinstance(nilai, datetime.datetime):
+        return timezone.localdate(nilai) if timezone.is_aware(nilai) else nilai.date()
+    return nilai
+
+
+def _kunci_versi(tanggal):
+    return f"dashboard:versi:{tanggal_laporan(tanggal).isoformat()}"
+
+
+def _kunci(tanggal, versi, nama_cakupan):
+    return f"dashboard:hari_ini:{tanggal.isoformat()}:{versi}:{nama_cakupan}"
+
+
+def _versi(tanggal):
+    kunci = _kunci_versi(tanggal)
+    versi = cache.get(kunci)
+    if versi is None:
+        cache.add(kunci, uuid.uuid4().hex, WAKTU_VERSI)
+        versi = cache.get(kunci)
+    return versi
+
+
+async def _aversi(tanggal):
+    kunci = _kunci_versi(tanggal)
+    versi = await cache.aget(kunci)
+    if versi is None:
+        await cache.aadd(kunci, uuid.uuid4().hex, WAKTU_VERSI)
+        versi = await cache.aget(kunci)
+    return versi
+
+
+def _agregat_kpi():
+    # Lima angka dalam satu query (LEFT JOIN detail & setoran + agregat bersyarat)
+    hadir = Q(detail_lh__status_kehadiran='H')
+    return {
+        'total_cabang': Count('id', distinct=True),
+        'total_setor': Count('setoran_pusat', distinct=True),
+        'total_karyawan': Count('detail_lh', filter=hadir),
+        'total_omzet': Sum('detail_lh__omzet_bruto_rp', filter=hadir),
+        'total_minus': Count('detail_lh', filter=hadir & Q(detail_lh__selisih_rp__lt=0)),
+    }
+
+
+def hitung_kpi(tanggal, user):
+    laporan_induk = saring_cabang(LHCabang.objects.filter(tanggal=tanggal), user)
+    hasil = laporan_induk.aggregate(**_agregat_kpi())
+    hasil['total_omzet'] = hasil['total_omzet'] or 0
+    return hasil
+
+
+def kpi_hari_ini(tanggal, user):
+    kunci = _kunci(tanggal, _versi(tanggal), cakupan(user))
+    kpi = cache.get(kunci)
+    if kpi is None:
+        kpi = hitung_kpi(tanggal, user)
+        cache.set(kunci, kpi, WAKTU_CACHE)
+    return kpi
+
+
+async def ahitung_kpi(tanggal, user):
+    # Tanpa cache, dipakai juga stream dashboard (operasional/siaran.py)
+    laporan_induk = saring_cabang(LHCabang.objects.filter(tanggal=tanggal), user)
+    hasil = await laporan_induk.aaggregate(**_agregat_kpi())
+    hasil['total_omzet'] = hasil['total_omzet'] or 0
+    return hasil
+
+
+async def akpi_hari_ini(tanggal, user):
+    # Versi async untuk view dashboard di mode ASGI (cabang user sudah diisi admin_view_async)
+    kunci = _kunci(tanggal, await _aversi(tanggal), await sync_to_async(cakupan)(user))
+    kpi = await cache.aget(kunci)
+    if kpi is None:
+        kpi = await ahitung_kpi(tanggal, user)
+        await cache.aset(kunci, kpi, WAKTU_CACHE)
+    return kpi
+
+
+def invalidasi_dashboard(tanggal):
+    transaction.on_commit(lambda: cache.set(_kunci_versi(tanggal), uuid.uuid4().hex, WAKTU_VERSI))
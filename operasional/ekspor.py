@@ -0,0 +1,198 @@
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+# Ekspor CSV/XLSX yang dialirkan baris per baris (StreamingHttpResponse).
+# Data dibaca pakai .iterator(), jadi memori tetap kecil walau berisi
+# bertahun-tahun laporan, dan unduhan langsung mulai.
+# Di ASGI iterator sync ditampung seluruhnya oleh Django sebelum dikirim, jadi
+# di sana potongannya diambil satu per satu lewat iterator async (_alirkan_async).
+UKURAN_POTONGAN = 64 * 1024  # kirim ke klien tiap ± 64 KB
+CHUNK_QUERY = 2000
+
+_KARAKTER_TERLARANG = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Penampung:
+    # "File" tulis-saja untuk csv.writer / zipfile, isinya diambil generator
+    def __init__(self):
+        self.potongan = []
+        self.ukuran = 0
+        self.posisi = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.potongan.append(bytes(data))
+        self.ukuran += len(data)
+        self.posisi += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.posisi
+
+    def flush(self):
+        pass
+
+    def ambil(self):
+        data = b''.join(self.potongan)
+        self.potongan, self.ukuran = [], 0
+        return data
+
+
+def _csv(header, baris):
+    penampung = _Penampung()
+    penulis = csv.writer(penampung)
+    penampung.write('\ufeff')  # BOM supaya Excel membaca UTF-8 dengan benar
+    penulis.writerow(header)
+    for row in baris:
+        penulis.writerow(row)
+        if penampung.ukuran >= UKURAN_POTONGAN:
+            yield penampung.ambil()
+    yield penampung.ambil()
+
+
+def _sel(nilai):
+    if nilai is None:
+        return '<c/>'
+    if isinstance(nilai, bool):
+        nilai = int(nilai)
+    if isinstance(nilai, (int, float)):
+        return f'<c><v>{nilai}</v></c>'
+    teks = escape(_KARAKTER_TERLARANG.sub('', str(nilai)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{teks}</t></is></c>'
+
+
+_XLSX_STATIS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx(header, baris, nama_sheet):
+    # XLSX minimal (1 sheet, teks inline) ditulis langsung ke zip yang dialirkan,
+    # tanpa library tambahan dan tanpa menampung seluruh sheet di memori
+    penampung = _Penampung()
+    with zipfile.ZipFile(penampung, 'w', compression=zipfile.ZIP_DEFLATED) as berkas_zip:
+        for nama, isi in _XLSX_STATIS.items():
+            berkas_zip.writestr(nama, isi)
+        berkas_zip.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(nama_sheet[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield penampung.ambil()
+
+        with berkas_zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            ).encode())
+            for row in _dengan_header(header, baris):
+                sheet.write(('<row>' + ''.join(_sel(v) for v in row) + '</row>').encode())
+                if penampung.ukuran >= UKURAN_POTONGAN:
+                    yield penampung.ambil()
+            sheet.write(b'</sheetData></worksheet>')
+    yield penampung.ambil()
+
+
+def _dengan_header(header, baris):
+    yield header
+    yield from baris
+
+
+async def _alirkan_async(potongan):
+    # Query .iterator() tetap jalan di thread sync yang sama untuk tiap potongan
+    ambil = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (data := await ambil(potongan, None)) is not None:
+            yield data
+    finally:
+        # Klien putus di tengah unduhan: tutup generator (dan cursor-nya) di thread yang sama
+        await sync_to_async(potongan.close, thread_sensitive=True)()
+
+
+def respons_ekspor(request, nama_berkas, header, baris, format='csv', nama_sheet='Data'):
+    if format == 'xlsx':
+        potongan = _xlsx(header, baris, nama_sheet)
+        content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        nama_berkas += '.xlsx'
+    else:
+        potongan = _csv(header, baris)
+        content_type = 'text/csv; charset=utf-8'
+        nama_berkas += '.csv'
+    if isinstance(request, ASGIRequest):
+        potongan = _alirkan_async(potongan)
+    respons = StreamingHttpResponse(potongan, content_type=content_type)
+    respons['Content-Disposition'] = f'attachment; filename="{nama_berkas}"'
+    return respons
+
+
+# --- Isi ekspor ---
+
+HEADER_DETAIL = [
+    'Tanggal', 'Kode Cabang', 'Cabang', 'ID Staff', 'Nama Mitra', 'Kehadiran',
+    'Jam Berangkat', 'Jam Pulang', 'Durasi (menit)', 'Adonan Bawa (gr)', 'Adonan Sisa (gr)',
+    'Target Minimal', 'Nilai Sisa', 'Cash Diterima', 'Potongan Es', 'Potongan Gas',
+    'Potongan Parkir', 'Potongan QRIS', 'Omzet', 'Selisih',
+]
+
+
+def baris_detail(detail_qs):
+    kolom = (
+        'laporan_induk__tanggal', 'laporan_induk__cabang_id', 'laporan_induk__cabang__nama_cabang',
+        'mitra_id', 'mitra__nama_lengkap', 'status_kehadiran', 'jam_berangkat', 'jam_pulang',
+        'durasi_kerja', 'adonan_bawa_gr', 'adonan_sisa_gr', 'target_minimal_rp', 'nilai_sisa_rp',
+        'cash_diterima', 'potongan_es', 'potongan_gas', 'potongan_parkir', 'potongan_qris',
+        'omzet_bruto_rp', 'selisih_rp',
+    )
+    qs = detail_qs.order_by('laporan_induk__tanggal', 'laporan_induk__cabang_id', 'id').values_list(*kolom)
+    for row in qs.iterator(chunk_size=CHUNK_QUERY):
+        row = list(row)
+        row[0] = row[0].isoformat()
+        row[6] = row[6].strftime('%H:%M') if row[6] else None
+        row[7] = row[7].strftime('%H:%M') if row[7] else None
+        yield row
+
+
+HEADER_REKAP = ['ID Staff', 'Nama Mitra', 'Durasi (jam)', 'Omzet', 'Minus', 'Kehadiran']
+
+
+def baris_rekap(rekap_mitra):
+    # Sudah berupa list dari cache rekap (satu baris per mitra, tidak besar)
+    for m in rekap_mitra:
+        yield [
+            m['mitra'], m['mitra__nama_lengkap'], round(m['total_jam'] or 0, 1),
+            m['total_omset'] or 0, m['total_minus'] or 0, m['kehadiran'],
+        ]
@@ -0,0 +1,259 @@
+from django import forms
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.models import BaseInlineFormSet, ModelChoiceIteratorValue
+from django.utils.choices import BaseChoiceIterator
+from perusahaan.peran import anggota_peran
+from sistem.aturan import get_aturan
+from .models import DetailLH
+from .ringkasan import tandai_berubah, tunda_ringkasan
+
+# Semua kolom DetailLH yang ditulis ulang saat bulk_update
+KOLOM_DETAIL = [f.name for f in DetailLH._meta.concrete_fields if not f.primary_key]
+
+
+class _PilihanBersama(BaseChoiceIterator):
+    # Pilihan yang dipakai bersama semua salinan field dalam satu formset
+    # (tiap baris inline, termasuk baris kosong & template "tambah").
+    # Dengan widget autocomplete yang dibutuhkan hanya mitra yang terpilih:
+    # nilai semua baris didaftarkan dulu, lalu diambil dengan satu query.
+    def __init__(self, field, queryset, peran=None):
+        self.field = field
+        self.queryset = queryset
+        self.peran = peran
+        self._objek = {}
+        self._tertunda = set()
+        self._izin = None
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def daftar(self, nilai):
+        if nilai not in self.field.empty_values:
+            kunci = str(getattr(nilai, 'pk', nilai))
+            if kunci not in self._objek:
+                self._tertunda.add(kunci)
+
+    def ambil(self, nilai, cek_peran=False):
+        self.daftar(nilai)
+        if cek_peran and self._tertunda and self.peran:
+            # Saat validasi: ID yang bukan perannya ditolak tanpa query ke Karyawan
+            if self._izin is None:
+                self._izin = frozenset().union(*(anggota_peran()[p] for p in self.peran))
+            izin = self._izin
+            for kunci in self._tertunda - izin:
+                self._objek[kunci] = None
+            self._tertunda &= izin
+        if self._tertunda:
+            ditemukan = {str(obj.pk): obj for obj in self.queryset.filter(pk__in=self._tertunda)}
+            for kunci in self._tertunda:
+                self._objek[kunci] = ditemukan.get(kunci)
+            self._tertunda = set()
+        return self._objek.get(str(getattr(nilai, 'pk', nilai)))
+
+    def __iter__(self):
+        # Daftar lengkap, hanya untuk widget <select> biasa
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.queryset:
+            yield (ModelChoiceIteratorValue(obj.pk, obj), self.field.label_from_instance(obj))
+
+
+class PilihanBersamaField(forms.ModelChoiceField):
+    # ModelChoiceField yang hasil query-nya dipakai bersama semua form dalam satu
+    # formset: jumlah query tetap, berapapun jumlah barisnya.
+    # peran: daftar peran Karyawan yang boleh dipilih, untuk cek awal tanpa query
+    def __init__(self, queryset, peran=None, **kwargs):
+        self.peran = peran
+        super().__init__(queryset, **kwargs)
+        if self.limit_choices_to:
+            # Terapkan sekali di sini; kalau dibiarkan, tiap form membuat queryset baru
+            self.queryset = self.queryset.complex_filter(self.get_limit_choices_to())
+            self.limit_choices_to = None
+
+    def _set_queryset(self, queryset):
+        self._queryset = None if queryset is None else queryset.all()
+        self._bersama = _PilihanBersama(self, self._queryset, getattr(self, 'peran', None))
+        self.widget.choices = self._bersama
+
+    queryset = property(forms.ModelChoiceField._get_queryset, _set_queryset)
+
+    def __deepcopy__(self, memo):
+        # Lewati ModelChoiceField.__deepcopy__ yang membuat queryset baru per salinan
+        return super(forms.ChoiceField, self).__deepcopy__(memo)
+
+    @property
+    def choices(self):
+        return self._bersama
+
+    @choices.setter
+    def choices(self, value):
+        forms.ChoiceField.choices.fset(self, value)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        obj = self._bersama.ambil(value, cek_peran=True)
+        if obj is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+        return obj
+
+
+class PilihanBersamaForm(forms.ModelForm):
+    # Nilai PilihanBersamaField sudah dicek ke querysetnya (termasuk limit_choices_to),
+    # jadi validasi ForeignKey bawaan model (1 query per baris) dilewati
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        exclude.update(nama for nama, field in self.fields.items() if isinstance(field, PilihanBersamaField))
+        return exclude
+
+
+class MitraAutocomplete(AutocompleteSelect):
+    # Select2 dari admin Django, tapi sumber datanya endpoint cari mitra milik
+    # LHCabangAdmin (sudah dibatasi cabang & laporan). Yang dirender hanya opsi terpilih.
+    def __init__(self, field, admin_site, url, attrs=None):
+        super().__init__(field, admin_site, attrs)
+        self.url = url
+
+    def get_url(self):
+        return self.url
+
+    def optgroups(self, name, value, attr=None):
+        if not isinstance(self.choices, _PilihanBersama):
+            return super().optgroups(name, value, attr)
+        opsi = []
+        if not self.is_required:
+            opsi.append(self.create_option(name, '', '', False, 0))
+        for nilai in value:
+            obj = self.choices.ambil(nilai)
+            if obj is not None:
+                label = self.choices.field.label_from_instance(obj)
+                opsi.append(self.create_option(name, obj.pk, label, True, len(opsi)))
+        return [(None, opsi, 0)]
+
+
+class DaftarPilihanMixin:
+    # Daftarkan nilai mitra tiap baris ke pilihan bersama, supaya label semua
+    # baris (atau validasinya saat POST) diambil sekaligus dalam satu query
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        for nama, field in form.fields.items():
+            if isinstance(field, PilihanBersamaField):
+                field.choices.daftar(form[nama].value())
+        return form
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # id baris lama dicari di queryset formset yang sudah dimuat, bukan get() per baris
+        field = form.fields.get(self.model._meta.pk.name)
+        if isinstance(field, forms.ModelChoiceField):
+            field.to_python = lambda nilai: self._baris_lama(field, nilai)
+
+    def _baris_lama(self, field, nilai):
+        if nilai in field.empty_values:
+            return None
+        try:
+            obj = self._existing_object(self.model._meta.pk.to_python(nilai))
+        except ValidationError:
+            obj = None
+        if obj is None:
+            raise ValidationError(field.error_messages['invalid_choice'], code='invalid_choice')
+        return obj
+
+
+class PengeluaranFormSet(DaftarPilihanMixin, BaseInlineFormSet):
+    pass
+
+
+class DetailLHFormSet(DaftarPilihanMixin, BaseInlineFormSet):
+    # Validasi & simpan 7 baris mitra sekaligus:
+    # 1 query cek duplikat, hitung di memori, lalu bulk_create/bulk_update
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        # Cek duplikat per baris dimatikan, diganti cek batch di clean()
+        form.instance.cek_duplikat = False
+        return form
+
+    def _baris_aktif(self):
+        for i, form in enumerate(self.forms):
+            if not hasattr(form, 'cleaned_data'):
+                continue
+            # Baris tambahan yang kosong dilewati, baris lama tetap ikut dicek
+            if i >= self.initial_form_count() and not form.has_changed():
+                continue
+            if self.can_delete and self._should_delete_form(form):
+                continue
+            yield form
+
+    def clean(self):
+        super().clean()
+        laporan = self.instance
+        if not laporan.tanggal or not laporan.cabang_id:
+            return
+
+        baris = [f for f in self._baris_aktif() if f.cleaned_data.get('mitra')]
+        if not baris:
+            return
+
+        # Baris milik formset ini akan ditimpa/dihapus, jadi tidak dihitung duplikat
+        pk_formset = [f.instance.pk for f in self.initial_forms if f.instance.pk]
+        duplikat = {
+            d.mitra_id: d for d in DetailLH.objects.filter(
+                mitra__in=[f.cleaned_data['mitra'] for f in baris],
+                laporan_induk__tanggal=laporan.tanggal,
+            ).exclude(pk__in=pk_formset).select_related('laporan_induk__cabang')
+        }
+
+        sudah_diisi = set()
+        for form in baris:
+            mitra = form.cleaned_data['mitra']
+            if mitra.pk in duplikat:
+                form.add_error(None, DetailLH.pesan_duplikat(mitra, duplikat[mitra.pk].laporan_induk, laporan))
+            elif mitra.pk in sudah_diisi:
+                # Mitra yang sama diisi dua kali di laporan ini
+                form.add_error(None, DetailLH.pesan_duplikat(mitra, laporan, laporan))
+            sudah_diisi.add(mitra.pk)
+
+    def save(self, commit=True):
+        if not commit:
+            return super().save(commit=False)
+
+        self.new_objects, self.changed_objects, self.deleted_objects = [], [], []
+        baru, ubah = [], []
+        for form in self.initial_forms:
+            obj = form.instance
+            if obj.pk is None:
+                continue
+            if self.can_delete and self._should_delete_form(form):
+                self.deleted_objects.append(obj)
+            elif form.has_changed():
+                self.changed_objects.append((obj, form.changed_data))
+                ubah.append(obj)
+        for form in self.extra_forms:
+            if not form.has_changed() or (self.can_delete and self._should_delete_form(form)):
+                continue
+            self.new_objects.append(form.instance)
+            baru.append(form.instance)
+
+        harga = get_aturan(self.instance.tanggal)['harga']
+        for obj in baru + ubah:
+            obj.laporan_induk = self.instance
+            obj.hitung_otomatis(harga)
+
+        with transaction.atomic(), tunda_ringkasan():
+            if self.deleted_objects:
+                DetailLH.objects.filter(pk__in=[obj.pk for obj in self.deleted_objects]).delete()
+            if ubah:
+                DetailLH.objects.bulk_update(ubah, KOLOM_DETAIL)
+            if baru:
+                DetailLH.objects.bulk_create(baru)
+            # bulk_create/bulk_update tidak mengirim signal, tandai manual
+            tandai_berubah(self.instance.pk)
+        return self.new_objects + ubah
@@ -0,0 +1,177 @@
+import calendar
+import hashlib
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from sistem.aturan import get_aturan
+
+# Penggajian bulanan dari parameter Aturan Perusahaan:
+#   total = gaji pokok (training/tetap) + insentif kehadiran + bonus - kasbon
+# - training: masa kerja < BULAN_TRAINING bulan di akhir periode
+# - insentif kehadiran: hadir minimal sekali dan tidak ada Alfa
+# - bonus: pengeluaran BONUS bulan itu (bonus pekanan yang diposting `hitung_bonus`)
+# - kasbon: pengeluaran KASBON bulan itu
+# Dihitung per cabang tugas (2 query agregat per cabang). Tiap slip menyimpan sidik
+# masukannya, jadi proses ulang hanya menulis karyawan yang datanya berubah.
+BULAN_TRAINING = 3
+KOLOM_SLIP = [
+    'cabang', 'jumlah_hadir', 'jumlah_sakit', 'jumlah_izin', 'jumlah_alfa', 'gaji_pokok',
+    'insentif_kehadiran', 'bonus', 'potongan_kasbon', 'total', 'sidik',
+]
+
+
+def rentang_bulan(bulan):
+    mulai = bulan.replace(day=1)
+    return mulai, mulai.replace(day=calendar.monthrange(mulai.year, mulai.month)[1])
+
+
+def _tambah_bulan(tanggal, jumlah):
+    bulan = tanggal.month - 1 + jumlah
+    tahun, bulan = tanggal.year + bulan // 12, bulan % 12 + 1
+    return tanggal.replace(year=tahun, month=bulan, day=min(tanggal.day, calendar.monthrange(tahun, bulan)[1]))
+
+
+def karyawan_digaji(mulai, selesai):
+    # Karyawan aktif yang sudah masuk sebelum akhir periode + siapa saja yang punya
+    # absensi di periode ini (mis. resign di tengah bulan)
+    from perusahaan.models import Karyawan
+    from .models import DetailLH
+
+    return Karyawan.objects.filter(
+        Q(status='AKTIF', tanggal_masuk__lte=selesai)
+        | Q(id_staff__in=DetailLH.objects.filter(
+            laporan_induk__tanggal__range=(mulai, selesai)).values('mitra_id'))
+    )
+
+
+def cabang_periode(periode):
+    mulai, selesai = rentang_bulan(periode.bulan)
+    return sorted(
+        set(karyawan_digaji(mulai, selesai).values_list('cabang_tugas_id', flat=True)),
+        key=lambda c: c or '',
+    )
+
+
+def _sidik(*nilai):
+    return hashlib.sha1(repr(nilai).encode()).hexdigest()
+
+
+def proses_cabang(periode_id, cabang_id):
+    # Satu cabang tugas (None = tanpa cabang) dalam satu transaksi.
+    # Fungsi tingkat modul supaya bisa dijalankan di process pool.
+    from .models import DetailLH, PengeluaranLH, PeriodeGaji, SlipGaji
+
+    periode = PeriodeGaji.objects.get(pk=periode_id)
+    mulai, selesai = rentang_bulan(periode.bulan)
+    aturan = get_aturan(selesai)  # versi aturan yang berlaku di akhir bulan
+    batas_training = _tambah_bulan(selesai, -BULAN_TRAINING)
+
+    karyawan = list(
+        karyawan_digaji(mulai, selesai).filter(cabang_tugas_id=cabang_id)
+        .values_list('id_staff', 'tanggal_masuk')
+    )
+    id_karyawan = [k for k, _ in karyawan]
+    absen = {
+        d['mitra_id']: d for d in DetailLH.objects.filter(
+            mitra_id__in=id_karyawan, laporan_induk__tanggal__range=(mulai, selesai),
+        ).values('mitra_id').annotate(
+            hadir=Count('id', filter=Q(status_kehadiran='H')),
+            sakit=Count('id', filter=Q(status_kehadiran='S')),
+            izin=Count('id', filter=Q(status_kehadiran='I')),
+            alfa=Count('id', filter=Q(status_kehadiran='A')),
+        )
+    }
+    uang = {
+        d['mitra_id']: d for d in PengeluaranLH.objects.filter(
+            mitra_id__in=id_karyawan, laporan_induk__tanggal__range=(mulai, selesai),
+            kategori__in=['BONUS', 'KASBON'],
+        ).values('mitra_id').annotate(
+            bonus=Sum('nominal', filter=Q(kategori='BONUS')),
+            kasbon=Sum('nominal', filter=Q(kategori='KASBON')),
+        )
+    }
+
+    hasil = []
+    for id_staff, tanggal_masuk in karyawan:
+        a = absen.get(id_staff, {})
+        u = uang.get(id_staff, {})
+        hadir, sakit, izin, alfa = a.get('hadir', 0), a.get('sakit', 0), a.get('izin', 0), a.get('alfa', 0)
+        training = tanggal_masuk > batas_training
+        pokok = int(aturan['gaji_training'] if training else aturan['gaji_tetap'])
+        insentif = int(aturan['insentif_kehadiran']) if hadir and not alfa else 0
+        bonus, kasbon = u.get('bonus') or 0, u.get('kasbon') or 0
+        nilai = {
+            'cabang_id': cabang_id, 'jumlah_hadir': hadir, 'jumlah_sakit': sakit, 'jumlah_izin': izin,
+            'jumlah_alfa': alfa, 'gaji_pokok': pokok, 'insentif_kehadiran': insentif, 'bonus': bonus,
+            'potongan_kasbon': kasbon, 'total': pokok + insentif + bonus - kasbon,
+        }
+        nilai['sidik'] = _sidik(*sorted(nilai.items()))
+        hasil.append((id_staff, nilai))
+
+    with transaction.atomic():
+        tersimpan = {
+            s.karyawan_id: s for s in
+            SlipGaji.objects.select_for_update().filter(periode=periode, karyawan_id__in=id_karyawan)
+        }
+        baru, ubah = [], []
+        for id_staff, nilai in hasil:
+            slip = tersimpan.get(id_staff)
+            if slip is None:
+                baru.append(SlipGaji(periode=periode, karyawan_id=id_staff, **nilai))
+            elif slip.sidik != nilai['sidik']:
+                for kolom, isi in nilai.items():
+                    setattr(slip, kolom, isi)
+                ubah.append(slip)
+        SlipGaji.objects.bulk_create(baru)
+        SlipGaji.objects.bulk_update(ubah, KOLOM_SLIP)
+        if ubah:
+            # bulk_update tidak mengisi auto_now
+            SlipGaji.objects.filter(pk__in=[s.pk for s in ubah]).update(diperbarui=timezone.now())
+    return {'cabang': cabang_id, 'baru': len(baru), 'ubah': len(ubah), 'tetap': len(hasil) - len(baru) - len(ubah)}
+
+
+def bersihkan_slip(periode):
+    # Slip karyawan yang tidak lagi digaji di periode ini (dihapus/dipindah statusnya)
+    from .models import SlipGaji
+
+    mulai, selesai = rentang_bulan(periode.bulan)
+    return SlipGaji.objects.filter(periode=periode).exclude(
+        karyawan_id__in=karyawan_digaji(mulai, selesai).values('id_staff'),
+    ).delete()[0]
+
+
+def _siapkan_worker(nama_db):
+    # Worker spawn memuat settings dari awal: pakai database yang sama dengan
+    # proses induk (mis. database test, bukan nama di settings)
+    import django
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = nama_db
+    django.setup()
+
+
+def proses_periode(periode, jumlah_proses=1, laporan=None):
+    # jumlah_proses > 1: tiap cabang dikerjakan di process pool (spawn, koneksi DB sendiri)
+    cabang = cabang_periode(periode)
+    hasil = []
+    if jumlah_proses > 1 and len(cabang) > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(
+            max_workers=jumlah_proses, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_siapkan_worker, initargs=(connection.settings_dict['NAME'],),
+        ) as pool:
+            tugas = [pool.submit(proses_cabang, periode.pk, c) for c in cabang]
+            for selesai in as_completed(tugas):
+                hasil.append(selesai.result())
+                if laporan:
+                    laporan(hasil[-1])
+    else:
+        for c in cabang:
+            hasil.append(proses_cabang(periode.pk, c))
+            if laporan:
+                laporan(hasil[-1])
+    terhapus = bersihkan_slip(periode)
+    periode.diproses_pada = timezone.now()
+    periode.save(update_fields=['diproses_pada'])
+    return hasil, terhapus
@@ -0,0 +1,138 @@
+import io
+import os
+import threading
+from PIL import ExifTags, Image, ImageOps
+from django.core.exceptions import ValidationError
+from django.core.files.base import File
+
+# Pipeline kompres foto nota & bukti transfer (dipakai PengeluaranLH dan SetorPusat)
+LEBAR_MAKS = 1200
+UKURAN_THUMBNAIL = (240, 240)
+KUALITAS_JPEG = 70
+
+# Batas resolusi foto yang mau didecode (± 48 MP, sudah di atas kamera HP biasa).
+# Foto 12 MP full decode = ±36 MB RAM per worker, di atas batas ini ditolak.
+PIKSEL_MAKS = 48_000_000
+
+# Status proses foto di latar belakang (lihat operasional/antrean.py)
+MENUNGGU = 'MENUNGGU'
+PROSES = 'PROSES'
+SELESAI = 'SELESAI'
+GAGAL = 'GAGAL'
+STATUS_GAMBAR = [
+    (SELESAI, 'Selesai'),
+    (MENUNGGU, 'Menunggu'),
+    (PROSES, 'Diproses'),
+    (GAGAL, 'Gagal'),
+]
+
+# Orientasi EXIF yang memutar foto 90/270 derajat (lebar & tinggi tertukar)
+_ORIENTASI_TERPUTAR = {5, 6, 7, 8}
+
+_lokal = threading.local()
+
+
+def perlu_kompres(berkas):
+    # Hanya file yang baru di-upload (belum tersimpan di storage) yang dikompres.
+    # File lama dari S3 tidak diunduh ulang saat edit nominal/kategori.
+    return bool(berkas) and not getattr(berkas, '_committed', True)
+
+
+def validasi_ukuran_gambar(berkas):
+    # Cukup baca header foto, tidak didecode. File lama di storage tidak dicek ulang.
+    if not perlu_kompres(berkas):
+        return
+    posisi = berkas.tell() if hasattr(berkas, 'tell') else None
+    try:
+        with Image.open(berkas) as img:
+            lebar, tinggi = img.size
+    except Exception:
+        return  # format tidak valid sudah ditangani validasi ImageField
+    finally:
+        if posisi is not None:
+            berkas.seek(posisi)
+    if lebar * tinggi > PIKSEL_MAKS:
+        raise ValidationError(
+            f"Resolusi foto terlalu besar ({lebar}x{tinggi}). Maksimal {PIKSEL_MAKS // 1_000_000} MP."
+        )
+
+
+def _buffer(slot):
+    # BytesIO per thread dipakai ulang antar foto, tidak bikin salinan bytes baru
+    buffers = getattr(_lokal, 'buffers', None)
+    if buffers is None:
+        buffers = _lokal.buffers = {}
+    buf = buffers.get(slot)
+    if buf is None or buf.closed:
+        buf = buffers[slot] = io.BytesIO()
+    buf.seek(0)
+    buf.truncate()
+    return buf
+
+
+def _buka(berkas):
+    img = Image.open(berkas)
+    if img.width * img.height > PIKSEL_MAKS:
+        raise ValueError(f"Resolusi foto terlalu besar: {img.width}x{img.height}")
+
+    # Ukuran target dihitung dari orientasi tampilan (setelah rotasi EXIF)
+    terputar = img.getexif().get(ExifTags.Base.Orientation) in _ORIENTASI_TERPUTAR
+    lebar_asli = img.height if terputar else img.width
+    faktor = 1
+    if lebar_asli > LEBAR_MAKS:
+        skala = LEBAR_MAKS / lebar_asli
+        target = (round(img.width * skala), round(img.height * skala))
+        if img.format == 'JPEG':
+            # Decoder JPEG langsung turun skala 1/2, 1/4, 1/8 (tetap >= target)
+            img.draft('RGB', target)
+        elif img.width >= target[0] * 2:
+            # Format lain: kecilkan cepat dengan faktor bulat, sisanya di _kecilkan
+            faktor = img.width // target[0]
+
+    # Ubah mode dulu: reduce()/thumbnail() menolak palet (P), 1-bit dan 16-bit
+    img = _ke_rgb(img)
+    if faktor > 1:
+        img = img.reduce(faktor)
+    return ImageOps.exif_transpose(img)
+
+
+def _ke_rgb(img):
+    if img.mode in ("RGB", "L"):
+        return img
+    if img.mode.startswith("I"):
+        # Grayscale 16/32-bit: turunkan ke 8-bit, convert("RGB") langsung memotong jadi putih
+        return img.convert("I").point(lambda v: v / 256).convert("L")
+    return img.convert("RGB") #jika file PNG/CMYK, ubah ke RGB
+
+
+def _kecilkan(img):
+    # Sisa pengecilan setelah draft/reduce sudah < 2x, BICUBIC cukup halus
+    if img.width > LEBAR_MAKS:
+        ratio = LEBAR_MAKS / float(img.width)
+        new_height = int(float(img.height) * float(ratio))
+        img = img.resize((LEBAR_MAKS, new_height), Image.Resampling.BICUBIC)
+    return img
+
+
+def _jpeg(img, nama, slot):
+    output = _buffer(slot) #kompres foto
+    img.save(output, format='JPEG', quality=KUALITAS_JPEG, optimize=True)
+    output.seek(0)
+    return File(output, name=nama)
+
+
+def nama_jpeg(nama, akhiran=''):
+    # Isinya selalu JPEG, jadi ekstensinya ikut diganti
+    dasar = os.path.splitext(os.path.basename(nama))[0]
+    return f"{dasar}{akhiran}.jpg"
+
+
+def olah_gambar(berkas):
+    # Sekali decode untuk dua hasil: foto terkompres dan thumbnail.
+    # Hasilnya menunjuk buffer milik thread ini, simpan ke storage sebelum foto berikutnya.
+    img = _kecilkan(_buka(berkas))
+    hasil = _jpeg(img, nama_jpeg(berkas.name), 'hasil')
+
+    img.thumbnail(UKURAN_THUMBNAIL)
+    thumbnail = _jpeg(img, nama_jpeg(berkas.name, '_thumb'), 'thumbnail')
+    return hasil, thumbnail
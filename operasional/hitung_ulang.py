@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Ceil, Coalesce, Floor
+from django.db.models.lookups import GreaterThanOrEqual
+from .dashboard import invalidasi_dashboard
+from .models import DetailLH, LHCabang, RekapHarianMitra, RingkasanLH
+from .rekap import invalidasi_rekap
+from .siaran import catat_perubahan
+
+# Hitung ulang kolom DetailLH yang bergantung harga per gram (target, nilai sisa,
+# selisih) langsung di SQL, per potongan pk. Rumusnya sama dengan
+# DetailLH.hitung_otomatis: perkalian float lalu dibulatkan ke nol seperti int().
+# Omzet & durasi tidak bergantung harga, jadi tidak disentuh.
+
+
+def _int(ekspresi):
+    # int() Python: bulatkan ke arah nol
+    return Cast(Case(
+        When(GreaterThanOrEqual(ekspresi, 0), then=Floor(ekspresi)),
+        default=Ceil(ekspresi),
+    ), IntegerField())
+
+
+def ekspresi_turunan(harga):
+    harga = Value(float(harga), output_field=FloatField())
+    target = Cast('adonan_bawa_gr', FloatField()) * harga
+    sisa = Cast('adonan_sisa_gr', FloatField()) * harga
+    return {
+        'target_minimal_rp': _int(target),
+        'nilai_sisa_rp': _int(sisa),
+        'selisih_rp': _int((Cast('omzet_bruto_rp', FloatField()) + sisa) - target),
+    }
+
+
+def yang_berubah(detail_qs, harga):
+    # DetailLH yang nilainya beda dengan hasil hitung ulang, plus kolom *_baru
+    baru = {f'{k}_baru': v for k, v in ekspresi_turunan(harga).items()}
+    return detail_qs.alias(**baru).exclude(
+        target_minimal_rp=F('target_minimal_rp_baru'),
+        nilai_sisa_rp=F('nilai_sisa_rp_baru'),
+        selisih_rp=F('selisih_rp_baru'),
+    ).annotate(**{k: F(k) for k in baru})
+
+
+def perbarui_turunan_laporan(laporan_id):
+    # Setelah selisih berubah: total_selisih/jumlah_minus di RingkasanLH dan
+    # total_minus di RekapHarianMitra disegarkan dengan UPDATE ber-subquery
+    detail = DetailLH.objects.filter(laporan_induk=OuterRef('laporan')).order_by().values('laporan_induk')
+    RingkasanLH.objects.filter(laporan__in=laporan_id).update(
+        total_selisih=Coalesce(Subquery(detail.annotate(s=Sum('selisih_rp')).values('s')), 0),
+        jumlah_minus=Coalesce(Subquery(
+            detail.annotate(n=Count('id', filter=Q(selisih_rp__lt=0))).values('n')
+        ), 0),
+    )
+    minus = DetailLH.objects.filter(
+        laporan_induk=OuterRef('laporan'), mitra=OuterRef('mitra'), selisih_rp__lt=0,
+    ).order_by().values('laporan_induk').annotate(s=Sum('selisih_rp')).values('s')
+    RekapHarianMitra.objects.filter(laporan__in=laporan_id).update(total_minus=Coalesce(Subquery(minus), 0))
+
+
+def proses_potongan(detail_qs, harga, dari_pk, sampai_pk):
+    # Satu potongan pk (dari_pk, sampai_pk], satu transaksi bersama turunannya
+    berubah = yang_berubah(detail_qs.filter(pk__gt=dari_pk, pk__lte=sampai_pk), harga)
+    with transaction.atomic():
+        laporan_id = set(berubah.values_list('laporan_induk_id', flat=True))
+        if not laporan_id:
+            return 0
+        jumlah = DetailLH.objects.filter(pk__in=berubah.values('pk')).update(**ekspresi_turunan(harga))
+        perbarui_turunan_laporan(laporan_id)
+        laporan = set(LHCabang.objects.filter(pk__in=laporan_id).values_list('tanggal', 'cabang_id'))
+        for tanggal in {t for t, _ in laporan}:
+            invalidasi_dashboard(tanggal)
+            invalidasi_rekap(tanggal)
+        catat_perubahan(laporan)
+    return jumlah
@@ -0,0 +1,273 @@
+import datetime
+import hashlib
+import json
+from django import forms
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from perusahaan.akses import saring_cabang
+from perusahaan.models import Cabang
+from perusahaan.peran import KEPALA_CABANG, anggota_peran
+from sistem.aturan import get_aturan
+from .models import DetailLH, KirimanLaporan, LHCabang, PengeluaranLH, SetorPusat
+from .pilihan import pilihan_mitra
+from .ringkasan import ambil_ringkasan, tandai_berubah, tunda_ringkasan
+
+# Kirim laporan satu hari sekaligus (untuk HP kepala cabang), pengganti beberapa
+# kali "Save and continue" di form admin:
+#   {
+#     "cabang": "C01", "tanggal": "2026-10-18",
+#     "detail": [{"mitra": "DS0001", "status_kehadiran": "H", "jam_berangkat": "08:00",
+#                 "adonan_bawa_gr": 1000, "jam_pulang": "17:00", "adonan_sisa_gr": 100,
+#                 "cash_diterima": 50000, ...}],
+#     "pengeluaran": [{"kategori": "OPERASIONAL", "item": "Galon", "nominal": 5000, "mitra": null}],
+#     "setoran": {}
+#   }
+# Foto dikirim sebagai multipart: field `data` berisi JSON di atas, file `setoran`
+# (bukti transfer, wajib kalau ada "setoran") dan `pengeluaran-<urutan>` (nota).
+# Isi detail & pengeluaran laporan diganti seluruhnya oleh kiriman ini.
+# Validasi semua baris memakai jumlah query tetap, penyimpanan satu transaksi
+# dengan bulk_create. Header Idempotency-Key wajib: kiriman ulang dengan kunci yang
+# sama (koneksi putus sebelum respons sampai) dijawab dengan respons tersimpan.
+MAKS_DETAIL = 7  # sama dengan inline admin
+MAKS_PENGELUARAN = 50
+HARI_SIMPAN_KUNCI = 7
+
+
+class KirimanDitolak(Exception):
+    def __init__(self, status, errors):
+        super().__init__(errors)
+        self.status = status
+        self.errors = errors
+
+
+def _galat(pesan, code):
+    # Bentuk sama dengan form.errors.get_json_data()
+    return [{'message': pesan, 'code': code}]
+
+
+def _bawaan(model, fields):
+    # Kolom yang tidak dikirim memakai default model (0 / 'H' / kosong)
+    return {nama: model._meta.get_field(nama).get_default() for nama in fields}
+
+
+class DetailKirimanForm(forms.ModelForm):
+    class Meta:
+        model = DetailLH
+        fields = [
+            'status_kehadiran', 'jam_berangkat', 'adonan_bawa_gr', 'jam_pulang', 'adonan_sisa_gr',
+            'cash_diterima', 'potongan_es', 'potongan_gas', 'potongan_parkir', 'potongan_qris',
+        ]
+
+
+class PengeluaranKirimanForm(forms.ModelForm):
+    class Meta:
+        model = PengeluaranLH
+        fields = ['kategori', 'item', 'nominal', 'bukti_nota']
+
+
+class SetoranKirimanForm(forms.ModelForm):
+    class Meta:
+        model = SetorPusat
+        fields = ['bukti_transfer']
+
+
+BAWAAN_DETAIL = _bawaan(DetailLH, DetailKirimanForm._meta.fields)
+BAWAAN_PENGELUARAN = _bawaan(PengeluaranLH, ['kategori', 'item', 'nominal'])
+
+
+def sidik_kiriman(isi, berkas):
+    data = json.dumps(isi, sort_keys=True, default=str)
+    file = sorted((nama, f.name, f.size) for nama, f in berkas.items())
+    return hashlib.sha256(repr((data, file)).encode()).hexdigest()
+
+
+def _daftar(isi, nama, maks, galat):
+    baris = isi.get(nama) or []
+    if not isinstance(baris, list) or not all(isinstance(b, dict) for b in baris):
+        galat[nama] = _galat("Harus berupa daftar objek.", 'invalid')
+        return []
+    if len(baris) > maks:
+        galat[nama] = _galat(f"Maksimal {maks} baris.", 'max_num')
+        return []
+    return baris
+
+
+def _validasi(user, isi, berkas):
+    # Semua galat dikumpulkan dulu, baru ditolak sekaligus
+    if not isinstance(isi, dict):
+        raise KirimanDitolak(400, {'__all__': _galat("Isi kiriman harus objek JSON.", 'invalid')})
+    galat = {}
+
+    cabang = saring_cabang(Cabang.objects.filter(pk=str(isi.get('cabang') or '')), user, 'kode_cabang').first()
+    if cabang is None:
+        galat['cabang'] = _galat("Cabang tidak ditemukan atau bukan cabang Anda.", 'invalid_choice')
+    try:
+        tanggal = forms.DateField().clean(isi.get('tanggal'))
+    except forms.ValidationError as e:
+        galat['tanggal'] = [{'message': m, 'code': 'invalid'} for m in e.messages]
+        tanggal = None
+    if galat:
+        raise KirimanDitolak(400, galat)
+
+    # Laporan yang sudah ada dikunci sampai transaksi selesai
+    laporan = LHCabang.objects.select_for_update().filter(cabang=cabang, tanggal=tanggal).first()
+    induk = laporan or LHCabang(cabang=cabang, tanggal=tanggal)
+
+    # --- Detail mitra ---
+    detail = []
+    baris_detail = _daftar(isi, 'detail', MAKS_DETAIL, galat)
+    kode_mitra = {str(b.get('mitra') or '') for b in baris_detail}
+    # Pilihan sama dengan inline admin, ditambah harus bertugas di cabang laporan ini
+    mitra_boleh = {
+        m.pk: m for m in pilihan_mitra(user, 'detail').filter(pk__in=kode_mitra, cabang_tugas_id=cabang.pk)
+    }
+    duplikat = {
+        d.mitra_id: d for d in DetailLH.objects.filter(
+            mitra__in=list(mitra_boleh), laporan_induk__tanggal=tanggal,
+        ).exclude(laporan_induk=laporan).select_related('laporan_induk__cabang')
+    } if mitra_boleh else {}
+    sudah_diisi = set()
+    for i, baris in enumerate(baris_detail):
+        form = DetailKirimanForm(data={**BAWAAN_DETAIL, **baris})
+        form.instance.cek_duplikat = False  # dicek sekaligus di bawah
+        salah = form.errors.get_json_data() if not form.is_valid() else {}
+        mitra = mitra_boleh.get(str(baris.get('mitra') or ''))
+        if mitra is None:
+            salah['mitra'] = _galat("Mitra tidak ditemukan atau tidak bertugas di cabang ini.", 'invalid_choice')
+        elif mitra.pk in duplikat:
+            salah['mitra'] = _galat(DetailLH.pesan_duplikat(mitra, duplikat[mitra.pk].laporan_induk, induk), 'duplikat')
+        elif mitra.pk in sudah_diisi:
+            salah['mitra'] = _galat(DetailLH.pesan_duplikat(mitra, induk, induk), 'duplikat')
+        if mitra is not None:
+            sudah_diisi.add(mitra.pk)
+        if salah:
+            galat.setdefault('detail', {})[str(i)] = salah
+        else:
+            form.instance.mitra = mitra
+            detail.append(form.instance)
+
+    # --- Pengeluaran: mitra hanya yang bertugas di laporan ini atau kacab cabangnya ---
+    pengeluaran = []
+    kacab = cabang.kepala_cabang_id if cabang.kepala_cabang_id in anggota_peran()[KEPALA_CABANG] else None
+    for i, baris in enumerate(_daftar(isi, 'pengeluaran', MAKS_PENGELUARAN, galat)):
+        nota = berkas.get(f'pengeluaran-{i}')
+        form = PengeluaranKirimanForm(
+            data={**BAWAAN_PENGELUARAN, **baris}, files={'bukti_nota': nota} if nota else None,
+        )
+        salah = form.errors.get_json_data() if not form.is_valid() else {}
+        kode = baris.get('mitra')
+        if kode and str(kode) not in sudah_diisi and str(kode) != kacab:
+            salah['mitra'] = _galat("Mitra tidak bertugas di laporan ini.", 'invalid_choice')
+        if salah:
+            galat.setdefault('pengeluaran', {})[str(i)] = salah
+        else:
+            form.instance.mitra_id = str(kode) if kode else None
+            pengeluaran.append(form.instance)
+
+    # --- Setoran (opsional), bukti transfer wajib ---
+    setoran = None
+    if isi.get('setoran') is not None or 'setoran' in berkas:
+        form = SetoranKirimanForm(data={}, files={'bukti_transfer': berkas.get('setoran')})
+        if form.is_valid():
+            setoran = form.cleaned_data['bukti_transfer']
+        else:
+            galat['setoran'] = form.errors.get_json_data()
+
+    if galat:
+        raise KirimanDitolak(400, galat)
+    return cabang, tanggal, laporan, detail, pengeluaran, setoran
+
+
+def _simpan(user, isi, berkas, boleh_ubah):
+    cabang, tanggal, laporan, detail, pengeluaran, setoran = _validasi(user, isi, berkas)
+    baru = laporan is None
+    if not baru and not boleh_ubah:
+        raise KirimanDitolak(403, {'__all__': _galat("Laporan ini sudah ada, Anda tidak boleh mengubahnya.", 'permission_denied')})
+
+    with tunda_ringkasan():
+        if baru:
+            laporan = LHCabang.objects.create(cabang=cabang, tanggal=tanggal, dibuat_oleh=user)
+        else:
+            DetailLH.objects.filter(laporan_induk=laporan).delete()
+            PengeluaranLH.objects.filter(laporan_induk=laporan).delete()
+
+        harga = get_aturan(tanggal)['harga']
+        for obj in detail:
+            obj.laporan_induk = laporan
+            obj.hitung_otomatis(harga)
+        DetailLH.objects.bulk_create(detail)
+
+        for obj in pengeluaran:
+            obj.laporan_induk = laporan
+        # Baris bernota lewat save() supaya fotonya masuk antrean kompres
+        PengeluaranLH.objects.bulk_create([p for p in pengeluaran if not p.bukti_nota])
+        for obj in pengeluaran:
+            if obj.bukti_nota:
+                obj.save()
+        # bulk_create/delete di atas ditandai manual, ringkasan dihitung sekali
+        tandai_berubah(laporan.pk)
+
+        if setoran is not None:
+            setor = SetorPusat.objects.filter(laporan_induk=laporan).first() or SetorPusat(laporan_induk=laporan)
+            setor.laporan_induk = laporan
+            setor.bukti_transfer = setoran
+            setor.save()  # angka setoran dikunci dari ringkasan terbaru
+        ringkasan = ambil_ringkasan(laporan)
+
+    return (201 if baru else 200), {
+        'laporan': laporan.pk,
+        'cabang': cabang.pk,
+        'tanggal': tanggal.isoformat(),
+        'baru': baru,
+        'detail': len(detail),
+        'pengeluaran': len(pengeluaran),
+        'setoran': setoran is not None,
+        'ringkasan': {
+            'total_cash': ringkasan.total_cash,
+            'total_pengeluaran': ringkasan.total_pengeluaran,
+            'total_omzet': ringkasan.total_omzet,
+            'total_selisih': ringkasan.total_selisih,
+            'jumlah_hadir': ringkasan.jumlah_hadir,
+            'jumlah_minus': ringkasan.jumlah_minus,
+            'wajib_setor': ringkasan.wajib_setor,
+        },
+    }
+
+
+def _ulang(tersimpan, sidik):
+    if tersimpan.sidik != sidik:
+        return 422, {'errors': {'__all__': _galat(
+            "Idempotency-Key ini sudah dipakai untuk kiriman yang berbeda.", 'kunci_dipakai',
+        )}}, False
+    return tersimpan.status, tersimpan.respons, True
+
+
+def kirim_laporan(user, isi, berkas, kunci, boleh_ubah=True):
+    # -> (status HTTP, isi respons, True kalau respons ulangan dari kunci yang sama)
+    sidik = sidik_kiriman(isi, berkas)
+    tersimpan = KirimanLaporan.objects.filter(user=user, kunci=kunci).first()
+    if tersimpan:
+        return _ulang(tersimpan, sidik)
+    try:
+        with transaction.atomic():
+            # Kunci dicatat dulu: kiriman kembar yang bersamaan tertahan di unique
+            # constraint sampai transaksi ini selesai, lalu mendapat respons ulangan
+            catatan = KirimanLaporan.objects.create(user=user, kunci=kunci, sidik=sidik)
+            status, hasil = _simpan(user, isi, berkas, boleh_ubah)
+            catatan.laporan_id, catatan.status, catatan.respons = hasil['laporan'], status, hasil
+            catatan.save(update_fields=['laporan', 'status', 'respons'])
+            KirimanLaporan.objects.filter(
+                dibuat__lt=timezone.now() - datetime.timedelta(days=HARI_SIMPAN_KUNCI),
+            ).delete()
+    except KirimanDitolak as e:
+        # Tidak ada yang tersimpan (termasuk kuncinya), kiriman boleh diperbaiki & dikirim ulang
+        return e.status, {'errors': e.errors}, False
+    except IntegrityError:
+        tersimpan = KirimanLaporan.objects.filter(user=user, kunci=kunci).first()
+        if tersimpan:
+            return _ulang(tersimpan, sidik)
+        # Laporan cabang & tanggal yang sama baru saja dibuat dari perangkat lain
+        return 409, {'errors': {'__all__': _galat(
+            "Laporan ini sedang disimpan dari perangkat lain, silakan kirim ulang.", 'bentrok',
+        )}}, False
+    return status, hasil, False
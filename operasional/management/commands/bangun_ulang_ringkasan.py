@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from operasional.models import LHCabang, RingkasanLH
+from operasional.rekap import bangun_ulang_rekap_harian
+from operasional.ringkasan import KOLOM_RINGKASAN, hitung_semua_ringkasan
+
+
+class Command(BaseCommand):
+    help = "Cocokkan RingkasanLH dengan DetailLH/PengeluaranLH, perbaiki yang selisih, lalu isi ulang RekapHarianMitra."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dari', help="Tanggal laporan awal (YYYY-MM-DD).")
+        parser.add_argument('--sampai', help="Tanggal laporan akhir (YYYY-MM-DD).")
+        parser.add_argument('--dry-run', action='store_true', help="Hanya laporkan, jangan simpan.")
+
+    def handle(self, *args, **options):
+        laporan = LHCabang.objects.all()
+        if options['dari']:
+            laporan = laporan.filter(tanggal__gte=options['dari'])
+        if options['sampai']:
+            laporan = laporan.filter(tanggal__lte=options['sampai'])
+
+        seharusnya = hitung_semua_ringkasan(laporan)
+        tersimpan = {r.pk: r for r in RingkasanLH.objects.filter(laporan__in=laporan)}
+
+        baru, ubah = [], []
+        for laporan_id, nilai in seharusnya.items():
+            ringkasan = tersimpan.get(laporan_id)
+            if ringkasan is None:
+                baru.append(RingkasanLH(laporan_id=laporan_id, **nilai))
+                continue
+            beda = [k for k in KOLOM_RINGKASAN if getattr(ringkasan, k) != nilai[k]]
+            if beda:
+                self.stdout.write(f"Laporan #{laporan_id} selisih di: {', '.join(beda)}")
+                for k in KOLOM_RINGKASAN:
+                    setattr(ringkasan, k, nilai[k])
+                ubah.append(ringkasan)
+
+        if not options['dry_run']:
+            with transaction.atomic():
+                RingkasanLH.objects.bulk_create(baru, batch_size=1000)
+                RingkasanLH.objects.bulk_update(ubah, KOLOM_RINGKASAN, batch_size=1000)
+                jumlah_rekap = bangun_ulang_rekap_harian(laporan)
+            self.stdout.write(f"{jumlah_rekap} baris rekap harian mitra diisi ulang.")
+
+        aksi = "perlu" if options['dry_run'] else "sudah"
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(seharusnya)} laporan dicek: {len(baru)} ringkasan {aksi} dibuat, {len(ubah)} {aksi} diperbaiki."
+        ))
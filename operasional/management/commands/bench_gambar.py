@@ -0,0 +1,114 @@
+import glob
+import io
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+
+def _pipeline_lama(path):
+    # Salinan pipeline sebelum decode-time downscaling (full decode + LANCZOS)
+    with open(path, 'rb') as f:
+        img = Image.open(f)
+        if img.mode in ("RGBA", "P"):
+            img = img.convert("RGB")
+        output = io.BytesIO()
+        max_width = 1200
+        if img.width > max_width:
+            ratio = max_width / float(img.width)
+            new_height = int(float(img.height) * float(ratio))
+            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+        img.save(output, format='JPEG', quality=70, optimize=True)
+        output.seek(0)
+        return len(output.read())
+
+
+def _pipeline_baru(path):
+    from operasional.gambar import olah_gambar
+    from django.core.files import File
+
+    with open(path, 'rb') as f:
+        hasil, thumbnail = olah_gambar(File(f, name=os.path.basename(path)))
+        return hasil.size
+
+
+def _rss_puncak_kb():
+    # VmHWM milik proses ini saja; ru_maxrss di Linux terbawa dari proses induk saat exec
+    try:
+        with open('/proc/self/status') as f:
+            for baris in f:
+                if baris.startswith('VmHWM:'):
+                    return int(baris.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _ukur(nama, paths, ulang, antrian):
+    # Jalan di proses terpisah supaya puncak RSS tiap pipeline tidak tercampur
+    import django
+    django.setup()
+    fungsi = {'lama': _pipeline_lama, 'baru': _pipeline_baru}[nama]
+    awal = _rss_puncak_kb()
+    waktu = []
+    for _ in range(ulang):
+        for path in paths:
+            mulai = time.perf_counter()
+            fungsi(path)
+            waktu.append((time.perf_counter() - mulai) * 1000)
+    puncak = _rss_puncak_kb()
+    antrian.put((awal, puncak, waktu))
+
+
+class Command(BaseCommand):
+    help = "Bandingkan latensi & puncak RSS pipeline foto lama vs baru."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--folder', help="Folder berisi foto contoh (*.jpg/*.jpeg/*.png).")
+        parser.add_argument('--ulang', type=int, default=3, help="Berapa kali tiap foto diproses.")
+        parser.add_argument('--jumlah', type=int, default=5,
+                            help="Jumlah foto sintetis 4000x3000 kalau --folder tidak diisi.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            if options['folder']:
+                paths = sorted(
+                    p for ext in ('jpg', 'jpeg', 'png', 'JPG', 'JPEG', 'PNG')
+                    for p in glob.glob(os.path.join(options['folder'], f'*.{ext}'))
+                )
+            else:
+                paths = self._foto_sintetis(tmp, options['jumlah'])
+            if not paths:
+                self.stderr.write("Tidak ada foto untuk diuji.")
+                return
+
+            self.stdout.write(f"{len(paths)} foto x {options['ulang']} ulangan\n")
+            self.stdout.write(f"{'pipeline':<10}{'median ms':>12}{'p95 ms':>10}{'RSS awal MB':>14}{'RSS puncak MB':>16}")
+            ctx = multiprocessing.get_context('spawn')
+            for nama in ('lama', 'baru'):
+                antrian = ctx.Queue()
+                proses = ctx.Process(target=_ukur, args=(nama, paths, options['ulang'], antrian))
+                proses.start()
+                awal, puncak, waktu = antrian.get()
+                proses.join()
+                waktu.sort()
+                p95 = waktu[min(len(waktu) - 1, int(len(waktu) * 0.95))]
+                self.stdout.write(
+                    f"{nama:<10}{statistics.median(waktu):>12.1f}{p95:>10.1f}"
+                    f"{awal / 1024:>14.1f}{puncak / 1024:>16.1f}"
+                )
+
+    def _foto_sintetis(self, folder, jumlah):
+        # Foto 12 MP dengan gradasi + noise, mendekati foto HP (bukan warna polos)
+        paths = []
+        for i in range(jumlah):
+            img = Image.effect_noise((4000, 3000), 40 + i * 5).convert('RGB')
+            img = Image.blend(img, Image.linear_gradient('L').resize((4000, 3000)).convert('RGB'), 0.5)
+            path = os.path.join(folder, f'contoh_{i}.jpg')
+            img.save(path, format='JPEG', quality=92)
+            paths.append(path)
+        return paths
@@ -0,0 +1,159 @@
+import datetime
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+# Bandingkan throughput request bersamaan: gunicorn sync (WSGI, Procfile lama) vs
+# gunicorn + uvicorn worker (ASGI, view dashboard/rekap/autocomplete async).
+# Server dijalankan sendiri oleh command ini di port lokal, lalu dibebani dari
+# banyak thread (keep-alive per thread) selama --durasi detik.
+SERVER = {
+    'wsgi': ['mmds_project.wsgi:application'],
+    'asgi': ['mmds_project.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+
+
+def _port_bebas():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _tunggu_siap(port, batas=30):
+    akhir = time.monotonic() + batas
+    while time.monotonic() < akhir:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def _sesi_login(username):
+    # Cookie sesi admin tanpa lewat form login
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+    from django.contrib.sessions.backends.db import SessionStore
+
+    try:
+        user = get_user_model().objects.get(username=username)
+    except get_user_model().DoesNotExist:
+        raise CommandError(f"User {username} tidak ditemukan.")
+    sesi = SessionStore()
+    sesi[SESSION_KEY] = str(user.pk)
+    sesi[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    sesi[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    sesi.create()
+    return f"{settings.SESSION_COOKIE_NAME}={sesi.session_key}"
+
+
+def _beban(host, port, path, cookie, konkuren, durasi):
+    akhir = time.monotonic() + durasi
+    waktu, gagal = [], [0]
+    kunci = threading.Lock()
+
+    def _pekerja(nomor):
+        koneksi = http.client.HTTPConnection(host, port, timeout=60)
+        lokal, salah, i = [], 0, nomor
+        while time.monotonic() < akhir:
+            tujuan = path[i % len(path)]
+            i += 1
+            mulai = time.perf_counter()
+            try:
+                koneksi.request('GET', tujuan, headers={'Cookie': cookie} if cookie else {})
+                respons = koneksi.getresponse()
+                respons.read()
+                if respons.status != 200:
+                    salah += 1
+            except (OSError, http.client.HTTPException):
+                salah += 1
+                koneksi.close()
+                koneksi = http.client.HTTPConnection(host, port, timeout=60)
+                continue
+            lokal.append(time.perf_counter() - mulai)
+        koneksi.close()
+        with kunci:
+            waktu.extend(lokal)
+            gagal[0] += salah
+
+    mulai = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=konkuren) as pool:
+        list(pool.map(_pekerja, range(konkuren)))
+    total = time.perf_counter() - mulai
+    waktu.sort()
+    return {
+        'request': len(waktu),
+        'gagal': gagal[0],
+        'rps': len(waktu) / total,
+        'p50': statistics.median(waktu) * 1000 if waktu else 0,
+        'p95': waktu[int(len(waktu) * 0.95) - 1] * 1000 if waktu else 0,
+    }
+
+
+class Command(BaseCommand):
+    help = ("Ukur throughput request bersamaan ke halaman admin: gunicorn sync (WSGI) "
+            "dibandingkan gunicorn + uvicorn worker (ASGI).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'keduanya'], default='keduanya')
+        parser.add_argument('--url', help="Ukur server yang sudah jalan (mis. http://127.0.0.1:8000), bukan menjalankan sendiri.")
+        parser.add_argument('--workers', type=int, default=2, help="Jumlah worker gunicorn.")
+        parser.add_argument('--konkuren', type=int, default=32, help="Jumlah request bersamaan.")
+        parser.add_argument('--durasi', type=float, default=10, help="Lama pengukuran per server (detik).")
+        parser.add_argument('--user', required=True, help="Username staf yang dipakai sesi login.")
+        parser.add_argument('--path', action='append', help="Path yang diminta bergantian (boleh berulang).")
+
+    def handle(self, *args, **options):
+        hari_ini = timezone.localdate()
+        awal_bulan = hari_ini.replace(day=1) - datetime.timedelta(days=1)
+        path = options['path'] or [
+            '/admin/',
+            f"/admin/operasional/rekaplaporan/?dari={awal_bulan.replace(day=1)}&sampai={hari_ini}",
+            '/admin/operasional/lhcabang/cari-mitra/?jenis=detail&term=',
+        ]
+        cookie = _sesi_login(options['user'])
+        self.stdout.write(
+            f"{options['konkuren']} request bersamaan, {options['durasi']:.0f} dtk, "
+            f"{options['workers']} worker, path: {', '.join(path)}"
+        )
+
+        if options['url']:
+            url = urlsplit(options['url'])
+            hasil = {options['url']: _beban(url.hostname, url.port or 80, path, cookie, options['konkuren'], options['durasi'])}
+        else:
+            mode = ['wsgi', 'asgi'] if options['server'] == 'keduanya' else [options['server']]
+            hasil = {m: self.ukur_server(m, path, cookie, options) for m in mode}
+
+        self.stdout.write(f"\n{'server':<24}{'request':>9}{'gagal':>7}{'req/dtk':>10}{'p50 ms':>9}{'p95 ms':>9}")
+        for nama, h in hasil.items():
+            self.stdout.write(
+                f"{nama:<24}{h['request']:>9}{h['gagal']:>7}{h['rps']:>10.1f}{h['p50']:>9.0f}{h['p95']:>9.0f}"
+            )
+
+    def ukur_server(self, mode, path, cookie, options):
+        port = _port_bebas()
+        perintah = [
+            sys.executable, '-m', 'gunicorn', *SERVER[mode], '-b', f'127.0.0.1:{port}',
+            '-w', str(options['workers']), '--log-level', 'warning',
+        ]
+        proses = subprocess.Popen(perintah, env=os.environ.copy())
+        try:
+            if not _tunggu_siap(port):
+                raise CommandError(f"Server {mode} tidak bisa dijalankan: {' '.join(perintah)}")
+            # Pemanasan: isi cache & koneksi tiap worker
+            _beban('127.0.0.1', port, path, cookie, options['workers'] * 2, 2)
+            self.stdout.write(f"  mengukur {mode} ...")
+            return _beban('127.0.0.1', port, path, cookie, options['konkuren'], options['durasi'])
+        finally:
+            proses.terminate()
+            proses.wait(timeout=30)
@@ -0,0 +1,44 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from operasional.bonus import hitung_bonus, posting_bonus
+
+
+class Command(BaseCommand):
+    help = "Hitung bonus pekanan mitra & cabang dari tier Aturan Perusahaan (draft), lalu posting sebagai pengeluaran BONUS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tanggal', help="Tanggal mana saja di pekan itu (YYYY-MM-DD). Default: pekan lalu.")
+        parser.add_argument('--posting', action='store_true', help="Simpan draft sebagai PengeluaranLH kategori BONUS.")
+
+    def handle(self, *args, **options):
+        if options['tanggal']:
+            try:
+                tanggal = datetime.date.fromisoformat(options['tanggal'])
+            except ValueError:
+                raise CommandError("Format tanggal harus YYYY-MM-DD.")
+        else:
+            tanggal = timezone.localdate() - datetime.timedelta(days=7)
+
+        mulai = time.perf_counter()
+        draft = hitung_bonus(tanggal)
+        durasi = (time.perf_counter() - mulai) * 1000
+
+        self.stdout.write(f"Bonus pekan {draft['pekan']} ({draft['mulai']} s/d {draft['selesai']}), dihitung {durasi:.0f} ms\n")
+        self.stdout.write(f"{'jenis':<8}{'penerima':<12}{'nama':<24}{'cabang':<8}{'hari':>5}{'dasar':>12}{'bonus':>12}")
+        for b in draft['baris']:
+            self.stdout.write(
+                f"{b['jenis']:<8}{b['mitra'] or '-':<12}{b['nama'][:23]:<24}{b['cabang']:<8}"
+                f"{b['hari']:>5}{b['dasar']:>12,}{b['nominal']:>12,}"
+            )
+        total = sum(b['nominal'] for b in draft['baris'])
+        self.stdout.write(f"\n{len(draft['baris'])} penerima, total Rp {total:,}")
+
+        if not options['posting']:
+            self.stdout.write("Draft saja. Jalankan ulang dengan --posting untuk menyimpan.")
+            return
+        jumlah = posting_bonus(draft)
+        self.stdout.write(self.style.SUCCESS(
+            f"{jumlah} pengeluaran BONUS dibuat ({len(draft['baris']) - jumlah} sudah pernah diposting)."
+        ))
@@ -0,0 +1,119 @@
+import hashlib
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import F, Max, Sum
+from django.utils.dateparse import parse_date
+from operasional.hitung_ulang import proses_potongan, yang_berubah
+from operasional.models import DetailLH
+from sistem.aturan import rentang_aturan
+
+KOLOM_HITUNG = ['target_minimal_rp', 'nilai_sisa_rp', 'selisih_rp']
+WAKTU_CHECKPOINT = 7 * 24 * 3600  # detik
+
+
+class Command(BaseCommand):
+    help = ("Hitung ulang target, nilai sisa & selisih DetailLH dengan harga per gram yang berlaku "
+            "di tanggal laporannya (UPDATE set-based per potongan). Bisa dry-run dan dilanjutkan kalau terhenti.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dari', help="Tanggal laporan awal (YYYY-MM-DD).")
+        parser.add_argument('--sampai', help="Tanggal laporan akhir (YYYY-MM-DD).")
+        parser.add_argument('--cabang', help="Kode cabang, pisahkan dengan koma.")
+        parser.add_argument('--harga', type=float, help="Paksa satu harga per gram (default: versi Aturan Perusahaan per tanggal).")
+        parser.add_argument('--ukuran', type=int, default=5000, help="Baris per potongan.")
+        parser.add_argument('--dry-run', action='store_true', help="Hanya tampilkan selisih, jangan simpan.")
+        parser.add_argument('--lanjut', action='store_true', help="Lanjutkan dari checkpoint run sebelumnya.")
+
+    def handle(self, *args, **options):
+        detail = DetailLH.objects.all()
+        if options['dari']:
+            detail = detail.filter(laporan_induk__tanggal__gte=options['dari'])
+        if options['sampai']:
+            detail = detail.filter(laporan_induk__tanggal__lte=options['sampai'])
+        if options['cabang']:
+            kode = [c.strip() for c in options['cabang'].split(',') if c.strip()]
+            detail = detail.filter(laporan_induk__cabang_id__in=kode)
+        # Satu segmen per versi aturan yang beririsan dengan rentang tanggal
+        if options['harga'] is not None:
+            segmen = [(None, None, options['harga'])]
+        else:
+            segmen = [
+                (mulai, sampai, aturan['harga'])
+                for mulai, sampai, aturan in rentang_aturan(
+                    parse_date(options['dari'] or ''), parse_date(options['sampai'] or ''),
+                )
+            ]
+
+        for mulai, sampai, harga in segmen:
+            bagian = detail
+            if mulai:
+                bagian = bagian.filter(laporan_induk__tanggal__gte=mulai)
+            if sampai:
+                bagian = bagian.filter(laporan_induk__tanggal__lte=sampai)
+            if len(segmen) > 1:
+                self.stdout.write(f"Laporan {mulai or 'awal'} s/d {sampai or 'sekarang'}:")
+            if options['dry_run']:
+                self.dry_run(bagian, harga)
+            else:
+                self.proses(bagian, harga, options, (mulai, sampai))
+
+    def proses(self, detail, harga, options, segmen):
+        # Checkpoint = pk terakhir yang sudah selesai, per kombinasi argumen & segmen
+        sidik = hashlib.sha1(repr((options['dari'], options['sampai'], options['cabang'], harga, segmen)).encode()).hexdigest()
+        kunci = f"operasional:hitung_ulang_detail:{sidik}"
+        pk_terakhir = 0
+        tersimpan = cache.get(kunci)
+        if tersimpan and options['lanjut']:
+            pk_terakhir = tersimpan
+            self.stdout.write(f"Melanjutkan dari DetailLH #{pk_terakhir}.")
+        elif tersimpan:
+            self.stdout.write(f"Ada checkpoint di DetailLH #{tersimpan}, mulai dari awal (pakai --lanjut untuk melanjutkan).")
+
+        total = detail.filter(pk__gt=pk_terakhir).count()
+        self.stdout.write(f"{total} baris DetailLH, harga {harga}/gr")
+        mulai = time.perf_counter()
+        diproses = berubah = 0
+        urut = detail.order_by('pk').values_list('pk', flat=True)
+        while True:
+            # Batas potongan dari index pk (keyset), tanpa OFFSET
+            batas = list(urut.filter(pk__gt=pk_terakhir)[options['ukuran'] - 1:options['ukuran']])
+            if batas:
+                batas, jumlah = batas[0], options['ukuran']
+            else:
+                sisa = detail.filter(pk__gt=pk_terakhir).aggregate(batas=Max('pk'))
+                if sisa['batas'] is None:
+                    break
+                batas, jumlah = sisa['batas'], total - diproses
+            berubah += proses_potongan(detail, harga, pk_terakhir, batas)
+            cache.set(kunci, batas, WAKTU_CHECKPOINT)
+            pk_terakhir = batas
+            diproses += jumlah
+            durasi = time.perf_counter() - mulai
+            self.stdout.write(
+                f"  {diproses}/{total} ({diproses * 100 // max(total, 1)}%)  berubah {berubah}  "
+                f"{diproses / max(durasi, 1e-6):,.0f} baris/dtk"
+            )
+
+        cache.delete(kunci)
+        self.stdout.write(self.style.SUCCESS(
+            f"{berubah} dari {diproses} baris diperbarui dalam {time.perf_counter() - mulai:.1f} dtk "
+            f"(ringkasan laporan & rekap harian ikut diperbarui)."
+        ))
+
+    def dry_run(self, detail, harga):
+        berubah = yang_berubah(detail, harga)
+        hasil = berubah.aggregate(
+            delta=Sum(F('selisih_rp_baru') - F('selisih_rp')),
+        )
+        jumlah = berubah.count()
+        contoh = berubah.order_by('pk').values('pk', *KOLOM_HITUNG, *(f'{k}_baru' for k in KOLOM_HITUNG))[:10]
+        for baris in contoh:
+            beda = ', '.join(
+                f"{k} {baris[k]:,} -> {baris[f'{k}_baru']:,}" for k in KOLOM_HITUNG if baris[k] != baris[f'{k}_baru']
+            )
+            self.stdout.write(f"  DetailLH #{baris['pk']}: {beda}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{jumlah} dari {detail.count()} baris akan berubah (harga {harga}/gr), "
+            f"total selisih berubah Rp {hasil['delta'] or 0:,}. Dry-run, tidak ada yang disimpan."
+        ))
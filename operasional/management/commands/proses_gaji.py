@@ -0,0 +1,45 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from operasional.gaji import proses_periode
+from operasional.models import PeriodeGaji
+
+
+class Command(BaseCommand):
+    help = "Buat/perbarui slip gaji satu bulan. Aman diulang: hanya slip yang datanya berubah yang ditulis."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bulan', help="Bulan penggajian (YYYY-MM). Default: bulan lalu.")
+        parser.add_argument('--proses', type=int, default=1, help="Jumlah proses paralel (per cabang).")
+        parser.add_argument('--final', action='store_true', help="Kunci periode setelah diproses.")
+
+    def handle(self, *args, **options):
+        if options['bulan']:
+            try:
+                bulan = datetime.datetime.strptime(options['bulan'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError("Format bulan harus YYYY-MM.")
+        else:
+            bulan = (timezone.localdate().replace(day=1) - datetime.timedelta(days=1)).replace(day=1)
+
+        periode, _ = PeriodeGaji.objects.get_or_create(bulan=bulan)
+        if periode.status == 'FINAL':
+            raise CommandError(f"{periode} sudah final, tidak diproses ulang.")
+
+        def laporan(h):
+            self.stdout.write(f"  cabang {h['cabang'] or '-':<8} baru {h['baru']:>4}  berubah {h['ubah']:>4}  tetap {h['tetap']:>4}")
+
+        mulai = time.perf_counter()
+        self.stdout.write(f"{periode} ({options['proses']} proses)")
+        hasil, terhapus = proses_periode(periode, options['proses'], laporan)
+        durasi = time.perf_counter() - mulai
+
+        if options['final']:
+            periode.status = 'FINAL'
+            periode.save(update_fields=['status'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(hasil)} cabang, {sum(h['baru'] for h in hasil)} slip baru, "
+            f"{sum(h['ubah'] for h in hasil)} diperbarui, {sum(h['tetap'] for h in hasil)} tidak berubah, "
+            f"{terhapus} dihapus ({durasi:.1f} dtk)."
+        ))
@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from operasional.antrean import proses_gambar
+from operasional.gambar import MENUNGGU, PROSES, GAGAL
+from operasional.models import PengeluaranLH, SetorPusat
+
+
+class Command(BaseCommand):
+    help = "Proses foto nota/transfer yang masih menunggu di antrean (cadangan thread pool)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ulang', action='store_true',
+                            help="Masukkan lagi foto berstatus GAGAL/PROSES (mis. worker mati) ke antrean.")
+        parser.add_argument('--terus', action='store_true',
+                            help="Jalan terus sebagai worker, cek antrean tiap beberapa detik.")
+        parser.add_argument('--jeda', type=int, default=5, help="Jeda antar pengecekan (detik) untuk --terus.")
+
+    def handle(self, *args, **options):
+        if options['ulang']:
+            for model in (PengeluaranLH, SetorPusat):
+                model.objects.filter(status_gambar__in=[GAGAL, PROSES]).update(status_gambar=MENUNGGU)
+
+        while True:
+            jumlah = self._habiskan()
+            if jumlah:
+                self.stdout.write(f"{jumlah} foto selesai diproses.")
+            if not options['terus']:
+                break
+            time.sleep(options['jeda'])
+
+    def _habiskan(self):
+        jumlah = 0
+        for model in (PengeluaranLH, SetorPusat):
+            antre = model.objects.filter(status_gambar=MENUNGGU).values_list('pk', flat=True)
+            for pk in antre.iterator():
+                if proses_gambar(model, pk):
+                    jumlah += 1
+        return jumlah
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operasional', '0003_rename_potongan_obat_detaillh_potongan_parkir_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pengeluaranlh',
+            name='status_gambar',
+            field=models.CharField(choices=[('SELESAI', 'Selesai'), ('MENUNGGU', 'Menunggu'), ('PROSES', 'Diproses'), ('GAGAL', 'Gagal')], default='SELESAI', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='pengeluaranlh',
+            name='thumbnail_nota',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='nota_cabang/thumb/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='setorpusat',
+            name='status_gambar',
+            field=models.CharField(choices=[('SELESAI', 'Selesai'), ('MENUNGGU', 'Menunggu'), ('PROSES', 'Diproses'), ('GAGAL', 'Gagal')], default='SELESAI', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='setorpusat',
+            name='thumbnail_transfer',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='setoran_pusat/thumb/%Y/%m/'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:41
+
+import operasional.gambar
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operasional', '0004_status_gambar_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pengeluaranlh',
+            name='bukti_nota',
+            field=models.ImageField(blank=True, null=True, upload_to='nota_cabang/%Y/%m/', validators=[operasional.gambar.validasi_ukuran_gambar]),
+        ),
+        migrations.AlterField(
+            model_name='setorpusat',
+            name='bukti_transfer',
+            field=models.ImageField(upload_to='setoran_pusat/%Y/%m/', validators=[operasional.gambar.validasi_ukuran_gambar]),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def isi_ringkasan(apps, schema_editor):
+    # Isi ringkasan untuk laporan yang sudah ada (2 query agregat + bulk_create)
+    LHCabang = apps.get_model('operasional', 'LHCabang')
+    DetailLH = apps.get_model('operasional', 'DetailLH')
+    PengeluaranLH = apps.get_model('operasional', 'PengeluaranLH')
+    RingkasanLH = apps.get_model('operasional', 'RingkasanLH')
+
+    detail = {
+        d['laporan_induk']: d for d in DetailLH.objects.values('laporan_induk').annotate(
+            cash=Sum('cash_diterima'), omzet=Sum('omzet_bruto_rp'), selisih=Sum('selisih_rp'),
+            hadir=Count('id', filter=Q(status_kehadiran='H')), minus=Count('id', filter=Q(selisih_rp__lt=0)),
+        )
+    }
+    keluar = dict(PengeluaranLH.objects.values_list('laporan_induk').annotate(total=Sum('nominal')))
+    baris = []
+    for laporan_id in LHCabang.objects.values_list('pk', flat=True).iterator():
+        d = detail.get(laporan_id, {})
+        baris.append(RingkasanLH(
+            laporan_id=laporan_id,
+            total_cash=d.get('cash') or 0,
+            total_pengeluaran=keluar.get(laporan_id) or 0,
+            total_omzet=d.get('omzet') or 0,
+            total_selisih=d.get('selisih') or 0,
+            jumlah_hadir=d.get('hadir', 0),
+            jumlah_minus=d.get('minus', 0),
+        ))
+    RingkasanLH.objects.bulk_create(baris, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operasional', '0005_validasi_ukuran_gambar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RingkasanLH',
+            fields=[
+                ('laporan', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ringkasan', serialize=False, to='operasional.lhcabang')),
+                ('total_cash', models.PositiveIntegerField(default=0)),
+                ('total_pengeluaran', models.PositiveIntegerField(default=0)),
+                ('total_omzet', models.PositiveIntegerField(default=0)),
+                ('total_selisih', models.IntegerField(default=0)),
+                ('jumlah_hadir', models.PositiveIntegerField(default=0)),
+                ('jumlah_minus', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Ringkasan Laporan',
+            },
+        ),
+        migrations.RunPython(isi_ringkasan, migrations.RunPython.noop),
+    ]
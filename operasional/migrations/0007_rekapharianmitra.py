@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def isi_rekap_harian(apps, schema_editor):
+    # Isi rollup dari semua DetailLH yang sudah ada
+    DetailLH = apps.get_model('operasional', 'DetailLH')
+    RekapHarianMitra = apps.get_model('operasional', 'RekapHarianMitra')
+    baris = DetailLH.objects.values(
+        'laporan_induk', 'laporan_induk__tanggal', 'laporan_induk__cabang', 'mitra'
+    ).annotate(
+        durasi=Sum('durasi_kerja'), omzet=Sum('omzet_bruto_rp'),
+        minus=Sum('selisih_rp', filter=Q(selisih_rp__lt=0)), baris=Count('id'),
+    ).order_by()
+    RekapHarianMitra.objects.bulk_create([
+        RekapHarianMitra(
+            laporan_id=d['laporan_induk'], tanggal=d['laporan_induk__tanggal'],
+            cabang_id=d['laporan_induk__cabang'], mitra_id=d['mitra'],
+            total_durasi=d['durasi'] or 0, total_omzet=d['omzet'] or 0,
+            total_minus=d['minus'] or 0, jumlah_baris=d['baris'],
+        )
+        for d in baris.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operasional', '0006_ringkasanlh'),
+        ('perusahaan', '0003_remove_karyawan_alamat_alter_karyawan_nomor_hp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RekapHarianMitra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField()),
+                ('total_durasi', models.PositiveIntegerField(default=0, help_text='Dalam menit')),
+                ('total_omzet', models.PositiveIntegerField(default=0)),
+                ('total_minus', models.IntegerField(default=0, help_text='Jumlah selisih yang negatif saja')),
+                ('jumlah_baris', models.PositiveIntegerField(default=0)),
+                ('cabang', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='perusahaan.cabang')),
+                ('laporan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rekap_harian', to='operasional.lhcabang')),
+                ('mitra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='perusahaan.karyawan')),
+            ],
+            options={
+                'verbose_name_plural': 'Rekap Harian Mitra',
+                'indexes': [models.Index(fields=['tanggal', 'cabang'], name='rekap_harian_tgl_cabang')],
+                'constraints': [models.UniqueConstraint(fields=('tanggal', 'cabang', 'mitra'), name='rekap_harian_unik')],
+            },
+        ),
+        migrations.RunPython(isi_rekap_harian, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operasional', '0007_rekapharianmitra'),
+        ('perusahaan', '0005_karyawan_peran'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detaillh',
+            name='mitra',
+            field=models.ForeignKey(limit_choices_to={'peran': 'MITRA'}, on_delete=django.db.models.deletion.PROTECT, to='perusahaan.karyawan'),
+        ),
+        migrations.AlterField(
+            model_name='pengeluaranlh',
+            name='mitra',
+            field=models.ForeignKey(blank=True, help_text="Klik 'Save and Continue Editing' agar daftar mitra yang bertugas hari ini muncul.", limit_choices_to={'peran__in': ['MITRA', 'KACAB']}, null=True, on_delete=django.db.models.deletion.SET_NULL, to='perusahaan.karyawan'),
+        ),
+    ]
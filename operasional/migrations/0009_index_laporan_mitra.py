@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operasional', '0008_alter_detaillh_mitra_alter_pengeluaranlh_mitra'),
+        ('perusahaan', '0006_karyawan_nomor_hp_normal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detaillh',
+            index=models.Index(fields=['mitra', 'laporan_induk'], name='detaillh_mitra_laporan_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lhcabang',
+            index=models.Index(fields=['-tanggal', 'cabang'], name='lhcabang_tanggal_cabang_idx'),
+        ),
+    ]
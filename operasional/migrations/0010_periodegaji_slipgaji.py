@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operasional', '0009_index_laporan_mitra'),
+        ('perusahaan', '0006_karyawan_nomor_hp_normal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodeGaji',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bulan', models.DateField(help_text='Tanggal 1 bulan penggajian', unique=True)),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('FINAL', 'Final')], default='DRAFT', max_length=10)),
+                ('diproses_pada', models.DateTimeField(blank=True, editable=False, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Periode Gaji',
+                'ordering': ['-bulan'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SlipGaji',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jumlah_hadir', models.PositiveIntegerField(default=0)),
+                ('jumlah_sakit', models.PositiveIntegerField(default=0)),
+                ('jumlah_izin', models.PositiveIntegerField(default=0)),
+                ('jumlah_alfa', models.PositiveIntegerField(default=0)),
+                ('gaji_pokok', models.PositiveIntegerField(default=0)),
+                ('insentif_kehadiran', models.PositiveIntegerField(default=0)),
+                ('bonus', models.PositiveIntegerField(default=0)),
+                ('potongan_kasbon', models.PositiveIntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('sidik', models.CharField(editable=False, max_length=40)),
+                ('diperbarui', models.DateTimeField(auto_now=True)),
+                ('cabang', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='perusahaan.cabang')),
+                ('karyawan', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='perusahaan.karyawan')),
+                ('periode', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slip', to='operasional.periodegaji')),
+            ],
+            options={
+                'verbose_name_plural': 'Slip Gaji',
+                'constraints': [models.UniqueConstraint(fields=('periode', 'karyawan'), name='slip_gaji_unik')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operasional', '0010_periodegaji_slipgaji'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KirimanLaporan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kunci', models.CharField(max_length=64)),
+                ('sidik', models.CharField(help_text='SHA-256 isi kiriman', max_length=64)),
+                ('status', models.PositiveSmallIntegerField(default=0)),
+                ('respons', models.JSONField(default=dict)),
+                ('dibuat', models.DateTimeField(auto_now_add=True)),
+                ('laporan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='operasional.lhcabang')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Kiriman Laporan',
+                'indexes': [models.Index(fields=['dibuat'], name='kiriman_dibuat_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'kunci'), name='kiriman_kunci_unik')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operasional', '0011_kirimanlaporan'),
+        ('perusahaan', '0006_karyawan_nomor_hp_normal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerubahanLaporan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tanggal', models.DateField()),
+                ('dibuat', models.DateTimeField(auto_now_add=True)),
+                ('cabang', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='perusahaan.cabang')),
+            ],
+            options={
+                'verbose_name_plural': 'Perubahan Laporan',
+                'indexes': [models.Index(fields=['dibuat'], name='perubahan_dibuat_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operasional', '0012_perubahanlaporan'),
+        ('perusahaan', '0007_karyawan_bisa_mitra'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detaillh',
+            name='mitra',
+            field=models.ForeignKey(limit_choices_to={'bisa_mitra': True}, on_delete=django.db.models.deletion.PROTECT, to='perusahaan.karyawan'),
+        ),
+        migrations.AlterField(
+            model_name='pengeluaranlh',
+            name='mitra',
+            field=models.ForeignKey(blank=True, help_text="Klik 'Save and Continue Editing' agar daftar mitra yang bertugas hari ini muncul.", limit_choices_to=models.Q(('bisa_mitra', True), ('peran', 'KACAB'), _connector='OR'), null=True, on_delete=django.db.models.deletion.SET_NULL, to='perusahaan.karyawan'),
+        ),
+    ]
@@ -2,12 +2,13 @@ from django.db import models
 from django.db.models import Q
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError # edit pesan error
-from django.core.files.base import ContentFile
 from django.utils import timezone
-import io
-from PIL import Image
 from perusahaan.models import Karyawan, Cabang
-from sistem.models import AturanPerusahaan
+from perusahaan.peran import KEPALA_CABANG
+from sistem.aturan import get_aturan as ambil_aturan
+from .antrean import antrekan_gambar
+from .ringkasan import ambil_ringkasan
+from .gambar import STATUS_GAMBAR, SELESAI, MENUNGGU, perlu_kompres, validasi_ukuran_gambar
 
 class LHCabang(models.Model):
     cabang = models.ForeignKey(Cabang, on_delete=models.CASCADE)
@@ -24,13 +25,17 @@ class LHCabang(models.Model):
     class Meta:
         verbose_name_plural = "Laporan Harian"
         unique_together = ('cabang', 'tanggal')
+        indexes = [
+            # daftar laporan terbaru dulu (admin, dashboard)
+            models.Index(fields=['-tanggal', 'cabang'], name='lhcabang_tanggal_cabang_idx'),
+        ]
 
     def __str__(self):
         return f"{self.cabang} - {self.tanggal}"
 
 class DetailLH(models.Model):
     laporan_induk = models.ForeignKey(LHCabang, related_name='detail_lh', on_delete=models.CASCADE)
-    mitra = models.ForeignKey(Karyawan, on_delete=models.PROTECT, limit_choices_to={'jabatan__icontains': 'mitra'})
+    mitra = models.ForeignKey(Karyawan, on_delete=models.PROTECT, limit_choices_to={'bisa_mitra': True})
 
     STATUS_KEHADIRAN = [
         ('H', 'Hadir'),
@@ -62,19 +67,34 @@ class DetailLH(models.Model):
 
     class Meta:
         verbose_name_plural = "Detail LH"
+        indexes = [
+            # cek duplikat mitra per tanggal, rekap per mitra
+            models.Index(fields=['mitra', 'laporan_induk'], name='detaillh_mitra_laporan_idx'),
+        ]
 
     ##### ISTIRAHATKAN MATA DULU DI SINI ####
 
     def get_aturan(self):
-        aturan = AturanPerusahaan.objects.first()
-        if not aturan:
-            return {'harga': 92}  # Langsung angka saja
-        return {'harga': aturan.harga_per_gram_target}
+        # Aturan yang berlaku di tanggal laporannya, dicari di cache aturan per proses
+        # (bukan query tiap save), jadi edit laporan lama tetap pakai harga lama
+        return ambil_aturan(self.laporan_induk.tanggal if self.laporan_induk_id else None)
+
+    # Dipakai formset batch: cek duplikat sudah dilakukan sekaligus di formset
+    cek_duplikat = True
+
+    @staticmethod
+    def pesan_duplikat(mitra, induk_lama, induk_baru):
+        # Logika pesan simpel: Jika di cabang sama vs cabang berbeda
+        if induk_lama.cabang_id == induk_baru.cabang_id:
+            msg = f"sudah terdaftar di laporan ini."
+        else:
+            msg = f"sedang bertugas di {induk_lama.cabang.nama_cabang}."
+        return f"Maaf, {mitra.nama_lengkap} {msg} Mohon periksa kembali."
 
     # Validasi: Cek apakah mitra sudah diinput di tanggal yang sama
     def clean(self):
         # Guard clause: pastikan data yang dibutuhkan ada
-        if not (self.mitra and self.laporan_induk):
+        if not (self.cek_duplikat and self.mitra and self.laporan_induk):
             return
         # Ambil data duplikat dalam 1 query (select_related)
         duplikat = DetailLH.objects.filter(
@@ -83,18 +103,10 @@ class DetailLH(models.Model):
         ).exclude(pk=self.pk).select_related('laporan_induk__cabang').first()
         # Jika ditemukan duplikat, susun pesan erornya
         if duplikat:
-            induk_lama = duplikat.laporan_induk
-            induk_baru = self.laporan_induk
-            # Logika pesan simpel: Jika di cabang sama vs cabang berbeda
-            if induk_lama.cabang == induk_baru.cabang:
-                msg = f"sudah terdaftar di laporan ini."
-            else:
-                msg = f"sedang bertugas di {induk_lama.cabang.nama_cabang}."
-            raise ValidationError(f"Maaf, {self.mitra.nama_lengkap} {msg} Mohon periksa kembali.")
-            
-    def save(self, *args, **kwargs):
-        self.full_clean() # cek semua data sebelum masukkan data baru
+            raise ValidationError(self.pesan_duplikat(self.mitra, duplikat.laporan_induk, self.laporan_induk))
 
+    # Hitung semua kolom permanen (tanpa query), dipakai save() dan formset batch
+    def hitung_otomatis(self, harga):
         # --- JIKA MITRA TIDAK HADIR ---
         if self.status_kehadiran != 'H':
             # Nol kan semua field angka
@@ -103,10 +115,6 @@ class DetailLH(models.Model):
             # Set durasi kerja langsung ke "-"
             self.durasi_kerja = 0
 
-        # ambil harga per gr
-        aturan = self.get_aturan()
-        harga = aturan['harga']
-
         self.target_minimal_rp = (self.adonan_bawa_gr or 0) * harga       
 
         potongan = [
@@ -127,6 +135,13 @@ class DetailLH(models.Model):
         else:
             self.durasi_kerja = 0
 
+    def save(self, *args, **kwargs):
+        self.full_clean() # cek semua data sebelum masukkan data baru
+
+        # ambil harga per gr
+        aturan = self.get_aturan()
+        self.hitung_otomatis(aturan['harga'])
+
         super().save(*args, **kwargs) #masukkan ke database
 
 class PengeluaranLH(models.Model):
@@ -144,36 +159,28 @@ class PengeluaranLH(models.Model):
     laporan_induk = models.ForeignKey(LHCabang, related_name='pengeluaran_op', on_delete=models.CASCADE)
     kategori = models.CharField(max_length=20, choices=KATEGORI_PILIHAN, default='OPERASIONAL')
     mitra = models.ForeignKey('perusahaan.Karyawan', on_delete=models.SET_NULL, null=True, blank=True,
-        limit_choices_to=Q(jabatan__icontains='mitra') | Q(jabatan__icontains='kepala cabang'),
+        limit_choices_to=Q(bisa_mitra=True) | Q(peran=KEPALA_CABANG),
         help_text="Klik 'Save and Continue Editing' agar daftar mitra yang bertugas hari ini muncul."
     )
     item = models.CharField(max_length=100, null=True, blank=True, help_text="Contoh: Air Galon / Kasbon Agus")
     nominal = models.PositiveIntegerField(default=0)
-    bukti_nota = models.ImageField(upload_to='nota_cabang/%Y/%m/', null=True, blank=True)
+    bukti_nota = models.ImageField(upload_to='nota_cabang/%Y/%m/', null=True, blank=True,
+        validators=[validasi_ukuran_gambar])
+    thumbnail_nota = models.ImageField(upload_to='nota_cabang/thumb/%Y/%m/', null=True, blank=True, editable=False)
+    status_gambar = models.CharField(max_length=10, choices=STATUS_GAMBAR, default=SELESAI, editable=False)
 
-    # kompres foto
+    # dipakai antrean foto (operasional/antrean.py)
+    FIELD_GAMBAR = 'bukti_nota'
+    FIELD_THUMBNAIL = 'thumbnail_nota'
+
+    # kompres foto di latar belakang (hanya saat upload baru)
     def save(self, *args, **kwargs):
-        if self.bukti_nota:
-            img = Image.open(self.bukti_nota)
-
-            if img.mode in ("RGBA", "P"): #jika file PNG, ubah ke RGB
-                img = img.convert("RGB")
-            output = io.BytesIO() #kompres foto
-
-            # Resize jika lebih lebar dari 1200px
-            max_width = 1200
-            if img.width > max_width:
-                ratio = max_width / float(img.width)
-                new_height = int(float(img.height) * float(ratio))
-                img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-
-            # Masukkan kembali ke field bukti_transfer
-            img.save(output, format='JPEG', quality=70, optimize=True)
-            output.seek(0)
-
-            # Masukkan kembali ke field bukti_transfer
-            self.bukti_nota = ContentFile(output.read(), name=self.bukti_nota.name)
+        upload_baru = perlu_kompres(self.bukti_nota)
+        if upload_baru:
+            self.status_gambar = MENUNGGU
         super().save(*args, **kwargs)
+        if upload_baru:
+            antrekan_gambar(self)
 
     class Meta:
         verbose_name_plural = "Pengeluaran"
@@ -183,48 +190,153 @@ class SetorPusat(models.Model):
     total_cash_mitra = models.PositiveIntegerField(default=0)
     total_pengeluaran = models.PositiveIntegerField(default=0)
     nominal_setor = models.PositiveIntegerField(default=0)
-    bukti_transfer = models.ImageField(upload_to='setoran_pusat/%Y/%m/')
+    bukti_transfer = models.ImageField(upload_to='setoran_pusat/%Y/%m/', validators=[validasi_ukuran_gambar])
+    thumbnail_transfer = models.ImageField(upload_to='setoran_pusat/thumb/%Y/%m/', null=True, blank=True, editable=False)
+    status_gambar = models.CharField(max_length=10, choices=STATUS_GAMBAR, default=SELESAI, editable=False)
+
+    # dipakai antrean foto (operasional/antrean.py)
+    FIELD_GAMBAR = 'bukti_transfer'
+    FIELD_THUMBNAIL = 'thumbnail_transfer'
 
     def save(self, *args, **kwargs):
         # PROTEKSI: Jika tidak ada bukti transfer, jangan simpan apapun ke tabel ini
         if not self.bukti_transfer:
             return # Batalkan proses simpan
             
-        # Jika ada foto, baru jalankan hitungan untuk "mengunci" angka ke database
-        from django.db.models import Sum
-        cash = self.laporan_induk.detail_lh.aggregate(total=Sum('cash_diterima'))['total'] or 0
-        keluar = self.laporan_induk.pengeluaran_op.aggregate(total=Sum('nominal'))['total'] or 0
+        # Jika ada foto, baru "kunci" angka dari ringkasan laporan ke database
+        ringkasan = ambil_ringkasan(self.laporan_induk, segar=True)
         
-        self.total_cash_mitra = cash
-        self.total_pengeluaran = keluar
-        self.nominal_setor = cash - keluar
+        self.total_cash_mitra = ringkasan.total_cash
+        self.total_pengeluaran = ringkasan.total_pengeluaran
+        self.nominal_setor = ringkasan.wajib_setor
         
-        ## -- KOMPRES FOTO --
-        if self.bukti_transfer:
-            img = Image.open(self.bukti_transfer)
+        ## -- KOMPRES FOTO di latar belakang (hanya saat upload baru) --
+        upload_baru = perlu_kompres(self.bukti_transfer)
+        if upload_baru:
+            self.status_gambar = MENUNGGU
 
-            if img.mode in ("RGBA", "P"): #jika file PNG, ubah ke RGB
-                img = img.convert("RGB")
-            output = io.BytesIO() #kompres foto
+        super().save(*args, **kwargs)
+        if upload_baru:
+            antrekan_gambar(self)
 
-            # Resize jika lebih lebar dari 1200px
-            max_width = 1200
-            if img.width > max_width:
-                ratio = max_width / float(img.width)
-                new_height = int(float(img.height) * float(ratio))
-                img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+    class Meta:
+        verbose_name_plural = "Setor Harian"
 
-            # Simpan dengan kompresi JPEG
-            img.save(output, format='JPEG', quality=70, optimize=True)
-            output.seek(0)
+class RingkasanLH(models.Model):
+    # Total per laporan, dijaga otomatis setiap DetailLH/PengeluaranLH berubah
+    # (lihat operasional/ringkasan.py). Cek ulang: manage.py bangun_ulang_ringkasan
+    laporan = models.OneToOneField(LHCabang, on_delete=models.CASCADE, primary_key=True, related_name='ringkasan')
+    total_cash = models.PositiveIntegerField(default=0)
+    total_pengeluaran = models.PositiveIntegerField(default=0)
+    total_omzet = models.PositiveIntegerField(default=0)
+    total_selisih = models.IntegerField(default=0)
+    jumlah_hadir = models.PositiveIntegerField(default=0)
+    jumlah_minus = models.PositiveIntegerField(default=0)
 
-            # Masukkan kembali ke field bukti_transfer
-            self.bukti_transfer = ContentFile(output.read(), name=self.bukti_transfer.name)
+    class Meta:
+        verbose_name_plural = "Ringkasan Laporan"
+
+    @property
+    def wajib_setor(self):
+        return self.total_cash - self.total_pengeluaran
+
+class KirimanLaporan(models.Model):
+    # Kunci idempotensi endpoint kirim laporan (operasional/kiriman.py): kiriman ulang
+    # dengan kunci yang sama dijawab dengan respons tersimpan, tidak disimpan dua kali
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    kunci = models.CharField(max_length=64)
+    sidik = models.CharField(max_length=64, help_text="SHA-256 isi kiriman")
+    laporan = models.ForeignKey(LHCabang, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.PositiveSmallIntegerField(default=0)
+    respons = models.JSONField(default=dict)
+    dibuat = models.DateTimeField(auto_now_add=True)
 
-        super().save(*args, **kwargs)
+    class Meta:
+        verbose_name_plural = "Kiriman Laporan"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kunci'], name='kiriman_kunci_unik'),
+        ]
+        indexes = [
+            models.Index(fields=['dibuat'], name='kiriman_dibuat_idx'),
+        ]
+
+class PerubahanLaporan(models.Model):
+    # Feed perubahan angka laporan untuk stream dashboard (operasional/siaran.py).
+    # id baris = id event SSE; hanya ditulis kalau settings.STREAM_KPI, baris lama
+    # dibersihkan berkala oleh penulis dan pembaca feed
+    tanggal = models.DateField()
+    cabang = models.ForeignKey(Cabang, on_delete=models.CASCADE)
+    dibuat = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        verbose_name_plural = "Setor Harian"
+        verbose_name_plural = "Perubahan Laporan"
+        indexes = [
+            models.Index(fields=['dibuat'], name='perubahan_dibuat_idx'),
+        ]
+
+class RekapHarianMitra(models.Model):
+    # Rollup harian per mitra untuk Evaluasi Kinerja Mitra, diisi ulang setiap
+    # laporan berubah (lihat operasional/rekap.py). Tanpa join ke LHCabang/DetailLH.
+    laporan = models.ForeignKey(LHCabang, on_delete=models.CASCADE, related_name='rekap_harian')
+    tanggal = models.DateField()
+    cabang = models.ForeignKey(Cabang, on_delete=models.CASCADE)
+    mitra = models.ForeignKey(Karyawan, on_delete=models.CASCADE)
+    total_durasi = models.PositiveIntegerField(default=0, help_text="Dalam menit")
+    total_omzet = models.PositiveIntegerField(default=0)
+    total_minus = models.IntegerField(default=0, help_text="Jumlah selisih yang negatif saja")
+    jumlah_baris = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Rekap Harian Mitra"
+        constraints = [
+            models.UniqueConstraint(fields=['tanggal', 'cabang', 'mitra'], name='rekap_harian_unik'),
+        ]
+        indexes = [
+            models.Index(fields=['tanggal', 'cabang'], name='rekap_harian_tgl_cabang'),
+        ]
+
+class PeriodeGaji(models.Model):
+    # Satu periode penggajian per bulan, slipnya dibuat `manage.py proses_gaji` (operasional/gaji.py)
+    STATUS_PILIHAN = [
+        ('DRAFT', 'Draft'),
+        ('FINAL', 'Final'),
+    ]
+    bulan = models.DateField(unique=True, help_text="Tanggal 1 bulan penggajian")
+    status = models.CharField(max_length=10, choices=STATUS_PILIHAN, default='DRAFT')
+    diproses_pada = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        verbose_name_plural = "Periode Gaji"
+        ordering = ['-bulan']
+
+    def __str__(self):
+        return f"Gaji {self.bulan:%Y-%m}"
+
+class SlipGaji(models.Model):
+    periode = models.ForeignKey(PeriodeGaji, on_delete=models.CASCADE, related_name='slip')
+    karyawan = models.ForeignKey(Karyawan, on_delete=models.PROTECT)
+    cabang = models.ForeignKey(Cabang, on_delete=models.SET_NULL, null=True, blank=True)
+    jumlah_hadir = models.PositiveIntegerField(default=0)
+    jumlah_sakit = models.PositiveIntegerField(default=0)
+    jumlah_izin = models.PositiveIntegerField(default=0)
+    jumlah_alfa = models.PositiveIntegerField(default=0)
+    gaji_pokok = models.PositiveIntegerField(default=0)
+    insentif_kehadiran = models.PositiveIntegerField(default=0)
+    bonus = models.PositiveIntegerField(default=0)
+    potongan_kasbon = models.PositiveIntegerField(default=0)
+    total = models.IntegerField(default=0)
+    # Hash semua masukan slip; proses ulang hanya menulis slip yang hash-nya berubah
+    sidik = models.CharField(max_length=40, editable=False)
+    diperbarui = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Slip Gaji"
+        constraints = [
+            models.UniqueConstraint(fields=['periode', 'karyawan'], name='slip_gaji_unik'),
+        ]
+
+    def __str__(self):
+        return f"{self.periode} - {self.karyawan}"
 
 class RekapLaporan(models.Model):
     class Meta:
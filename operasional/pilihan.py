@@ -0,0 +1,80 @@
+import hashlib
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Q
+from perusahaan.akses import cakupan, saring_cabang, versi_akses
+from perusahaan.models import Cabang, Karyawan
+from perusahaan.peran import KEPALA_CABANG, MITRA
+from .models import DetailLH, LHCabang, PengeluaranLH
+
+# Sumber pilihan mitra untuk inline LHCabang. Dipakai form (validasi & label
+# opsi terpilih) dan endpoint autocomplete, jadi batasannya selalu sama.
+PER_HALAMAN = 20
+WAKTU_CACHE = 300  # detik
+
+# Peran yang boleh dipilih per inline (sama dengan limit_choices_to di model;
+# MITRA = bisa_mitra, lihat perusahaan.peran.anggota_peran)
+PERAN_JENIS = {
+    'detail': (MITRA,),
+    'pengeluaran': (MITRA, KEPALA_CABANG),
+}
+
+
+def pilihan_mitra(user, jenis, laporan_id=None):
+    if jenis == 'pengeluaran':
+        # Bonus/Kasbon: mitra yang bertugas di laporan ini + kacab cabangnya
+        if not str(laporan_id or '').isdigit():
+            return Karyawan.objects.none()
+        laporan = saring_cabang(LHCabang.objects.filter(pk=laporan_id), user)
+        return Karyawan.objects.filter(
+            Q(id_staff__in=DetailLH.objects.filter(laporan_induk__in=laporan).values('mitra_id'))
+            | Q(id_staff__in=Cabang.objects.filter(lhcabang__in=laporan).values('kepala_cabang_id'))
+        ).complex_filter(PengeluaranLH._meta.get_field('mitra').get_limit_choices_to())
+
+    qs = Karyawan.objects.complex_filter(DetailLH._meta.get_field('mitra').get_limit_choices_to())
+    if not user.is_superuser:
+        # Kacab: hanya mitra aktif yang bertugas di cabangnya
+        qs = saring_cabang(qs.filter(status='AKTIF'), user, 'cabang_tugas_id')
+    return qs
+
+
+def _query_cari(user, jenis, laporan_id, kata, halaman):
+    qs = pilihan_mitra(user, jenis, laporan_id)
+    if kata:
+        # Cari awalan ID staff, awalan nama, atau awalan kata di tengah nama
+        qs = qs.filter(
+            Q(id_staff__istartswith=kata) | Q(nama_lengkap__istartswith=kata)
+            | Q(nama_lengkap__icontains=' ' + kata)
+        )
+    mulai = (halaman - 1) * PER_HALAMAN
+    return qs.order_by('nama_lengkap', 'id_staff').values_list('id_staff', 'nama_lengkap')[mulai:mulai + PER_HALAMAN + 1]
+
+
+def _hasil_cari(baris):
+    return {
+        # Format JSON yang dibaca select2 (sama dengan autocomplete admin Django)
+        'results': [{'id': id_staff, 'text': f"{id_staff} - {nama}"} for id_staff, nama in baris[:PER_HALAMAN]],
+        'pagination': {'more': len(baris) > PER_HALAMAN},
+    }
+
+
+def _kunci_cari(user, kata, halaman):
+    kata_hash = hashlib.md5(kata.lower().encode()).hexdigest()
+    return f"pilihan:mitra:{versi_akses()}:{cakupan(user)}:{halaman}:{kata_hash}"
+
+
+async def acari_mitra(user, jenis, laporan_id, kata, halaman=1):
+    # Dipakai endpoint autocomplete (view async, jalan di WSGI maupun ASGI)
+    kata = kata.strip()
+    kunci = None
+    # Pengeluaran: daftarnya kecil (<= 7 mitra + kacab) dan berubah tiap baris laporan diisi, tidak di-cache
+    if jenis != 'pengeluaran':
+        kunci = await sync_to_async(_kunci_cari)(user, kata, halaman)
+        hasil = await cache.aget(kunci)
+        if hasil is not None:
+            return hasil
+    qs = _query_cari(user, jenis, laporan_id, kata, halaman)
+    hasil = _hasil_cari([baris async for baris in qs])
+    if kunci:
+        await cache.aset(kunci, hasil, WAKTU_CACHE)
+    return hasil
@@ -0,0 +1,191 @@
+import hashlib
+import uuid
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, FloatField, ExpressionWrapper, Q, Sum
+from django.utils.dateparse import parse_date
+from perusahaan.akses import cakupan, saring_cabang
+from .models import DetailLH, RekapHarianMitra
+
+# Hasil rekap di-cache per (dari, sampai, cakupan user). Tiap bulan punya kunci
+# versi yang diganti saat isi laporan di bulan itu berubah; kunci hasil memuat sidik
+# versi semua bulan di rentangnya. Jadi saat tanggal X berubah hanya rentang yang
+# menyentuh bulan X yang tidak terbaca lagi, dan hasil yang dihitung sebelum perubahan
+# tersimpan di versi lama (tidak ada indeks bersama yang bisa saling timpa).
+# Rentang lebih dari BULAN_MAKS bulan tidak di-cache, supaya jumlah kunci versi
+# yang dibaca per request tetap kecil walau tanggalnya bebas diisi user.
+WAKTU_CACHE = 3600  # detik, batas basi kalau ada invalidasi yang terlewat
+BULAN_MAKS = 36
+KUNCI_HIT = 'rekap:statistik:hit'
+KUNCI_MISS = 'rekap:statistik:miss'
+
+
+def _baris_rekap(detail_qs):
+    # DetailLH -> baris RekapHarianMitra, dikelompokkan per laporan & mitra
+    return [
+        RekapHarianMitra(
+            laporan_id=d['laporan_induk'],
+            tanggal=d['laporan_induk__tanggal'],
+            cabang_id=d['laporan_induk__cabang'],
+            mitra_id=d['mitra'],
+            total_durasi=d['durasi'] or 0,
+            total_omzet=d['omzet'] or 0,
+            total_minus=d['minus'] or 0,
+            jumlah_baris=d['baris'],
+        )
+        for d in detail_qs.values(
+            'laporan_induk', 'laporan_induk__tanggal', 'laporan_induk__cabang', 'mitra'
+        ).annotate(
+            durasi=Sum('durasi_kerja'),
+            omzet=Sum('omzet_bruto_rp'),
+            minus=Sum('selisih_rp', filter=Q(selisih_rp__lt=0)),
+            baris=Count('id'),
+        ).order_by()
+    ]
+
+
+def perbarui_rekap_harian(laporan_id):
+    # Dipanggil di dalam transaksi perbarui_ringkasan, cukup hapus & isi ulang 1 laporan
+    RekapHarianMitra.objects.filter(laporan_id=laporan_id).delete()
+    RekapHarianMitra.objects.bulk_create(_baris_rekap(DetailLH.objects.filter(laporan_induk_id=laporan_id)))
+
+
+def bangun_ulang_rekap_harian(laporan_qs):
+    RekapHarianMitra.objects.filter(laporan__in=laporan_qs).delete()
+    baris = _baris_rekap(DetailLH.objects.filter(laporan_induk__in=laporan_qs))
+    RekapHarianMitra.objects.bulk_create(baris, batch_size=1000)
+    return len(baris)
+
+
+def hitung_rekap(tgl_mulai, tgl_selesai, user):
+    # Evaluasi Kinerja Mitra dari tabel rollup: biaya ~ hari x mitra aktif
+    data = saring_cabang(RekapHarianMitra.objects.filter(tanggal__range=[tgl_mulai, tgl_selesai]), user)
+
+    # Menghitung Rekap per Mitra (per ID, mitra dengan nama sama tidak tergabung)
+    rekap_mitra = data.values('mitra', 'mitra__nama_lengkap').annotate(
+        total_jam=ExpressionWrapper(
+            Sum('total_durasi') / 60.0, 
+            output_field=FloatField()
+        ),
+        total_minus=Sum('total_minus', filter=Q(total_minus__lt=0)),
+        total_omset=Sum('total_omzet'),
+        kehadiran=Sum('jumlah_baris')
+    ).order_by('-total_jam', 'mitra__nama_lengkap')
+
+    rekap_cabang = data.values('cabang__nama_cabang').annotate(
+        jumlah_berangkat=Sum('jumlah_baris')
+    ).order_by('-jumlah_berangkat')
+
+    return {
+        'rekap_mitra': rekap_mitra,
+        'rekap_cabang': rekap_cabang,
+    }
+
+
+def _kunci_versi(tahun, bulan):
+    return f"rekap:versi:{tahun:04d}-{bulan:02d}"
+
+
+def _daftar_kunci_versi(dari, sampai):
+    # Satu kunci per bulan yang disentuh rentang, None kalau lebih dari BULAN_MAKS
+    awal = dari.year * 12 + dari.month - 1
+    jumlah = sampai.year * 12 + sampai.month - awal
+    if jumlah > BULAN_MAKS:
+        return None
+    return [_kunci_versi(b // 12, b % 12 + 1) for b in range(awal, awal + jumlah)]
+
+
+def _kunci(dari, sampai, nama_cakupan, daftar, versi):
+    # versi: {kunci versi: nilai}; bulan yang belum pernah berubah belum punya versi
+    sidik = hashlib.sha1('|'.join(versi.get(k, '0') for k in daftar).encode())
+    return f"rekap:{dari.isoformat()}:{sampai.isoformat()}:{nama_cakupan}:{sidik.hexdigest()[:16]}"
+
+
+def _catat(kunci_statistik):
+    # Hitungan kasar untuk dipantau superuser, tidak perlu atomik
+    if not cache.add(kunci_statistik, 1, None):
+        try:
+            cache.incr(kunci_statistik)
+        except ValueError:
+            cache.set(kunci_statistik, 1, None)
+
+
+def _rentang(tgl_mulai, tgl_selesai):
+    try:
+        dari, sampai = parse_date(str(tgl_mulai)), parse_date(str(tgl_selesai))
+    except ValueError:
+        return None
+    if dari is None or sampai is None:
+        return None
+    return dari, sampai
+
+
+def rekap_tersimpan(tgl_mulai, tgl_selesai, user):
+    # Dipakai halaman Evaluasi Kinerja Mitra & ekspornya. None kalau tanggal tidak valid.
+    rentang = _rentang(tgl_mulai, tgl_selesai)
+    if rentang is None:
+        return None
+    dari, sampai = rentang
+    daftar = _daftar_kunci_versi(dari, sampai)
+    if daftar is None:
+        # Rentang bertahun-tahun: hitung langsung tanpa cache
+        return {nama: list(qs) for nama, qs in hitung_rekap(dari, sampai, user).items()}
+
+    # Versi dibaca sebelum menghitung: hasil yang keburu basi tersimpan di versi lama
+    kunci = _kunci(dari, sampai, cakupan(user), daftar, cache.get_many(daftar))
+    hasil = cache.get(kunci)
+    if hasil is not None:
+        _catat(KUNCI_HIT)
+        return hasil
+
+    _catat(KUNCI_MISS)
+    rekap = hitung_rekap(dari, sampai, user)
+    hasil = {nama: list(qs) for nama, qs in rekap.items()}
+    cache.set(kunci, hasil, WAKTU_CACHE)
+    return hasil
+
+
+async def _daftar(qs):
+    return [baris async for baris in qs]
+
+
+async def arekap_tersimpan(tgl_mulai, tgl_selesai, user):
+    # Versi async untuk halaman Evaluasi Kinerja Mitra di mode ASGI.
+    rentang = _rentang(tgl_mulai, tgl_selesai)
+    if rentang is None:
+        return None
+    dari, sampai = rentang
+    daftar = _daftar_kunci_versi(dari, sampai)
+    if daftar is None:
+        return {nama: await _daftar(qs) for nama, qs in hitung_rekap(dari, sampai, user).items()}
+
+    versi = await cache.aget_many(daftar)
+    kunci = _kunci(dari, sampai, await sync_to_async(cakupan)(user), daftar, versi)
+    hasil = await cache.aget(kunci)
+    if hasil is not None:
+        await sync_to_async(_catat)(KUNCI_HIT)
+        return hasil
+
+    hasil = {nama: await _daftar(qs) for nama, qs in hitung_rekap(dari, sampai, user).items()}
+    await sync_to_async(_catat)(KUNCI_MISS)
+    await cache.aset(kunci, hasil, WAKTU_CACHE)
+    return hasil
+
+
+def invalidasi_rekap(tanggal):
+    # Bisa datetime (default timezone.now) kalau laporan belum dibaca ulang dari database
+    tanggal = RekapHarianMitra._meta.get_field('tanggal').to_python(tanggal)
+    # Tanpa batas waktu: versi yang hilang kembali ke '0' dan bisa mengenai hasil lama
+    kunci = _kunci_versi(tanggal.year, tanggal.month)
+    transaction.on_commit(lambda: cache.set(kunci, uuid.uuid4().hex, None))
+
+
+def statistik_cache_rekap():
+    hasil = cache.get_many([KUNCI_HIT, KUNCI_MISS])
+    return {'hit': hasil.get(KUNCI_HIT, 0), 'miss': hasil.get(KUNCI_MISS, 0)}
+
+
+async def astatistik_cache_rekap():
+    hasil = await cache.aget_many([KUNCI_HIT, KUNCI_MISS])
+    return {'hit': hasil.get(KUNCI_HIT, 0), 'miss': hasil.get(KUNCI_MISS, 0)}
@@ -0,0 +1,145 @@
+import threading
+from contextlib import contextmanager
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+# Ringkasan per laporan (RingkasanLH) dihitung ulang setiap ada DetailLH /
+# PengeluaranLH yang disimpan/dihapus, di dalam transaksi yang sama.
+# Satu laporan maksimal 7 mitra, jadi hitung ulang per laporan tetap murah.
+_lokal = threading.local()
+
+# Dikirim setiap isi sebuah laporan berubah (sudah dihitung ulang ringkasannya),
+# dengan argumen laporan_id, tanggal dan cabang_id. Dipakai cache dashboard/rekap
+# dan feed stream dashboard.
+laporan_diperbarui = Signal()
+
+
+def _hitung(laporan_id):
+    from .models import DetailLH, PengeluaranLH
+
+    detail = DetailLH.objects.filter(laporan_induk_id=laporan_id).aggregate(
+        cash=Sum('cash_diterima'),
+        omzet=Sum('omzet_bruto_rp'),
+        selisih=Sum('selisih_rp'),
+        hadir=Count('id', filter=Q(status_kehadiran='H')),
+        minus=Count('id', filter=Q(selisih_rp__lt=0)),
+    )
+    keluar = PengeluaranLH.objects.filter(laporan_induk_id=laporan_id).aggregate(total=Sum('nominal'))
+    return {
+        'total_cash': detail['cash'] or 0,
+        'total_pengeluaran': keluar['total'] or 0,
+        'total_omzet': detail['omzet'] or 0,
+        'total_selisih': detail['selisih'] or 0,
+        'jumlah_hadir': detail['hadir'],
+        'jumlah_minus': detail['minus'],
+    }
+
+
+KOLOM_RINGKASAN = ['total_cash', 'total_pengeluaran', 'total_omzet', 'total_selisih', 'jumlah_hadir', 'jumlah_minus']
+
+
+def hitung_semua_ringkasan(laporan_qs):
+    # Versi set-based untuk banyak laporan sekaligus: 2 query agregat ber-GROUP BY
+    from .models import DetailLH, PengeluaranLH
+
+    detail = {
+        d['laporan_induk']: d for d in DetailLH.objects.filter(laporan_induk__in=laporan_qs)
+        .values('laporan_induk').annotate(
+            cash=Sum('cash_diterima'), omzet=Sum('omzet_bruto_rp'), selisih=Sum('selisih_rp'),
+            hadir=Count('id', filter=Q(status_kehadiran='H')), minus=Count('id', filter=Q(selisih_rp__lt=0)),
+        )
+    }
+    keluar = dict(
+        PengeluaranLH.objects.filter(laporan_induk__in=laporan_qs)
+        .values_list('laporan_induk').annotate(total=Sum('nominal'))
+    )
+    hasil = {}
+    for laporan_id in laporan_qs.values_list('pk', flat=True).iterator():
+        d = detail.get(laporan_id, {})
+        hasil[laporan_id] = {
+            'total_cash': d.get('cash') or 0,
+            'total_pengeluaran': keluar.get(laporan_id) or 0,
+            'total_omzet': d.get('omzet') or 0,
+            'total_selisih': d.get('selisih') or 0,
+            'jumlah_hadir': d.get('hadir', 0),
+            'jumlah_minus': d.get('minus', 0),
+        }
+    return hasil
+
+
+def anotasi_ringkasan(laporan_qs):
+    # Total per laporan untuk daftar LHCabang, diambil di query daftar yang sama
+    # (LEFT JOIN RingkasanLH + EXISTS setoran), bukan query per baris
+    from .models import SetorPusat
+
+    return laporan_qs.annotate(
+        total_omzet=Coalesce('ringkasan__total_omzet', 0),
+        total_cash=Coalesce('ringkasan__total_cash', 0),
+        total_pengeluaran=Coalesce('ringkasan__total_pengeluaran', 0),
+        jumlah_minus=Coalesce('ringkasan__jumlah_minus', 0),
+        sudah_setor=Exists(SetorPusat.objects.filter(laporan_induk=OuterRef('pk'))),
+    )
+
+
+def perbarui_ringkasan(laporan_id):
+    from .models import LHCabang, RingkasanLH
+
+    with transaction.atomic():
+        # Kunci laporan supaya dua penyimpanan bersamaan tidak saling menimpa total
+        induk = LHCabang.objects.select_for_update().filter(pk=laporan_id).values_list('tanggal', 'cabang_id').first()
+        if induk is None:
+            return None
+        tanggal, cabang_id = induk
+        ringkasan, _ = RingkasanLH.objects.update_or_create(laporan_id=laporan_id, defaults=_hitung(laporan_id))
+        laporan_diperbarui.send(sender=RingkasanLH, laporan_id=laporan_id, tanggal=tanggal, cabang_id=cabang_id)
+    return ringkasan
+
+
+def tandai_berubah(laporan_id):
+    tertunda = getattr(_lokal, 'tertunda', None)
+    if tertunda is not None:
+        tertunda.add(laporan_id)
+    else:
+        perbarui_ringkasan(laporan_id)
+
+
+@contextmanager
+def tunda_ringkasan():
+    # Dipakai saat menyimpan banyak baris sekaligus (inline admin):
+    # ringkasan dihitung sekali per laporan di akhir blok, bukan per baris
+    if getattr(_lokal, 'tertunda', None) is not None:
+        yield
+        return
+    _lokal.tertunda = set()
+    try:
+        yield
+        tertunda = _lokal.tertunda
+    finally:
+        _lokal.tertunda = None
+    for laporan_id in tertunda:
+        perbarui_ringkasan(laporan_id)
+
+
+def ambil_ringkasan(laporan, segar=False):
+    # segar=True: baca ulang dari database (dipakai saat mengunci angka setoran),
+    # selain itu pakai cache relasi laporan.ringkasan supaya cukup 1 query per halaman
+    from .models import RingkasanLH
+
+    tertunda = getattr(_lokal, 'tertunda', None)
+    if tertunda and laporan.pk in tertunda:
+        # Laporan ini masih menunggu dihitung (di dalam tunda_ringkasan), hitung sekarang
+        tertunda.discard(laporan.pk)
+        ringkasan = perbarui_ringkasan(laporan.pk)
+    elif segar:
+        ringkasan = RingkasanLH.objects.filter(pk=laporan.pk).first() or perbarui_ringkasan(laporan.pk)
+    else:
+        try:
+            return laporan.ringkasan
+        except RingkasanLH.DoesNotExist:
+            # Laporan lama yang belum punya baris ringkasan
+            ringkasan = perbarui_ringkasan(laporan.pk)
+    if ringkasan is not None:
+        laporan.ringkasan = ringkasan
+    return ringkasan
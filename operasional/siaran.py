@@ -0,0 +1,255 @@
+import asyncio
+import contextvars
+import datetime
+import json
+import logging
+import time
+import weakref
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from perusahaan.akses import cabang_diizinkan, cakupan
+from .dashboard import ahitung_kpi, tanggal_laporan
+from .models import PerubahanLaporan
+
+logger = logging.getLogger(__name__)
+
+# Stream KPI dashboard lewat server-sent events (mode ASGI, lihat README).
+# Setiap perubahan DetailLH/PengeluaranLH/SetorPusat mencatat satu baris
+# PerubahanLaporan di transaksinya. Satu tugas per proses (bukan per klien) membaca
+# feed itu, menghitung KPI sekali per tanggal & cakupan cabang, lalu membagikannya
+# ke antrean tiap koneksi. Antrean dibatasi: klien yang lambat kehilangan nilai
+# tertua, bukan menumpuk memori (yang penting angka terbaru).
+#
+# Kontrak sambung ulang: id event = "<tanggal>:<id feed>". EventSource mengirim
+# balik id terakhir di header Last-Event-ID; kalau sejak id itu ada perubahan di
+# cabang klien (atau tanggalnya sudah lain), klien langsung dikirimi nilai terbaru.
+# Koneksi yang melewati tengah malam pindah ke tanggal baru dengan sendirinya.
+#
+# Feed hanya ditulis kalau settings.STREAM_KPI (default: MODE_SERVER=asgi).
+# Baris lama dibersihkan paling sering sekali per JEDA_BERSIH per proses, oleh
+# penulis (setelah commit) maupun pembaca feed, jadi tetap jalan walau salah satu
+# sepi.
+INTERVAL_BACA = 1.0   # detik antar baca feed
+BATAS_BACA = 500      # baris feed per baca
+JENDELA_ULANG = 100   # id di belakang posisi terakhir yang dibaca ulang (transaksi yang commit belakangan)
+ANTREAN_MAKS = 8      # event per koneksi
+MAKS_PELANGGAN = 200  # koneksi per proses
+DETAK = 15            # detik antar komentar ping, supaya proxy tidak memutus koneksi
+JEDA_SAMBUNG = 3000   # ms, jeda EventSource sebelum menyambung ulang
+SIMPAN_FEED = datetime.timedelta(days=1)
+JEDA_BERSIH = 3600    # detik antar pembersihan feed lama
+
+
+_bersih = {'berikut': 0.0}
+
+
+def _waktunya_bersih():
+    if time.monotonic() < _bersih['berikut']:
+        return False
+    _bersih['berikut'] = time.monotonic() + JEDA_BERSIH
+    return True
+
+
+def _feed_lama():
+    return PerubahanLaporan.objects.filter(dibuat__lt=timezone.now() - SIMPAN_FEED)
+
+
+def _bersihkan_feed():
+    _feed_lama().delete()
+
+
+def _hari_ini():
+    return timezone.localdate()
+
+
+def catat_perubahan(daftar):
+    # daftar: pasangan (tanggal, kode cabang), dipanggil di dalam transaksi perubahannya
+    if not settings.STREAM_KPI:
+        return
+    PerubahanLaporan.objects.bulk_create([
+        PerubahanLaporan(tanggal=tanggal, cabang_id=cabang)
+        for tanggal, cabang in {(tanggal_laporan(t), c) for t, c in daftar}
+    ])
+    if _waktunya_bersih():
+        transaction.on_commit(_bersihkan_feed)
+
+
+def id_event(tanggal, posisi):
+    return f"{tanggal.isoformat()}:{posisi}"
+
+
+def baca_id_event(nilai):
+    # (tanggal, posisi) dari header Last-Event-ID, None kalau kosong/tidak valid
+    tanggal, _, posisi = (nilai or '').partition(':')
+    try:
+        return datetime.date.fromisoformat(tanggal), int(posisi)
+    except ValueError:
+        return None
+
+
+class Pelanggan:
+    # Satu koneksi stream. Cabang user sudah diisi admin_view_async, jadi
+    # cabang_diizinkan/cakupan di sini tidak menyentuh database.
+    def __init__(self, user, tanggal):
+        self.user = user
+        self.tanggal = tanggal
+        self.cabang = cabang_diizinkan(user)  # None = semua cabang
+        self.cakupan = cakupan(user)
+        self.antrean = asyncio.Queue(maxsize=ANTREAN_MAKS)
+        self.kpi = None  # nilai terakhir yang dikirim, dasar delta
+
+    def terkait(self, cabang):
+        return self.cabang is None or not self.cabang.isdisjoint(cabang)
+
+    def kirim(self, event):
+        if self.antrean.full():
+            self.antrean.get_nowait()  # buang yang tertua
+        self.antrean.put_nowait(event)
+
+
+class Siaran:
+    # Satu per proses: pembaca feed jalan selama masih ada pelanggan
+    def __init__(self):
+        # Lemah: koneksi yang ditutup sebelum streamnya sempat jalan ikut hilang
+        self.pelanggan = weakref.WeakSet()
+        self.tugas = None
+        self.loop = None
+        self.terakhir = 0
+        self.terlihat = set()
+
+    async def gabung(self, pelanggan):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            # Event loop baru (proses baru / test), pembaca lama tidak berlaku
+            self.pelanggan.clear()
+            self.tugas, self.loop = None, loop
+        if len(self.pelanggan) >= MAKS_PELANGGAN:
+            return False
+        if self.tugas is None:
+            ids = [pk async for pk in PerubahanLaporan.objects.order_by('-pk').values_list('pk', flat=True)[:JENDELA_ULANG]]
+            if self.tugas is None:
+                self.terakhir = ids[0] if ids else 0
+                self.terlihat = set(ids)
+                # Konteks kosong: jangan mewarisi konteks request pertama (executor
+                # sync_to_async request itu sudah ditutup setelah request selesai)
+                self.tugas = contextvars.Context().run(loop.create_task, self._jalan())
+        self.pelanggan.add(pelanggan)
+        return True
+
+    def keluar(self, pelanggan):
+        # Pembaca berhenti sendiri setelah pelanggan terakhir keluar
+        self.pelanggan.discard(pelanggan)
+
+    async def _jalan(self):
+        try:
+            while self.pelanggan:
+                try:
+                    penuh = await self._baca()
+                    if _waktunya_bersih():
+                        await _feed_lama().adelete()
+                except Exception:
+                    logger.exception("Gagal membaca feed perubahan laporan")
+                    penuh = False
+                if not penuh:
+                    await asyncio.sleep(INTERVAL_BACA)
+        finally:
+            if self.tugas is asyncio.current_task():
+                self.tugas = None
+
+    async def _baca(self):
+        # Baca ulang sedikit di belakang posisi terakhir: id dibagikan saat INSERT,
+        # transaksi dengan id lebih kecil bisa commit belakangan
+        dari = max(self.terakhir - JENDELA_ULANG, 0)
+        baris = [b async for b in PerubahanLaporan.objects.filter(pk__gt=dari).order_by('pk').values_list(
+            'pk', 'tanggal', 'cabang_id',
+        )[:BATAS_BACA]]
+        baru = [b for b in baris if b[0] not in self.terlihat]
+        if baris:
+            self.terakhir = max(self.terakhir, baris[-1][0])
+        batas = self.terakhir - JENDELA_ULANG
+        self.terlihat = {pk for pk in self.terlihat if pk > batas} | {b[0] for b in baru}
+        if baru:
+            await self._bagikan(baru)
+        return len(baris) == BATAS_BACA
+
+    async def _bagikan(self, baris):
+        berubah = {}
+        for _, tanggal, cabang in baris:
+            berubah.setdefault(tanggal, set()).add(cabang)
+        posisi = self.terakhir
+        hasil = {}  # (tanggal, cakupan): kpi, satu query per kombinasi
+        for pelanggan in list(self.pelanggan):
+            cabang = berubah.get(pelanggan.tanggal)
+            if not cabang or not pelanggan.terkait(cabang):
+                continue
+            kunci = (pelanggan.tanggal, pelanggan.cakupan)
+            if kunci not in hasil:
+                hasil[kunci] = await ahitung_kpi(pelanggan.tanggal, pelanggan.user)
+            pelanggan.kirim((pelanggan.tanggal, posisi, hasil[kunci]))
+
+
+siaran = Siaran()
+
+
+async def _perlu_kirim_ulang(pelanggan, id_terakhir):
+    # Ada perubahan di cabang pelanggan sejak event terakhir yang ia terima?
+    if id_terakhir is None or id_terakhir[0] != pelanggan.tanggal:
+        return True
+    feed = PerubahanLaporan.objects.filter(pk__gt=id_terakhir[1], tanggal=pelanggan.tanggal)
+    if pelanggan.cabang is not None:
+        feed = feed.filter(cabang_id__in=pelanggan.cabang)
+    return await feed.aexists()
+
+
+def _format(tanggal, posisi, kpi, sebelum):
+    if kpi == sebelum:
+        # Angka sama: cukup majukan id supaya sambung ulang tidak mengirim ulang
+        return f"id: {id_event(tanggal, posisi)}\n\n"
+    delta = None
+    if sebelum is not None:
+        delta = {k: v - sebelum[k] for k, v in kpi.items() if v != sebelum[k]}
+    data = json.dumps({'tanggal': tanggal.isoformat(), 'kpi': kpi, 'delta': delta})
+    return f"id: {id_event(tanggal, posisi)}\nevent: kpi\ndata: {data}\n\n"
+
+
+async def buka_stream(user, tanggal, last_event_id=None):
+    # Generator event untuk satu koneksi, None kalau proses ini sudah penuh
+    pelanggan = Pelanggan(user, tanggal)
+    if not await siaran.gabung(pelanggan):
+        return None
+    try:
+        posisi = siaran.terakhir
+        awal = None
+        if await _perlu_kirim_ulang(pelanggan, baca_id_event(last_event_id)):
+            awal = await ahitung_kpi(tanggal, user)
+    except BaseException:
+        siaran.keluar(pelanggan)
+        raise
+
+    async def aliran():
+        try:
+            yield f"retry: {JEDA_SAMBUNG}\n\n"
+            if awal is not None:
+                yield _format(tanggal, posisi, awal, None)
+                pelanggan.kpi = awal
+            while True:
+                hari_ini = _hari_ini()
+                if hari_ini != pelanggan.tanggal:
+                    # Lewat tengah malam: kartu "Hari Ini" pindah ke tanggal baru
+                    pelanggan.tanggal = hari_ini
+                    pelanggan.kpi = await ahitung_kpi(hari_ini, user)
+                    yield _format(hari_ini, siaran.terakhir, pelanggan.kpi, None)
+                try:
+                    tanggal_event, posisi_baru, kpi = await asyncio.wait_for(pelanggan.antrean.get(), DETAK)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if tanggal_event != pelanggan.tanggal:
+                    continue  # masih untuk tanggal kemarin
+                yield _format(tanggal_event, posisi_baru, kpi, pelanggan.kpi)
+                pelanggan.kpi = kpi
+        finally:
+            siaran.keluar(pelanggan)
+
+    return aliran()
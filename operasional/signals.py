@@ -0,0 +1,63 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .dashboard import invalidasi_dashboard
+from .models import LHCabang, DetailLH, PengeluaranLH, RingkasanLH, SetorPusat
+from .rekap import invalidasi_rekap, perbarui_rekap_harian
+from .ringkasan import laporan_diperbarui, tandai_berubah
+from .siaran import catat_perubahan
+
+@receiver(post_init, sender=LHCabang)
+def laporan_dimuat(sender, instance, **kwargs):
+    # Ingat tanggal awal, kalau tanggal diganti cache tanggal lama juga dibuang
+    # (lewat __dict__ supaya field yang di-defer tidak memicu query)
+    instance._tanggal_awal = instance.__dict__.get('tanggal')
+
+@receiver(post_save, sender=LHCabang)
+def laporan_dibuat(sender, instance, created, **kwargs):
+    if created:
+        RingkasanLH.objects.get_or_create(laporan=instance)
+        catat_perubahan([(instance.tanggal, instance.cabang_id)])
+    else:
+        # Tanggal/cabang bisa berubah, rollup harian ikut disesuaikan
+        tandai_berubah(instance.pk)
+        if instance._tanggal_awal not in (None, instance.tanggal):
+            invalidasi_dashboard(instance._tanggal_awal)
+            invalidasi_rekap(instance._tanggal_awal)
+            catat_perubahan([(instance._tanggal_awal, instance.cabang_id)])
+    instance._tanggal_awal = instance.tanggal
+    invalidasi_dashboard(instance.tanggal)
+
+@receiver(post_delete, sender=LHCabang)
+def laporan_dihapus(sender, instance, **kwargs):
+    invalidasi_dashboard(instance.tanggal)
+    invalidasi_rekap(instance.tanggal)
+    # Kalau ikut terhapus bersama cabangnya, baris feed cabang itu juga dihapus
+    origin = kwargs.get('origin')
+    if origin is None or getattr(origin, 'model', type(origin)) is sender:
+        catat_perubahan([(instance.tanggal, instance.cabang_id)])
+
+@receiver([post_save, post_delete], sender=DetailLH)
+@receiver([post_save, post_delete], sender=PengeluaranLH)
+def baris_laporan_berubah(sender, instance, **kwargs):
+    # Ikut terhapus karena laporan/cabangnya dihapus: ringkasan ikut hilang, lewati
+    origin = kwargs.get('origin')
+    model_origin = getattr(origin, 'model', type(origin))
+    if origin is not None and model_origin is not sender:
+        return
+    tandai_berubah(instance.laporan_induk_id)
+
+@receiver([post_save, post_delete], sender=SetorPusat)
+def setoran_berubah(sender, instance, **kwargs):
+    origin = kwargs.get('origin')
+    if origin is not None and getattr(origin, 'model', type(origin)) is not sender:
+        return
+    laporan = instance.laporan_induk
+    invalidasi_dashboard(laporan.tanggal)
+    catat_perubahan([(laporan.tanggal, laporan.cabang_id)])
+
+@receiver(laporan_diperbarui)
+def isi_laporan_diperbarui(sender, laporan_id, tanggal, cabang_id, **kwargs):
+    perbarui_rekap_harian(laporan_id)
+    invalidasi_dashboard(tanggal)
+    invalidasi_rekap(tanggal)
+    catat_perubahan([(tanggal, cabang_id)])
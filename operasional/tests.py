@@ -1,3 +1,922 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count, ExpressionWrapper, FloatField, Q, Sum
+from django.forms import inlineformset_factory
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from perusahaan.models import Cabang, Karyawan
+from sistem.aturan import invalidasi_aturan
+from sistem.models import AturanPerusahaan, TierBonusCabang, TierBonusMitra
+from .antrean import proses_gambar
+from .bonus import hitung_bonus, posting_bonus
+from .dashboard import hitung_kpi, invalidasi_dashboard, kpi_hari_ini
+from .gaji import proses_periode
+from .hitung_ulang import proses_potongan
+from .gambar import GAGAL, MENUNGGU, SELESAI, UKURAN_THUMBNAIL
+from .forms import DetailLHFormSet, PilihanBersamaField, PilihanBersamaForm
+from .models import (
+    DetailLH, KirimanLaporan, LHCabang, PengeluaranLH, PeriodeGaji, PerubahanLaporan, RekapHarianMitra, RingkasanLH,
+    SetorPusat, SlipGaji,
+)
+from .rekap import hitung_rekap, invalidasi_rekap, rekap_tersimpan, statistik_cache_rekap
+from .ringkasan import KOLOM_RINGKASAN, hitung_semua_ringkasan, tunda_ringkasan
 
-# Create your tests here.
+
+def foto(ukuran=(2400, 1800), mode='RGB', format='PNG', nama='nota.png'):
+    berkas = io.BytesIO()
+    Image.new(mode, ukuran).save(berkas, format)
+    return SimpleUploadedFile(nama, berkas.getvalue())
+
+
+class FotoTestCase(TestCase):
+    # Foto disimpan di folder sementara (bukan S3) dan antrean diproses langsung setelah commit
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        pengaturan = self.settings(
+            GAMBAR_ASYNC=False, MEDIA_ROOT=media,
+            STORAGES={**settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}},
+        )
+        pengaturan.enable()
+        self.addCleanup(pengaturan.disable)
+        cabang = Cabang.objects.create(kode_cabang='C1', nama_cabang='Cabang 1')
+        self.laporan = LHCabang.objects.create(cabang=cabang, tanggal=datetime.date(2026, 10, 18))
+
+    def unggah(self, berkas, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            pengeluaran = PengeluaranLH.objects.create(laporan_induk=self.laporan, bukti_nota=berkas, **kwargs)
+        pengeluaran.refresh_from_db()
+        return pengeluaran
+
+
+class AntreanFotoTest(FotoTestCase):
+    def test_diproses_setelah_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            pengeluaran = PengeluaranLH.objects.create(laporan_induk=self.laporan, bukti_nota=foto())
+        pengeluaran.refresh_from_db()
+        mentah = pengeluaran.bukti_nota.name
+        self.assertEqual(pengeluaran.status_gambar, MENUNGGU)
+        for callback in callbacks:
+            callback()
+        pengeluaran.refresh_from_db()
+        self.assertEqual(pengeluaran.status_gambar, SELESAI)
+        self.assertTrue(pengeluaran.bukti_nota.name.endswith('.jpg'))
+        self.assertFalse(pengeluaran.bukti_nota.storage.exists(mentah))
+        self.assertTrue(pengeluaran.thumbnail_nota.storage.exists(pengeluaran.thumbnail_nota.name))
+        # Sudah diklaim/selesai: tidak diproses dua kali
+        self.assertFalse(proses_gambar(PengeluaranLH, pengeluaran.pk))
+
+    def test_file_rusak_gagal(self):
+        with self.assertLogs('operasional.antrean', 'ERROR'):
+            pengeluaran = self.unggah(SimpleUploadedFile('nota.png', b'bukan foto'))
+        self.assertEqual(pengeluaran.status_gambar, GAGAL)
+        self.assertTrue(pengeluaran.bukti_nota.storage.exists(pengeluaran.bukti_nota.name))  # mentah disimpan
+
+    def test_ganti_foto_hapus_thumbnail_lama(self):
+        pengeluaran = self.unggah(foto())
+        thumbnail_lama = pengeluaran.thumbnail_nota.name
+        pengeluaran.bukti_nota = foto(nama='nota_baru.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            pengeluaran.save()
+        pengeluaran.refresh_from_db()
+        self.assertEqual(pengeluaran.status_gambar, SELESAI)
+        self.assertNotEqual(pengeluaran.thumbnail_nota.name, thumbnail_lama)
+        self.assertTrue(pengeluaran.thumbnail_nota.storage.exists(pengeluaran.thumbnail_nota.name))
+        self.assertFalse(pengeluaran.thumbnail_nota.storage.exists(thumbnail_lama))
+
+
+class KompresFotoTest(FotoTestCase):
+    def test_simpan_ulang_tanpa_upload_tidak_dikompres(self):
+        pengeluaran = self.unggah(foto(), nominal=5000)
+        nama = (pengeluaran.bukti_nota.name, pengeluaran.thumbnail_nota.name)
+        pengeluaran = PengeluaranLH.objects.get(pk=pengeluaran.pk)
+        with mock.patch('operasional.gambar.Image.open') as buka, \
+                mock.patch('operasional.models.antrekan_gambar') as antrekan:
+            pengeluaran.nominal = 7500
+            pengeluaran.save()
+        # File lama tidak diunduh, tidak didecode dan tidak masuk antrean lagi
+        self.assertFalse(buka.called)
+        self.assertFalse(antrekan.called)
+        pengeluaran.refresh_from_db()
+        self.assertEqual((pengeluaran.bukti_nota.name, pengeluaran.thumbnail_nota.name), nama)
+        self.assertEqual(pengeluaran.status_gambar, SELESAI)
+
+    def test_mode_palet_1bit_16bit_lebar(self):
+        # reduce() hanya menerima RGB/L dkk: mode lain diubah dulu (2400 px = faktor reduce 2)
+        for mode in ('P', '1', 'I;16', 'RGBA'):
+            with self.subTest(mode=mode):
+                pengeluaran = self.unggah(foto((2400, 600), mode))
+                self.assertEqual(pengeluaran.status_gambar, SELESAI)
+                with Image.open(pengeluaran.bukti_nota.path) as img:
+                    self.assertEqual((img.format, img.size), ('JPEG', (1200, 300)))
+                with Image.open(pengeluaran.thumbnail_nota.path) as img:
+                    self.assertLessEqual(img.width, UKURAN_THUMBNAIL[0])
+
+
+class DaftarLHCabangTest(TestCase):
+    # Daftar laporan: total per baris dari anotasi, jumlah query tidak ikut jumlah baris.
+    # session, user, filter cabang, count, daftar, 2x permission, 2x date hierarchy
+    JUMLAH_QUERY = 9
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'rahasia')
+        self.client.force_login(self.admin)
+        self.cabang = [Cabang.objects.create(kode_cabang=f'C{i}', nama_cabang=f'Cabang {i}') for i in range(3)]
+        self.mitra = [Karyawan.objects.create(
+            nama_lengkap=f'Mitra {i}', nomor_hp='0812', jabatan='Mitra', tanggal_masuk=datetime.date(2026, 1, 1),
+        ) for i in range(3)]
+        self.url = reverse('admin:operasional_lhcabang_changelist')
+
+    def buat_laporan(self, jumlah, mulai):
+        for i in range(jumlah):
+            laporan = LHCabang.objects.create(
+                cabang=self.cabang[i % 3], tanggal=mulai + datetime.timedelta(days=i // 3), dibuat_oleh=self.admin,
+            )
+            DetailLH.objects.create(laporan_induk=laporan, mitra=self.mitra[i % 3], adonan_bawa_gr=1000, cash_diterima=50000)
+            PengeluaranLH.objects.create(laporan_induk=laporan, item='Galon', nominal=5000)
+            if i % 2:
+                SetorPusat.objects.bulk_create([SetorPusat(laporan_induk=laporan, bukti_transfer='bukti.jpg')])
+
+    def test_jumlah_query_tetap(self):
+        self.buat_laporan(2, datetime.date(2026, 10, 1))
+        self.client.get(self.url)  # isi cache ContentType dulu
+        with self.assertNumQueries(self.JUMLAH_QUERY):
+            self.client.get(self.url)
+
+        self.buat_laporan(12, datetime.date(2026, 10, 10))
+        with self.assertNumQueries(self.JUMLAH_QUERY):
+            respons = self.client.get(self.url)
+        baris = respons.context['cl'].result_list
+        self.assertEqual(len(baris), 14)
+        self.assertEqual(sum(lh.sudah_setor for lh in baris), 7)
+        self.assertEqual({lh.total_cash for lh in baris}, {50000})
+        self.assertEqual({lh.total_pengeluaran for lh in baris}, {5000})
+
+    def test_ekspor_tanggal_tidak_valid(self):
+        url = reverse('admin:operasional_lhcabang_ekspor')
+        self.assertEqual(self.client.get(url, {'dari': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'sampai': '2026-02-30'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'dari': '2026-10-01', 'sampai': ''}).status_code, 200)
+
+    @mock.patch('operasional.ekspor.UKURAN_POTONGAN', 1)
+    async def test_ekspor_asgi_mengalir(self):
+        # AsyncClient = ASGIRequest: potongan dikirim lewat iterator async, tidak ditampung dulu
+        await sync_to_async(self.buat_laporan)(6, datetime.date(2026, 10, 1))
+        await self.async_client.aforce_login(self.admin)
+        respons = await self.async_client.get(reverse('admin:operasional_lhcabang_ekspor'), {'format': 'csv'})
+        self.assertTrue(respons.is_async)
+        potongan = [p async for p in respons.streaming_content]
+        self.assertGreater(len(potongan), 6)
+        self.assertEqual(len(b''.join(potongan).decode('utf-8-sig').splitlines()), 1 + 6)
+
+    def test_filter_setor(self):
+        self.buat_laporan(4, datetime.date(2026, 10, 1))
+        respons = self.client.get(self.url, {'setor': 'belum'})
+        self.assertEqual(len(respons.context['cl'].result_list), 2)
+        self.assertTrue(all(not lh.sudah_setor for lh in respons.context['cl'].result_list))
+
+
+def _field_mitra(db_field, **kwargs):
+    # Seperti inline admin: mitra lewat pilihan bersama satu formset
+    if db_field.name == 'mitra':
+        return db_field.formfield(form_class=PilihanBersamaField, **kwargs)
+    return db_field.formfield(**kwargs)
+
+
+DetailFormSet = inlineformset_factory(
+    LHCabang, DetailLH, form=PilihanBersamaForm, formset=DetailLHFormSet, formfield_callback=_field_mitra, extra=7, max_num=7,
+    fields=['mitra', 'status_kehadiran', 'adonan_bawa_gr', 'adonan_sisa_gr', 'cash_diterima'],
+)
+
+
+class DetailLHFormSetTest(TestCase):
+    # 7 baris mitra: cek duplikat satu query, simpan dengan bulk_create/bulk_update
+    def setUp(self):
+        self.cabang = [Cabang.objects.create(kode_cabang=f'C{i}', nama_cabang=f'Cabang {i}') for i in range(2)]
+        self.mitra = [Karyawan.objects.create(
+            nama_lengkap=f'Mitra {i}', nomor_hp='0812', jabatan='Mitra', tanggal_masuk=datetime.date(2026, 1, 1),
+        ) for i in range(7)]
+        self.tanggal = datetime.date(2026, 10, 18)
+        self.laporan = LHCabang.objects.create(cabang=self.cabang[0], tanggal=self.tanggal)
+
+    def formset(self, mitra, laporan=None, awal=(), cash='80000'):
+        data = {
+            'detail_lh-TOTAL_FORMS': '7', 'detail_lh-INITIAL_FORMS': str(len(awal)),
+            'detail_lh-MIN_NUM_FORMS': '0', 'detail_lh-MAX_NUM_FORMS': '7',
+        }
+        for i, m in enumerate(mitra):
+            data.update({
+                f'detail_lh-{i}-mitra': m.pk, f'detail_lh-{i}-status_kehadiran': 'H',
+                f'detail_lh-{i}-adonan_bawa_gr': '1000', f'detail_lh-{i}-adonan_sisa_gr': '100',
+                f'detail_lh-{i}-cash_diterima': cash,
+            })
+        for i, pk in enumerate(awal):
+            data[f'detail_lh-{i}-id'] = pk
+        return DetailFormSet(data, instance=laporan or self.laporan)
+
+    def test_pesan_duplikat_tetap(self):
+        DetailLH.objects.create(laporan_induk=self.laporan, mitra=self.mitra[0])
+        lain = LHCabang.objects.create(cabang=self.cabang[1], tanggal=self.tanggal)
+        formset = self.formset([self.mitra[0], self.mitra[1], self.mitra[1]], lain)
+        self.assertFalse(formset.is_valid())
+        self.assertEqual(formset.forms[0].non_field_errors(), [
+            'Maaf, Mitra 0 sedang bertugas di Cabang 0. Mohon periksa kembali.',
+        ])
+        self.assertEqual(formset.forms[1].non_field_errors(), [])
+        self.assertEqual(formset.forms[2].non_field_errors(), [
+            'Maaf, Mitra 1 sudah terdaftar di laporan ini. Mohon periksa kembali.',
+        ])
+
+    def test_jumlah_query_tetap(self):
+        # Validasi: 1 query mitra terpilih + 1 query cek duplikat, berapapun jumlah barisnya
+        self.formset(self.mitra[:1]).is_valid()  # isi cache peran
+        with self.assertNumQueries(2):
+            self.assertTrue(self.formset(self.mitra).is_valid())
+        formset = self.formset(self.mitra)
+        formset.is_valid()
+        # Simpan 7 baris: savepoint, bulk_create, lalu ringkasan & rollup laporan
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as query:
+            formset.save()
+        self.assertEqual(len([q for q in query if 'INSERT INTO "operasional_detaillh"' in q['sql']]), 1)
+        self.assertEqual(DetailLH.objects.filter(laporan_induk=self.laporan).count(), 7)
+        self.assertEqual(RingkasanLH.objects.get(laporan=self.laporan).jumlah_hadir, 7)
+
+        # Ubah semua baris: 1 query baris lama + 1 query cek duplikat (baris sendiri
+        # tidak dihitung duplikat), lalu satu bulk_update
+        awal = list(DetailLH.objects.order_by('pk').values_list('pk', flat=True))
+        formset = self.formset(self.mitra, awal=awal, cash='90000')
+        with self.assertNumQueries(2):
+            self.assertTrue(formset.is_valid(), formset.errors)
+        with CaptureQueriesContext(connection) as query:
+            formset.save()
+        self.assertEqual(len([q for q in query if q['sql'].startswith('UPDATE "operasional_detaillh"')]), 1)
+
+class RingkasanLHTest(TestCase):
+    # RingkasanLH harus selalu sama dengan hitung ulang dari DetailLH & PengeluaranLH
+    def setUp(self):
+        self.cabang = Cabang.objects.create(kode_cabang='C1', nama_cabang='Cabang 1')
+        self.mitra = [Karyawan.objects.create(
+            nama_lengkap=f'Mitra {i}', nomor_hp='0812', jabatan='Mitra', tanggal_masuk=datetime.date(2026, 1, 1),
+        ) for i in range(3)]
+        self.laporan = LHCabang.objects.create(cabang=self.cabang, tanggal=datetime.date(2026, 10, 18))
+
+    def assertRingkasanBenar(self):
+        tersimpan = RingkasanLH.objects.filter(laporan=self.laporan).values(*KOLOM_RINGKASAN).get()
+        hitung = hitung_semua_ringkasan(LHCabang.objects.filter(pk=self.laporan.pk))[self.laporan.pk]
+        self.assertEqual(tersimpan, hitung)
+        return tersimpan
+
+    def detail(self, mitra, **kwargs):
+        isi = {'adonan_bawa_gr': 1000, 'adonan_sisa_gr': 100, 'cash_diterima': 80000, **kwargs}
+        return DetailLH.objects.create(laporan_induk=self.laporan, mitra=mitra, **isi)
+
+    def test_ubah_dan_hapus_baris(self):
+        self.assertEqual(self.assertRingkasanBenar()['total_cash'], 0)
+        a = self.detail(self.mitra[0])
+        self.detail(self.mitra[1], status_kehadiran='S', cash_diterima=0)
+        nota = PengeluaranLH.objects.create(laporan_induk=self.laporan, item='Galon', nominal=5000)
+        ringkasan = self.assertRingkasanBenar()
+        self.assertEqual((ringkasan['total_cash'], ringkasan['jumlah_hadir']), (80000, 1))
+
+        a.cash_diterima = 1000
+        a.save()
+        self.assertEqual(self.assertRingkasanBenar()['total_selisih'], ringkasan['total_selisih'] - 79000)
+        a.delete()
+        nota.nominal = 7000
+        nota.save()
+        ringkasan = self.assertRingkasanBenar()
+        self.assertEqual((ringkasan['total_cash'], ringkasan['total_pengeluaran']), (0, 7000))
+        nota.delete()
+        self.assertEqual(self.assertRingkasanBenar()['total_pengeluaran'], 0)
+
+    def test_tunda_dan_setoran(self):
+        # Di dalam tunda_ringkasan ringkasan dihitung sekali di akhir, tapi setoran yang
+        # disimpan di tengah blok tetap mengunci angka terbaru
+        with tunda_ringkasan():
+            self.detail(self.mitra[0])
+            self.detail(self.mitra[1])
+            PengeluaranLH.objects.create(laporan_induk=self.laporan, item='Galon', nominal=5000)
+            setoran = SetorPusat(laporan_induk=self.laporan, bukti_transfer='bukti.jpg')
+            setoran.save()
+            self.detail(self.mitra[2])
+        self.assertEqual(setoran.nominal_setor, 155000)
+        self.assertEqual(self.assertRingkasanBenar()['total_cash'], 240000)
+
+        # Setoran disimpan ulang setelah laporan berubah: angka ikut diperbarui
+        DetailLH.objects.filter(mitra=self.mitra[2]).delete()
+        setoran.save()
+        setoran.refresh_from_db()
+        self.assertEqual((setoran.total_cash_mitra, setoran.nominal_setor), (160000, 155000))
+        self.assertRingkasanBenar()
+
+
+class DashboardCacheTest(TestCase):
+    # KPI per (tanggal, cakupan) di-cache, invalidasi lewat versi per tanggal
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'rahasia')
+        self.cabang = Cabang.objects.create(kode_cabang='C1', nama_cabang='Cabang 1')
+        self.tanggal = datetime.date(2026, 10, 18)
+
+    def test_invalidasi_setelah_commit(self):
+        self.assertEqual(kpi_hari_ini(self.tanggal, self.admin)['total_cabang'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            LHCabang.objects.create(cabang=self.cabang, tanggal=self.tanggal)
+        self.assertEqual(kpi_hari_ini(self.tanggal, self.admin)['total_cabang'], 1)
+
+    def test_hitungan_basi_tidak_tersimpan(self):
+        # Invalidasi yang datang saat KPI sedang dihitung tidak boleh tertimpa hasil lama
+        def hitung_lalu_berubah(tanggal, user):
+            hasil = hitung_kpi(tanggal, user)
+            with self.captureOnCommitCallbacks(execute=True):
+                LHCabang.objects.create(cabang=self.cabang, tanggal=self.tanggal)
+            return hasil
+
+        with mock.patch('operasional.dashboard.hitung_kpi', side_effect=hitung_lalu_berubah):
+            self.assertEqual(kpi_hari_ini(self.tanggal, self.admin)['total_cabang'], 0)
+        self.assertEqual(kpi_hari_ini(self.tanggal, self.admin)['total_cabang'], 1)
+
+    def test_tanggal_datetime(self):
+        kpi_hari_ini(self.tanggal, self.admin)
+        LHCabang.objects.create(cabang=self.cabang, tanggal=self.tanggal)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidasi_dashboard(timezone.make_aware(datetime.datetime(2026, 10, 18, 9)))
+        self.assertEqual(kpi_hari_ini(self.tanggal, self.admin)['total_cabang'], 1)
+
+
+class RekapHarianMitraTest(TestCase):
+    # Rekap dari rollup RekapHarianMitra harus sama persis dengan agregat langsung ke DetailLH
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'rahasia')
+        self.cabang = [Cabang.objects.create(kode_cabang=f'C{i}', nama_cabang=f'Cabang {i}') for i in range(2)]
+        self.mitra = [Karyawan.objects.create(
+            nama_lengkap=f'Mitra {i}', nomor_hp='0812', jabatan='Mitra', tanggal_masuk=datetime.date(2026, 1, 1),
+        ) for i in range(4)]
+        self.laporan = {}
+        for hari in range(1, 6):
+            for i, cabang in enumerate(self.cabang):
+                laporan = LHCabang.objects.create(cabang=cabang, tanggal=datetime.date(2026, 10, hari))
+                self.laporan[hari, i] = laporan
+                for n, mitra in enumerate(self.mitra[i * 2:i * 2 + 2]):
+                    DetailLH.objects.create(
+                        laporan_induk=laporan, mitra=mitra, status_kehadiran='HS'[(hari + n) % 4 == 0],
+                        adonan_bawa_gr=900 + hari * 50 + n * 30, adonan_sisa_gr=hari * 20,
+                        cash_diterima=70000 + hari * 3000 - n * 9000,
+                        jam_berangkat=datetime.time(8, hari * 5), jam_pulang=datetime.time(17, n * 10),
+                    )
+
+    def rekap_lama(self, dari, sampai):
+        # Query halaman Evaluasi Kinerja Mitra sebelum ada rollup
+        detail = DetailLH.objects.filter(laporan_induk__tanggal__range=[dari, sampai])
+        mitra = detail.values('mitra__nama_lengkap').annotate(
+            total_jam=ExpressionWrapper(Sum('durasi_kerja') / 60.0, output_field=FloatField()),
+            total_minus=Sum('selisih_rp', filter=Q(selisih_rp__lt=0)),
+            total_omset=Sum('omzet_bruto_rp'),
+            kehadiran=Count('id'),
+        )
+        cabang = detail.values('laporan_induk__cabang__nama_cabang').annotate(jumlah_berangkat=Count('id'))
+        return (
+            sorted((m['mitra__nama_lengkap'], m['total_jam'], m['total_minus'], m['total_omset'], m['kehadiran']) for m in mitra),
+            sorted((c['laporan_induk__cabang__nama_cabang'], c['jumlah_berangkat']) for c in cabang),
+        )
+
+    def assertRekapSama(self, dari=datetime.date(2026, 10, 1), sampai=datetime.date(2026, 10, 31)):
+        baru = hitung_rekap(dari, sampai, self.admin)
+        self.assertEqual(self.rekap_lama(dari, sampai), (
+            sorted((m['mitra__nama_lengkap'], m['total_jam'], m['total_minus'], m['total_omset'], m['kehadiran'])
+                   for m in baru['rekap_mitra']),
+            sorted((c['cabang__nama_cabang'], c['jumlah_berangkat']) for c in baru['rekap_cabang']),
+        ))
+
+    def test_sama_setelah_perubahan(self):
+        self.assertRekapSama()
+        self.assertRekapSama(datetime.date(2026, 10, 2), datetime.date(2026, 10, 4))
+
+        # Ubah & hapus DetailLH
+        detail = DetailLH.objects.filter(laporan_induk=self.laporan[3, 0]).order_by('pk')
+        ubah = detail[0]
+        ubah.cash_diterima = 0
+        ubah.save()
+        detail[1].delete()
+        DetailLH.objects.create(laporan_induk=self.laporan[3, 1], mitra=self.mitra[1], adonan_bawa_gr=500)
+        self.assertRekapSama()
+
+        # Pindah tanggal laporan: rollup ikut pindah dari tanggal lama
+        laporan = LHCabang.objects.get(pk=self.laporan[2, 1].pk)
+        laporan.tanggal = datetime.date(2026, 10, 20)
+        laporan.save()
+        self.assertFalse(RekapHarianMitra.objects.filter(laporan=laporan).exclude(tanggal=laporan.tanggal).exists())
+        self.assertRekapSama()
+        self.assertRekapSama(datetime.date(2026, 10, 1), datetime.date(2026, 10, 5))
+
+        # Hapus laporan
+        self.laporan[4, 0].delete()
+        self.assertRekapSama()
+        self.assertRekapSama(datetime.date(2026, 10, 4), datetime.date(2026, 10, 20))
+
+
+class RekapCacheTest(TestCase):
+    # Cache rekap per rentang: invalidasi per bulan lewat versi, tanpa indeks bersama
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'rahasia')
+        self.cabang = Cabang.objects.create(kode_cabang='C1', nama_cabang='Cabang 1')
+        self.mitra = Karyawan.objects.create(
+            nama_lengkap='Mitra 1', nomor_hp='0812', jabatan='Mitra', tanggal_masuk=datetime.date(2026, 1, 1),
+        )
+
+    def isi(self, tanggal):
+        laporan = LHCabang.objects.create(cabang=self.cabang, tanggal=tanggal)
+        DetailLH.objects.create(laporan_induk=laporan, mitra=self.mitra, adonan_bawa_gr=1000, cash_diterima=50000)
+
+    def test_hanya_rentang_yang_kena(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.isi(datetime.date(2026, 9, 3))
+        rekap_tersimpan('2026-09-01', '2026-09-05', self.admin)
+        rekap_tersimpan('2026-09-25', '2026-10-20', self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.isi(datetime.date(2026, 10, 15))
+        rekap_tersimpan('2026-09-01', '2026-09-05', self.admin)  # tetap dari cache
+        hasil = rekap_tersimpan('2026-09-25', '2026-10-20', self.admin)  # dihitung ulang
+        self.assertEqual(statistik_cache_rekap(), {'hit': 1, 'miss': 3})
+        self.assertEqual(hasil['rekap_mitra'][0]['kehadiran'], 1)
+
+    def test_rentang_panjang(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.isi(datetime.date(2026, 10, 3))
+        # Satu kunci versi per bulan: 3 tahun = 36 kunci
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as baca_versi:
+            rekap_tersimpan('2024-01-01', '2026-12-31', self.admin)
+        self.assertEqual(len(baca_versi.call_args_list[0].args[0]), 36)
+        # Lebih panjang: dihitung langsung, tanpa membaca kunci versi
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as baca_versi:
+            hasil = rekap_tersimpan('0001-01-01', '9999-12-31', self.admin)
+        self.assertFalse(any(len(c.args[0]) > 1 for c in baca_versi.call_args_list))
+        self.assertEqual(hasil['rekap_mitra'][0]['kehadiran'], 1)
+        self.assertEqual(statistik_cache_rekap(), {'hit': 0, 'miss': 1})
+
+    def test_hitungan_basi_tidak_tersimpan(self):
+        # Perubahan yang commit saat rekap sedang dihitung: hasil lama tidak dipakai lagi
+        def hitung_lalu_berubah(dari, sampai, user):
+            hasil = {nama: list(qs) for nama, qs in hitung_rekap(dari, sampai, user).items()}
+            with self.captureOnCommitCallbacks(execute=True):
+                self.isi(datetime.date(2026, 10, 3))
+            return hasil
+
+        with mock.patch('operasional.rekap.hitung_rekap', side_effect=hitung_lalu_berubah):
+            self.assertEqual(rekap_tersimpan('2026-10-01', '2026-10-05', self.admin)['rekap_mitra'], [])
+        self.assertEqual(len(rekap_tersimpan('2026-10-01', '2026-10-05', self.admin)['rekap_mitra']), 1)
+
+
+class HitungUlangDetailTest(TestCase):
+    # manage.py hitung_ulang_detail: harga berubah, target/sisa/selisih & turunannya ikut
+    def setUp(self):
+        cache.clear()
+        self.aturan = AturanPerusahaan.objects.create(harga_per_gram_target=100)
+        invalidasi_aturan()
+        self.addCleanup(invalidasi_aturan)  # snapshot per proses jangan terbawa ke test lain
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'rahasia')
+        cabang = Cabang.objects.create(kode_cabang='C1', nama_cabang='Cabang 1')
+        mitra = [Karyawan.objects.create(
+            nama_lengkap=f'Mitra {i}', nomor_hp='0812', jabatan='Mitra', tanggal_masuk=datetime.date(2026, 1, 1),
+        ) for i in range(3)]
+        # Cash dipilih supaya dengan harga 92.5 ada selisih plus, minus, dan pecahan
+        for tanggal in (datetime.date(2026, 10, 1), datetime.date(2026, 10, 2)):
+            laporan = LHCabang.objects.create(cabang=cabang, tanggal=tanggal, dibuat_oleh=admin)
+            for m, (bawa, sisa, cash) in zip(mitra, [(1000, 1, 95000), (1001, 2, 50000), (500, 0, 46200)]):
+                DetailLH.objects.create(
+                    laporan_induk=laporan, mitra=m, adonan_bawa_gr=bawa, adonan_sisa_gr=sisa, cash_diterima=cash,
+                )
+        # Harga diganti langsung di database (tanpa menyentuh DetailLH)
+        AturanPerusahaan.objects.filter(pk=self.aturan.pk).update(harga_per_gram_target=92.5)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidasi_aturan()
+
+    def kolom(self):
+        return {d.pk: (d.target_minimal_rp, d.nilai_sisa_rp, d.selisih_rp) for d in DetailLH.objects.all()}
+
+    def harapan(self, harga):
+        hasil = {}
+        for d in DetailLH.objects.all():
+            d.hitung_otomatis(harga)
+            hasil[d.pk] = (int(d.target_minimal_rp), int(d.nilai_sisa_rp), int(d.selisih_rp))
+        return hasil
+
+    def jalankan(self, *args):
+        keluaran = io.StringIO()
+        call_command('hitung_ulang_detail', *args, stdout=keluaran)
+        return keluaran.getvalue()
+
+    def cek_turunan(self):
+        for ringkasan in RingkasanLH.objects.all():
+            selisih = list(DetailLH.objects.filter(laporan_induk=ringkasan.laporan_id).values_list('selisih_rp', flat=True))
+            self.assertEqual((ringkasan.total_selisih, ringkasan.jumlah_minus),
+                             (sum(selisih), sum(s < 0 for s in selisih)))
+        for rekap in RekapHarianMitra.objects.all():
+            selisih = DetailLH.objects.get(laporan_induk=rekap.laporan_id, mitra=rekap.mitra_id).selisih_rp
+            self.assertEqual(rekap.total_minus, min(selisih, 0))
+
+    def test_harga_baru_sama_dengan_hitung_otomatis(self):
+        self.assertEqual(self.kolom(), self.harapan(100))
+        self.assertIn("6 dari 6 baris diperbarui", self.jalankan())
+        self.assertEqual(self.kolom(), self.harapan(92.5))
+        self.assertIn(-42407, [s for _, _, s in self.kolom().values()])  # dibulatkan ke nol seperti int()
+        self.cek_turunan()
+        # Sudah sesuai: jalan ulang tidak mengubah apa pun
+        self.assertIn("0 dari 6 baris diperbarui", self.jalankan())
+
+    def test_dry_run_tidak_menyimpan(self):
+        sebelum = self.kolom()
+        ringkasan = list(RingkasanLH.objects.values_list('total_selisih', 'jumlah_minus'))
+        keluaran = self.jalankan('--dry-run')
+        self.assertIn("6 dari 6 baris akan berubah (harga 92.5/gr)", keluaran)
+        self.assertEqual(self.kolom(), sebelum)
+        self.assertEqual(list(RingkasanLH.objects.values_list('total_selisih', 'jumlah_minus')), ringkasan)
+
+    def test_lanjut_dari_checkpoint(self):
+        panggilan = []
+
+        def putus_di_potongan_kedua(detail, harga, dari_pk, sampai_pk):
+            panggilan.append((dari_pk, sampai_pk))
+            if len(panggilan) == 2:
+                raise RuntimeError("koneksi putus")
+            return proses_potongan(detail, harga, dari_pk, sampai_pk)
+
+        pk = sorted(self.kolom())
+        perintah = 'operasional.management.commands.hitung_ulang_detail.proses_potongan'
+        with mock.patch(perintah, side_effect=putus_di_potongan_kedua):
+            with self.assertRaises(RuntimeError):
+                self.jalankan('--ukuran', '4')
+        self.assertEqual(panggilan, [(0, pk[3]), (pk[3], pk[5])])
+        # Potongan pertama sudah tersimpan, sisanya belum
+        harapan, sekarang = self.harapan(92.5), self.kolom()
+        self.assertEqual([sekarang[p] == harapan[p] for p in pk], [True] * 4 + [False] * 2)
+
+        panggilan.clear()
+        with mock.patch(perintah, side_effect=proses_potongan) as proses:
+            keluaran = self.jalankan('--ukuran', '4', '--lanjut')
+        self.assertIn(f"Melanjutkan dari DetailLH #{pk[3]}.", keluaran)
+        self.assertEqual([c.args[2:] for c in proses.call_args_list], [(pk[3], pk[5])])
+        self.assertEqual(self.kolom(), harapan)
+        self.cek_turunan()
+
+
+class BonusPekananTest(TestCase):
+    # Pekan 2026-W41: Senin 5 s/d Minggu 11 Oktober 2026
+    def setUp(self):
+        aturan = AturanPerusahaan.objects.create()
+        TierBonusMitra.objects.create(aturan=aturan, min_omset_harian=100000, nominal_bonus_pekanan=50000)
+        TierBonusMitra.objects.create(aturan=aturan, min_omset_harian=200000, nominal_bonus_pekanan=120000)
+        TierBonusCabang.objects.create(aturan=aturan, min_mitra_berangkat=2, nominal_bonus_cabang=75000)
+        TierBonusCabang.objects.create(aturan=aturan, min_mitra_berangkat=3, nominal_bonus_cabang=150000)
+        self.addCleanup(invalidasi_aturan)  # snapshot per proses jangan terbawa ke test lain
+
+        masuk = datetime.date(2026, 1, 1)
+        self.kacab = Karyawan.objects.create(nama_lengkap='Kacab', nomor_hp='0811', jabatan='Kepala Cabang', tanggal_masuk=masuk)
+        self.cabang = Cabang.objects.create(kode_cabang='C1', nama_cabang='Cabang 1', kepala_cabang=self.kacab)
+        self.mitra = [
+            Karyawan.objects.create(nama_lengkap=f'Mitra {i}', nomor_hp='0812', jabatan='Mitra', tanggal_masuk=masuk)
+            for i in range(3)
+        ]
+        senin = LHCabang.objects.create(cabang=self.cabang, tanggal=datetime.date(2026, 10, 5))
+        self.selasa = LHCabang.objects.create(cabang=self.cabang, tanggal=datetime.date(2026, 10, 6))
+        # Tepat di ambang tier 1, kurang satu rupiah, tepat di ambang tier 2
+        for laporan, omzet in ((senin, (100000, 99999, 200000)), (self.selasa, (100000, None, 200000))):
+            for mitra, cash in zip(self.mitra, omzet):
+                if cash is None:
+                    DetailLH.objects.create(laporan_induk=laporan, mitra=mitra, status_kehadiran='S')
+                else:
+                    DetailLH.objects.create(laporan_induk=laporan, mitra=mitra, cash_diterima=cash)
+
+    def test_batas_tier(self):
+        draft = hitung_bonus(datetime.date(2026, 10, 8))  # tanggal mana pun di pekan itu
+        self.assertEqual((draft['mulai'], draft['pekan']), (datetime.date(2026, 10, 5), '2026-W41'))
+        nominal = {b['mitra']: b['nominal'] for b in draft['baris']}
+        self.assertEqual(nominal, {
+            self.mitra[0].pk: 50000,
+            self.mitra[2].pk: 120000,
+            # Hadir 3 lalu 2 mitra: rata-rata 2.5, belum sampai ambang 3
+            self.kacab.pk: 75000,
+        })
+        self.assertEqual({b['laporan'] for b in draft['baris']}, {self.selasa.pk})
+
+    def test_posting_pekan_sama_dua_kali(self):
+        self.assertEqual(posting_bonus(hitung_bonus(datetime.date(2026, 10, 5))), 3)
+        bonus = list(PengeluaranLH.objects.filter(kategori='BONUS').values_list('pk', 'mitra_id', 'nominal'))
+        self.assertEqual(posting_bonus(hitung_bonus(datetime.date(2026, 10, 11))), 0)
+        self.assertEqual(list(PengeluaranLH.objects.filter(kategori='BONUS').values_list('pk', 'mitra_id', 'nominal')), bonus)
+        ringkasan = RingkasanLH.objects.get(laporan=self.selasa)
+        self.assertEqual(ringkasan.total_pengeluaran, 50000 + 120000 + 75000)
+
+
+class GajiDataMixin:
+    # Periode Oktober 2026, dua cabang tugas
+    def isi_data(self):
+        self.cabang = [Cabang.objects.create(kode_cabang=f'C{i}', nama_cabang=f'Cabang {i}') for i in (1, 2)]
+        self.lama = self.karyawan('Lama', datetime.date(2026, 1, 1), self.cabang[0])
+        self.baru = self.karyawan('Baru', datetime.date(2026, 9, 15), self.cabang[1])
+        self.nanti = self.karyawan('Nanti', datetime.date(2026, 11, 3), self.cabang[0])
+        laporan = LHCabang.objects.create(cabang=self.cabang[0], tanggal=datetime.date(2026, 10, 5))
+        DetailLH.objects.create(laporan_induk=laporan, mitra=self.lama, cash_diterima=100000)
+        PengeluaranLH.objects.create(laporan_induk=laporan, kategori='KASBON', mitra=self.lama, nominal=20000)
+        laporan = LHCabang.objects.create(cabang=self.cabang[1], tanggal=datetime.date(2026, 10, 6))
+        DetailLH.objects.create(laporan_induk=laporan, mitra=self.baru, status_kehadiran='A')
+        self.periode = PeriodeGaji.objects.create(bulan=datetime.date(2026, 10, 1))
+
+    def karyawan(self, nama, masuk, cabang):
+        return Karyawan.objects.create(
+            nama_lengkap=nama, nomor_hp='0812', jabatan='Mitra', tanggal_masuk=masuk, cabang_tugas=cabang,
+        )
+
+    def slip(self):
+        return {
+            s['karyawan_id']: s for s in SlipGaji.objects.filter(periode=self.periode).values(
+                'id', 'karyawan_id', 'gaji_pokok', 'insentif_kehadiran', 'potongan_kasbon', 'total', 'sidik', 'diperbarui',
+            )
+        }
+
+
+class ProsesGajiTest(GajiDataMixin, TestCase):
+    def setUp(self):
+        self.isi_data()
+
+    def test_proses_ulang_tidak_menulis(self):
+        hasil, _ = proses_periode(self.periode)
+        self.assertEqual(sum(h['baru'] for h in hasil), 2)
+        awal = self.slip()
+        self.assertEqual(awal[self.lama.pk]['total'], 2000000 + 150000 - 20000)
+        self.assertEqual(awal[self.baru.pk]['total'], 1800000)  # training, ada Alfa
+
+        hasil, terhapus = proses_periode(self.periode)
+        self.assertEqual([(h['baru'], h['ubah']) for h in hasil], [(0, 0), (0, 0)])
+        self.assertEqual((terhapus, self.slip()), (0, awal))
+
+        # Hanya slip yang masukannya berubah yang ditulis ulang
+        PengeluaranLH.objects.filter(mitra=self.lama).update(nominal=30000)
+        hasil, _ = proses_periode(self.periode)
+        self.assertEqual(sum(h['ubah'] for h in hasil), 1)
+        akhir = self.slip()
+        self.assertEqual(akhir[self.lama.pk]['potongan_kasbon'], 30000)
+        self.assertEqual(akhir[self.baru.pk], awal[self.baru.pk])
+
+    def test_karyawan_belum_masuk_tidak_digaji(self):
+        proses_periode(self.periode)
+        self.assertNotIn(self.nanti.pk, self.slip())
+        # Masuk di hari terakhir periode: digaji (training)
+        Karyawan.objects.filter(pk=self.nanti.pk).update(tanggal_masuk=datetime.date(2026, 10, 31))
+        proses_periode(self.periode)
+        self.assertEqual(self.slip()[self.nanti.pk]['gaji_pokok'], 1800000)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Butuh database yang bisa ditulis beberapa proses (PostgreSQL)")
+class ProsesGajiParalelTest(GajiDataMixin, TransactionTestCase):
+    # Jalur process pool (spawn): worker membuka database test yang sama
+    def setUp(self):
+        self.isi_data()
+
+    def test_paralel_sama_dengan_berurutan(self):
+        proses_periode(self.periode, jumlah_proses=2)
+        paralel = self.slip()
+        hasil, terhapus = proses_periode(self.periode, jumlah_proses=2)
+        self.assertEqual([(h['baru'], h['ubah']) for h in hasil], [(0, 0), (0, 0)])
+        self.assertEqual((terhapus, self.slip()), (0, paralel))
+
+        SlipGaji.objects.all().delete()
+        proses_periode(self.periode)
+        berurutan = self.slip()
+        self.assertEqual(
+            {k: s['sidik'] for k, s in paralel.items()}, {k: s['sidik'] for k, s in berurutan.items()},
+        )
+
+
+class KirimLaporanTest(TestCase):
+    # Satu POST JSON untuk satu hari laporan, idempoten lewat Idempotency-Key
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'rahasia')
+        self.client.force_login(self.admin)
+        self.cabang = Cabang.objects.create(kode_cabang='C1', nama_cabang='Cabang 1')
+        self.mitra = [Karyawan.objects.create(
+            nama_lengkap=f'Mitra {i}', nomor_hp='0812', jabatan='Mitra', tanggal_masuk=datetime.date(2026, 1, 1),
+            cabang_tugas=self.cabang,
+        ) for i in range(7)]
+        self.url = reverse('admin:operasional_lhcabang_kirim')
+
+    def isi(self, mitra, **kwargs):
+        return {
+            'cabang': 'C1', 'tanggal': '2026-10-18',
+            'detail': [
+                {'mitra': m.pk, 'adonan_bawa_gr': 1000, 'adonan_sisa_gr': 100, 'cash_diterima': 80000,
+                 'jam_berangkat': '08:00', 'jam_pulang': '17:00'}
+                for m in mitra
+            ],
+            'pengeluaran': [{'kategori': 'OPERASIONAL', 'item': 'Galon', 'nominal': 5000}],
+            **kwargs,
+        }
+
+    def kirim(self, isi, kunci='k1'):
+        return self.client.post(self.url, json.dumps(isi), content_type='application/json', HTTP_IDEMPOTENCY_KEY=kunci)
+
+    def test_simpan_sekali_walau_dikirim_ulang(self):
+        respons = self.kirim(self.isi(self.mitra[:3]))
+        self.assertEqual(respons.status_code, 201, respons.content)
+        hasil = respons.json()
+        self.assertEqual(hasil['ringkasan']['total_cash'], 240000)
+        self.assertEqual(hasil['ringkasan']['wajib_setor'], 235000)
+        self.assertEqual(DetailLH.objects.get(mitra=self.mitra[0]).durasi_kerja, 540)
+
+        ulang = self.kirim(self.isi(self.mitra[:3]))
+        self.assertEqual(ulang.status_code, 201)
+        self.assertEqual(ulang['Idempotent-Replayed'], 'true')
+        self.assertEqual(ulang.json(), hasil)
+        self.assertEqual(DetailLH.objects.count(), 3)
+        self.assertEqual(PengeluaranLH.objects.count(), 1)
+
+        # Kunci sama, isi berbeda: ditolak
+        self.assertEqual(self.kirim(self.isi(self.mitra[:2])).status_code, 422)
+
+    def test_kirim_baru_mengganti_isi_laporan(self):
+        self.kirim(self.isi(self.mitra[:3]))
+        respons = self.kirim(self.isi(self.mitra[3:5], pengeluaran=[]), kunci='k2')
+        self.assertEqual(respons.status_code, 200, respons.content)
+        self.assertFalse(respons.json()['baru'])
+        self.assertEqual(LHCabang.objects.count(), 1)
+        self.assertEqual(set(DetailLH.objects.values_list('mitra', flat=True)), {m.pk for m in self.mitra[3:5]})
+        self.assertEqual(respons.json()['ringkasan']['total_pengeluaran'], 0)
+
+    def test_galat_tidak_menyimpan_apa_pun(self):
+        isi = self.isi(self.mitra[:2])
+        isi['detail'].append(dict(isi['detail'][0]))
+        isi['detail'][1]['adonan_bawa_gr'] = -5
+        respons = self.kirim(isi)
+        self.assertEqual(respons.status_code, 400)
+        galat = respons.json()['errors']['detail']
+        self.assertEqual(galat['1']['adonan_bawa_gr'][0]['code'], 'min_value')
+        self.assertEqual(galat['2']['mitra'][0]['code'], 'duplikat')
+        self.assertFalse(LHCabang.objects.exists())
+        self.assertFalse(KirimanLaporan.objects.exists())
+        # Kunci yang sama boleh dipakai lagi setelah diperbaiki
+        self.assertEqual(self.kirim(self.isi(self.mitra[:2])).status_code, 201)
+
+    def test_mitra_cabang_lain_ditolak(self):
+        # Kacab dua cabang: mitra C2 tidak boleh masuk laporan C1
+        user = User.objects.create_user('kacab', password='rahasia', is_staff=True)
+        user.user_permissions.add(*Permission.objects.filter(codename__in=['add_lhcabang', 'change_lhcabang']))
+        kacab = Karyawan.objects.create(
+            nama_lengkap='Kacab', nomor_hp='0813', jabatan='Kepala Cabang', tanggal_masuk=datetime.date(2026, 1, 1), user=user,
+        )
+        Cabang.objects.filter(pk='C1').update(kepala_cabang=kacab)
+        c2 = Cabang.objects.create(kode_cabang='C2', nama_cabang='Cabang 2', kepala_cabang=kacab)
+        Karyawan.objects.filter(pk=self.mitra[1].pk).update(cabang_tugas=c2)
+        self.client.force_login(user)
+
+        respons = self.kirim(self.isi(self.mitra[:2]))
+        self.assertEqual(respons.status_code, 400, respons.content)
+        self.assertEqual(list(respons.json()['errors']['detail']), ['1'])
+        self.assertEqual(respons.json()['errors']['detail']['1']['mitra'][0]['code'], 'invalid_choice')
+        # Superuser pun tidak bisa
+        self.client.force_login(self.admin)
+        self.assertEqual(self.kirim(self.isi(self.mitra[1:2]), kunci='k2').status_code, 400)
+        self.assertFalse(LHCabang.objects.exists())
+
+    def test_jumlah_query_tetap(self):
+        # 1 atau 7 mitra: validasi & simpan dengan jumlah query yang sama
+        def jumlah_query(mitra, kunci):
+            from django.db import connection
+            from django.test.utils import CaptureQueriesContext
+            with CaptureQueriesContext(connection) as query:
+                self.assertEqual(self.kirim(self.isi(mitra), kunci).status_code, 201)
+            return len(query)
+
+        self.kirim(self.isi(self.mitra[:1]), 'pemanasan')  # isi cache peran & akses
+        LHCabang.objects.all().delete()
+        KirimanLaporan.objects.all().delete()
+        sedikit = jumlah_query(self.mitra[:1], 'a')
+        LHCabang.objects.all().delete()
+        self.assertEqual(jumlah_query(self.mitra, 'b'), sedikit)
+
+
+@override_settings(STREAM_KPI=True)
+class StreamKpiTest(TestCase):
+    # Dashboard: perubahan DetailLH sampai ke stream SSE, sambung ulang pakai Last-Event-ID
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'rahasia')
+        self.cabang = Cabang.objects.create(kode_cabang='C1', nama_cabang='Cabang 1')
+        self.mitra = Karyawan.objects.create(
+            nama_lengkap='Mitra 1', nomor_hp='0812', jabatan='Mitra', tanggal_masuk=datetime.date(2026, 1, 1),
+        )
+        self.laporan = LHCabang.objects.create(cabang=self.cabang, tanggal=timezone.localdate(), dibuat_oleh=self.admin)
+
+    async def buka(self, headers=None):
+        await self.async_client.aforce_login(self.admin)
+        respons = await self.async_client.get(reverse('stream_kpi'), headers=headers)
+        self.assertEqual(respons['Content-Type'], 'text/event-stream')
+        aliran = aiter(respons.streaming_content)
+        self.assertTrue((await anext(aliran)).startswith(b'retry:'))
+        return aliran
+
+    async def event(self, aliran):
+        teks = (await asyncio.wait_for(anext(aliran), 5)).decode()
+        baris = dict(b.split(': ', 1) for b in teks.strip().split('\n'))
+        return baris['id'], json.loads(baris['data'])
+
+    @mock.patch('operasional.siaran.INTERVAL_BACA', 0.05)
+    async def test_perubahan_dikirim_dan_sambung_ulang(self):
+        aliran = await self.buka()
+        id_awal, awal = await self.event(aliran)
+        self.assertEqual(awal['kpi']['total_minus'], 0)
+        self.assertIsNone(awal['delta'])
+
+        await sync_to_async(DetailLH.objects.create)(
+            laporan_induk=self.laporan, mitra=self.mitra, adonan_bawa_gr=1000, cash_diterima=0,
+        )
+        id_baru, baru = await self.event(aliran)
+        self.assertNotEqual(id_baru, id_awal)
+        self.assertEqual(baru['delta'], {'total_karyawan': 1, 'total_minus': 1})
+        await aliran.aclose()
+
+        # Sambung ulang dengan id terakhir: tidak ada yang terlewat, tidak dikirim ulang
+        aliran = await self.buka({'Last-Event-ID': id_baru})
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(anext(aliran), 0.3)
+        await aliran.aclose()
+        # Dari id lama: perubahan yang terlewat langsung dikirim
+        aliran = await self.buka({'Last-Event-ID': id_awal})
+        _, susulan = await self.event(aliran)
+        self.assertEqual(susulan['kpi'], baru['kpi'])
+        await aliran.aclose()
+
+    @mock.patch.dict('operasional.siaran._bersih', {'berikut': 0.0})
+    def test_feed_lama_dibersihkan_saat_menulis(self):
+        # Tanpa koneksi stream (mis. WSGI): penulisan feed sendiri yang membersihkan baris lama
+        lama = PerubahanLaporan.objects.create(tanggal=datetime.date(2026, 1, 1), cabang=self.cabang)
+        PerubahanLaporan.objects.filter(pk=lama.pk).update(dibuat=timezone.now() - datetime.timedelta(days=2))
+        with self.captureOnCommitCallbacks(execute=True):
+            DetailLH.objects.create(laporan_induk=self.laporan, mitra=self.mitra, adonan_bawa_gr=1000)
+        self.assertEqual(set(PerubahanLaporan.objects.values_list('tanggal', flat=True)), {self.laporan.tanggal})
+
+    @mock.patch('operasional.siaran.INTERVAL_BACA', 0.05)
+    @mock.patch.dict('operasional.siaran._bersih', {'berikut': 0.0})
+    async def test_feed_lama_dibersihkan_pembaca(self):
+        # Tanpa penulisan baru: pembaca feed yang membersihkan
+        lama = await PerubahanLaporan.objects.acreate(tanggal=datetime.date(2026, 1, 1), cabang=self.cabang)
+        await PerubahanLaporan.objects.filter(pk=lama.pk).aupdate(dibuat=timezone.now() - datetime.timedelta(days=2))
+        aliran = await self.buka()
+        await self.event(aliran)
+        for _ in range(100):
+            if not await PerubahanLaporan.objects.filter(pk=lama.pk).aexists():
+                break
+            await asyncio.sleep(0.05)
+        self.assertFalse(await PerubahanLaporan.objects.filter(pk=lama.pk).aexists())
+        await aliran.aclose()
+
+    @mock.patch('operasional.siaran.INTERVAL_BACA', 0.05)
+    @mock.patch('operasional.siaran.DETAK', 0.05)
+    async def test_lewat_tengah_malam(self):
+        await sync_to_async(DetailLH.objects.create)(laporan_induk=self.laporan, mitra=self.mitra, adonan_bawa_gr=1000)
+        aliran = await self.buka()
+        _, awal = await self.event(aliran)
+        self.assertEqual(awal['kpi']['total_karyawan'], 1)
+
+        besok = self.laporan.tanggal + datetime.timedelta(days=1)
+        with mock.patch('operasional.siaran._hari_ini', return_value=besok):
+            teks = ''
+            while 'event: kpi' not in teks:
+                teks = (await asyncio.wait_for(anext(aliran), 5)).decode()
+            baris = dict(b.split(': ', 1) for b in teks.strip().split('\n'))
+            data = json.loads(baris['data'])
+            self.assertEqual((data['tanggal'], data['kpi']['total_karyawan'], data['delta']), (besok.isoformat(), 0, None))
+            self.assertTrue(baris['id'].startswith(besok.isoformat()))
+
+            # Perubahan laporan besok ikut dikirim, laporan kemarin tidak lagi
+            laporan = await LHCabang.objects.acreate(cabang=self.cabang, tanggal=besok, dibuat_oleh=self.admin)
+            await sync_to_async(DetailLH.objects.create)(laporan_induk=laporan, mitra=self.mitra, adonan_bawa_gr=500)
+            teks = ''
+            while 'event: kpi' not in teks:
+                teks = (await asyncio.wait_for(anext(aliran), 5)).decode()
+            self.assertIn(f'"tanggal": "{besok.isoformat()}"', teks)
+            self.assertIn('"total_karyawan": 1', teks)
+        await aliran.aclose()
+
+    @override_settings(STREAM_KPI=False)
+    def test_wsgi_tanpa_feed(self):
+        PerubahanLaporan.objects.all().delete()  # dari setUp
+        DetailLH.objects.create(laporan_induk=self.laporan, mitra=self.mitra, adonan_bawa_gr=1000)
+        self.assertFalse(PerubahanLaporan.objects.exists())
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('stream_kpi')).status_code, 204)
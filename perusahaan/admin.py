@@ -1,16 +1,76 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from .cari import cari_cabang, cari_karyawan
+from .impor import KOLOM_CABANG, KOLOM_KARYAWAN, baca_csv, impor
 from .models import Departemen, Karyawan, Cabang
 
 @admin.register(Departemen)
 class DepartemenAdmin(admin.ModelAdmin):
     list_display = ('kode_departemen', 'nama_departemen')
 
+class ImporCSVForm(forms.Form):
+    karyawan = forms.FileField(required=False, label="CSV Karyawan")
+    cabang = forms.FileField(required=False, label="CSV Cabang")
+    cek = forms.BooleanField(required=False, label="Cek saja (jangan simpan)")
+
+    def clean(self):
+        data = super().clean()
+        if not data.get('karyawan') and not data.get('cabang'):
+            raise forms.ValidationError("Pilih minimal satu file CSV.")
+        return data
+
 @admin.register(Karyawan)
 class KaryawanAdmin(admin.ModelAdmin):
     list_display = ('id_staff', 'nama_lengkap', 'nomor_hp', 'jabatan', 'cabang_tugas')
-    list_filter = ('jabatan', 'cabang_tugas') # filter dropdown
+    list_filter = ('peran', 'bisa_mitra', 'jabatan', 'cabang_tugas') # filter dropdown
     search_fields = ('id_staff', 'nama_lengkap', 'nomor_hp') # kolom search
-    
+
+    # Pencarian ber-index trigram + nomor HP ternormalisasi (perusahaan/cari.py)
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return cari_karyawan(queryset, search_term, urut=not request.GET.get(ORDER_VAR)), False
+
+    # Impor massal karyawan & cabang dari CSV (logika di perusahaan/impor.py)
+    def get_urls(self):
+        urls = [
+            path('impor/', self.admin_site.admin_view(self.impor_view), name='perusahaan_karyawan_impor'),
+        ]
+        return urls + super().get_urls()
+
+    def impor_view(self, request):
+        if not (self.has_add_permission(request) and request.user.has_perm('perusahaan.add_cabang')):
+            raise PermissionDenied
+        form = ImporCSVForm(request.POST or None, request.FILES or None)
+        hasil = None
+        if request.method == 'POST' and form.is_valid():
+            try:
+                baris_karyawan = baca_csv(form.cleaned_data['karyawan']) if form.cleaned_data['karyawan'] else []
+                baris_cabang = baca_csv(form.cleaned_data['cabang']) if form.cleaned_data['cabang'] else []
+            except UnicodeDecodeError:
+                form.add_error(None, "File harus CSV dengan encoding UTF-8.")
+            else:
+                hasil = impor(baris_karyawan, baris_cabang, simpan=not form.cleaned_data['cek'])
+                if not form.cleaned_data['cek'] and not hasil['galat']:
+                    self.message_user(request, f"{hasil['cabang']} cabang dan {hasil['karyawan']} karyawan berhasil diimpor.", messages.SUCCESS)
+                    return redirect('admin:perusahaan_karyawan_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Impor Karyawan & Cabang (CSV)",
+            'opts': self.model._meta,
+            'form': form,
+            'hasil': hasil,
+            'kolom_karyawan': KOLOM_KARYAWAN,
+            'kolom_cabang': KOLOM_CABANG,
+        }
+        return TemplateResponse(request, 'admin/perusahaan/karyawan/impor.html', context)
+
 @admin.register(Cabang)
 class CabangAdmin(admin.ModelAdmin):
     list_display = ('kode_cabang', 'nama_cabang', 'kepala_cabang')
@@ -18,6 +78,11 @@ class CabangAdmin(admin.ModelAdmin):
                      'kepala_cabang__id_staff', # foreign key di sf tidak boleh langsung
                      'kepala_cabang__nama_lengkap')     # 'kepala_cabang_
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return cari_cabang(queryset, search_term, urut=not request.GET.get(ORDER_VAR)), False
+
 # --- GRAFIK CHART ---
 original_index = admin.site.index
 
@@ -0,0 +1,68 @@
+import uuid
+from django.core.cache import cache
+from django.db import transaction
+
+# Cabang yang boleh dilihat seorang user (kepala cabang), dihitung sekali per request
+# lalu disimpan di objek request.user. Antar request di-cache sebentar di cache bersama,
+# dengan satu kunci versi yang diganti setiap data Cabang/Karyawan berubah.
+# Query admin cukup memfilter `cabang_id__in`, tanpa join User -> Karyawan -> Cabang.
+KUNCI_VERSI = 'perusahaan:akses:versi'
+WAKTU_CACHE = 120  # detik
+
+
+def _kunci(user_id):
+    return f"perusahaan:akses:cabang:{user_id}"
+
+
+def cabang_diizinkan(user):
+    # None = semua cabang (superuser), selain itu frozenset kode cabang
+    if user.is_superuser:
+        return None
+    memo = getattr(user, '_cabang_diizinkan', None)
+    if memo is not None:
+        return memo
+
+    from .models import Cabang
+
+    kunci = _kunci(user.pk)
+    tersimpan = cache.get_many([KUNCI_VERSI, kunci])
+    versi = tersimpan.get(KUNCI_VERSI)
+    entri = tersimpan.get(kunci)
+    if entri is not None and versi is not None and entri[0] == versi:
+        kode = entri[1]
+    else:
+        kode = frozenset(Cabang.objects.filter(kepala_cabang__user=user).values_list('pk', flat=True))
+        if versi is None:
+            versi = uuid.uuid4().hex
+            cache.add(KUNCI_VERSI, versi, None)
+        cache.set(kunci, (versi, kode), WAKTU_CACHE)
+    user._cabang_diizinkan = kode
+    return kode
+
+
+def saring_cabang(qs, user, lookup='cabang_id'):
+    # lookup: jalur ke kode cabang dari model qs, mis. 'laporan_induk__cabang_id'
+    kode = cabang_diizinkan(user)
+    if kode is None:
+        return qs
+    return qs.filter(**{f'{lookup}__in': kode})
+
+
+def cakupan(user):
+    # Nama cakupan untuk kunci cache hasil (dashboard, rekap): user dengan
+    # cabang yang sama berbagi hasil yang sama
+    kode = cabang_diizinkan(user)
+    return 'semua' if kode is None else 'cabang:' + ','.join(sorted(kode))
+
+
+def versi_akses():
+    # Versi data Cabang/Karyawan saat ini, dipakai juga sebagai bagian kunci cache lain
+    versi = cache.get(KUNCI_VERSI)
+    if versi is None:
+        cache.add(KUNCI_VERSI, uuid.uuid4().hex, None)
+        versi = cache.get(KUNCI_VERSI)
+    return versi
+
+
+def invalidasi_akses():
+    transaction.on_commit(lambda: cache.set(KUNCI_VERSI, uuid.uuid4().hex, None))
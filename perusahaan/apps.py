@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class PerusahaanConfig(AppConfig):
     name = 'perusahaan'
-    verbose_name = 'PERUSAHAAN'
\ No newline at end of file
+    verbose_name = 'PERUSAHAAN'
+
+    def ready(self):
+        from . import signals  # noqa: F401 daftarkan invalidasi cache akses cabang
@@ -0,0 +1,89 @@
+import re
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.text import smart_split, unescape_string_literal
+
+# Pencarian Karyawan & Cabang untuk admin (search box changelist).
+# Di Postgres setiap kolom yang dicari punya index GIN pg_trgm (migrasi
+# perusahaan 0006), jadi `icontains` tidak lagi scan tabel dan hasilnya diurutkan
+# dengan kemiripan trigram. Di SQLite (test) jatuh ke filter & urutan biasa.
+# Seperti search admin bawaan, kata dipisah spasi (frasa boleh diberi tanda
+# kutip) dan setiap kata harus cocok dengan salah satu kolom.
+_BUKAN_DIGIT = re.compile(r'\D')
+_MIRIP_NOMOR_HP = re.compile(r'^\+?[\d\s\-()]{4,}$')
+
+
+def normalisasi_hp(nomor):
+    # '0812-3456', '+62 812 3456', '62812 3456' -> '628123456'
+    digit = _BUKAN_DIGIT.sub('', nomor or '')
+    if digit.startswith('0'):
+        return '62' + digit[1:]
+    if digit.startswith('8'):
+        return '62' + digit
+    return digit
+
+
+def _kata_hp(kata):
+    # Potongan nomor HP dari kata pencarian, None kalau bukan nomor.
+    # '0812'/'+62812' jadi awalan '62812', digit lain dicari di tengah nomor.
+    if not _MIRIP_NOMOR_HP.match(kata):
+        return None
+    digit = _BUKAN_DIGIT.sub('', kata)
+    if digit.startswith('0') or kata.startswith('+') or digit.startswith('62'):
+        return normalisasi_hp(digit)
+    return digit
+
+
+def daftar_kata(teks):
+    # Sama dengan ModelAdmin.get_search_results: '"Budi Santoso" 0812' -> ['Budi Santoso', '0812']
+    hasil = []
+    for kata in smart_split(teks):
+        if kata[0] in ('"', "'") and kata[0] == kata[-1] and len(kata) > 1:
+            kata = unescape_string_literal(kata)
+        if kata:
+            hasil.append(kata)
+    return hasil
+
+
+def _postgres():
+    return connection.vendor == 'postgresql'
+
+
+def _urutkan(qs, kata, kolom_nama):
+    if _postgres():
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        return qs.annotate(kemiripan=TrigramSimilarity(kolom_nama, kata)).order_by('-kemiripan')
+    # SQLite: awalan nama lebih dulu
+    return qs.annotate(kemiripan=Case(
+        When(**{f'{kolom_nama}__istartswith': kata}, then=Value(1)),
+        default=Value(0), output_field=IntegerField(),
+    )).order_by('-kemiripan')
+
+
+def filter_karyawan(kata):
+    # Satu kata pencarian
+    q = Q(id_staff__icontains=kata) | Q(nama_lengkap__icontains=kata)
+    hp = _kata_hp(kata)
+    if hp:
+        q |= Q(nomor_hp_normal__contains=hp)
+    return q
+
+
+def cari_karyawan(qs, teks, urut=True):
+    # urut=False kalau user memilih urutan kolom sendiri (parameter `o` di admin)
+    for kata in daftar_kata(teks):
+        qs = qs.filter(filter_karyawan(kata))
+    return _urutkan(qs, teks.strip(), 'nama_lengkap') if urut else qs
+
+
+def cari_cabang(qs, teks, urut=True):
+    from .models import Karyawan
+
+    for kata in daftar_kata(teks):
+        # Kepala cabang dicari lewat subquery ber-index, tanpa JOIN di query utama
+        kepala = Karyawan.objects.filter(filter_karyawan(kata)).values('pk')
+        qs = qs.filter(
+            Q(kode_cabang__icontains=kata) | Q(nama_cabang__icontains=kata) | Q(kepala_cabang__in=kepala)
+        )
+    return _urutkan(qs, teks.strip(), 'nama_cabang') if urut else qs
@@ -0,0 +1,193 @@
+import csv
+import datetime
+import io
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .akses import invalidasi_akses
+from .cari import normalisasi_hp
+from .models import Cabang, Departemen, Karyawan
+from .peran import KEPALA_CABANG, bisa_mitra_dari_jabatan, peran_dari_jabatan
+from .urutan import isi_id_staff
+
+# Impor karyawan & cabang dari CSV (dipakai `manage.py impor_karyawan` dan tombol
+# Impor CSV di admin Karyawan). Semua baris divalidasi dulu, referensi dicari
+# sekali per tabel, lalu baris yang valid disimpan dengan bulk_create dalam satu
+# transaksi. Baris yang salah dilaporkan tanpa membatalkan baris lain.
+KOLOM_KARYAWAN = ['id_staff', 'nama_lengkap', 'nomor_hp', 'departemen', 'jabatan', 'tanggal_masuk', 'status', 'cabang_tugas']
+KOLOM_CABANG = ['kode_cabang', 'nama_cabang', 'kepala_cabang']
+WAJIB_KARYAWAN = {'nama_lengkap', 'nomor_hp', 'jabatan', 'tanggal_masuk'}
+WAJIB_CABANG = {'kode_cabang', 'nama_cabang'}
+
+FORMAT_TANGGAL = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+UKURAN_BATCH = 500
+
+
+def baca_csv(berkas):
+    # berkas: path, file teks, atau file upload (bytes). Pemisah ',' atau ';' (Excel Indonesia).
+    if isinstance(berkas, str):
+        with open(berkas, encoding='utf-8-sig', newline='') as f:
+            return baca_csv(f)
+    isi = berkas.read()
+    if isinstance(isi, bytes):
+        isi = isi.decode('utf-8-sig')
+    try:
+        dialek = csv.Sniffer().sniff(isi[:4096], delimiters=',;')
+    except csv.Error:
+        dialek = csv.excel
+    pembaca = csv.DictReader(io.StringIO(isi), dialect=dialek)
+    pembaca.fieldnames = [(k or '').strip().lower() for k in (pembaca.fieldnames or [])]
+    # Nomor baris mengikuti tampilan spreadsheet (baris 1 = header)
+    return [
+        (no, {k: (v or '').strip() for k, v in baris.items() if k})
+        for no, baris in enumerate(pembaca, start=2)
+    ]
+
+
+def _tanggal(teks):
+    for fmt in FORMAT_TANGGAL:
+        try:
+            return datetime.datetime.strptime(teks, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"tanggal '{teks}' tidak dikenali (pakai YYYY-MM-DD atau DD/MM/YYYY)")
+
+
+def _pesan(e):
+    if isinstance(e, ValidationError) and hasattr(e, 'message_dict'):
+        return '; '.join(f"{k}: {' '.join(v)}" for k, v in e.message_dict.items())
+    if isinstance(e, ValidationError):
+        return ' '.join(e.messages)
+    return str(e)
+
+
+def impor(baris_karyawan=(), baris_cabang=(), simpan=True):
+    galat = []  # (jenis, nomor baris, pesan)
+
+    # 1. Satu lookup per tabel untuk semua kode yang disebut di kedua file
+    kode_cabang = {b.get('kode_cabang') for _, b in baris_cabang} | {b.get('cabang_tugas') for _, b in baris_karyawan}
+    nama_cabang = {b.get('nama_cabang') for _, b in baris_cabang}
+    id_disebut = {b.get('id_staff') for _, b in baris_karyawan} | {b.get('kepala_cabang') for _, b in baris_cabang}
+    cabang_ada = set(Cabang.objects.filter(kode_cabang__in=kode_cabang - {'', None}).values_list('pk', flat=True))
+    nama_cabang_ada = set(Cabang.objects.filter(nama_cabang__in=nama_cabang - {'', None}).values_list('nama_cabang', flat=True))
+    departemen_ada = set(Departemen.objects.filter(
+        kode_departemen__in={b.get('departemen') for _, b in baris_karyawan} - {'', None}
+    ).values_list('pk', flat=True))
+    # id_staff -> (peran, status), dipakai juga untuk cek kepala cabang
+    karyawan_ada = {
+        pk: (peran, status)
+        for pk, peran, status in Karyawan.objects.filter(
+            id_staff__in=id_disebut - {'', None}
+        ).values_list('pk', 'peran', 'status')
+    }
+
+    # 2. Validasi cabang (tanpa kepala dulu)
+    cabang_baru = {}  # kode -> (no, Cabang, id kepala)
+    for no, b in baris_cabang:
+        try:
+            kosong = [k for k in WAJIB_CABANG if not b.get(k)]
+            if kosong:
+                raise ValueError(f"kolom wajib kosong: {', '.join(sorted(kosong))}")
+            kode = b['kode_cabang']
+            if kode in cabang_ada or kode in cabang_baru:
+                raise ValueError(f"kode cabang {kode} sudah ada")
+            if b['nama_cabang'] in nama_cabang_ada:
+                raise ValueError(f"nama cabang {b['nama_cabang']} sudah dipakai")
+            cabang = Cabang(kode_cabang=kode, nama_cabang=b['nama_cabang'])
+            cabang.clean_fields(exclude=['kepala_cabang'])
+            cabang_baru[kode] = (no, cabang, b.get('kepala_cabang') or None)
+            nama_cabang_ada.add(cabang.nama_cabang)
+        except (ValueError, ValidationError) as e:
+            galat.append(('cabang', no, _pesan(e)))
+
+    # 3. Validasi karyawan (cabang tugas boleh cabang baru dari file cabang)
+    karyawan_baru = []  # (no, Karyawan)
+    id_manual = {}  # id_staff -> Karyawan baru
+    for no, b in baris_karyawan:
+        try:
+            kosong = [k for k in WAJIB_KARYAWAN if not b.get(k)]
+            if kosong:
+                raise ValueError(f"kolom wajib kosong: {', '.join(sorted(kosong))}")
+            id_staff = b.get('id_staff') or ''
+            if id_staff and (id_staff in karyawan_ada or id_staff in id_manual):
+                raise ValueError(f"ID staff {id_staff} sudah ada")
+            departemen = b.get('departemen') or None
+            if departemen and departemen not in departemen_ada:
+                raise ValueError(f"departemen {departemen} tidak ditemukan")
+            cabang_tugas = b.get('cabang_tugas') or None
+            if cabang_tugas and cabang_tugas not in cabang_ada and cabang_tugas not in cabang_baru:
+                raise ValueError(f"cabang {cabang_tugas} tidak ditemukan")
+            karyawan = Karyawan(
+                id_staff=id_staff,
+                nama_lengkap=b['nama_lengkap'],
+                nomor_hp=b['nomor_hp'],
+                nomor_hp_normal=normalisasi_hp(b['nomor_hp']),
+                departemen_id=departemen,
+                jabatan=b['jabatan'],
+                peran=peran_dari_jabatan(b['jabatan']),  # bulk_create tidak lewat save()
+                bisa_mitra=bisa_mitra_dari_jabatan(b['jabatan']),
+                tanggal_masuk=_tanggal(b['tanggal_masuk']),
+                status=(b.get('status') or 'AKTIF').upper(),
+                cabang_tugas_id=cabang_tugas,
+            )
+            karyawan.clean_fields(exclude=['user', 'departemen', 'cabang_tugas'])
+            if id_staff:
+                id_manual[id_staff] = karyawan
+            karyawan_baru.append((no, karyawan))
+        except (ValueError, ValidationError) as e:
+            galat.append(('karyawan', no, _pesan(e)))
+
+    # 4. Kepala cabang harus karyawan lama atau karyawan baru ber-ID manual, dengan
+    #    peran Kepala Cabang dan status AKTIF (sama dengan pilihan di form admin).
+    #    Cabang yang gagal ikut menggugurkan karyawan yang bertugas di sana, dan
+    #    sebaliknya, sampai tidak ada lagi yang berubah.
+    berubah = True
+    while berubah:
+        berubah = False
+        for kode, (no, cabang, kepala) in list(cabang_baru.items()):
+            if not kepala:
+                continue
+            if kepala in karyawan_ada:
+                peran, status = karyawan_ada[kepala]
+            elif kepala in id_manual:
+                peran, status = id_manual[kepala].peran, id_manual[kepala].status
+            else:
+                galat.append(('cabang', no, f"kepala cabang {kepala} tidak ditemukan"))
+                del cabang_baru[kode]
+                berubah = True
+                continue
+            if peran != KEPALA_CABANG or status != 'AKTIF':
+                galat.append(('cabang', no, f"kepala cabang {kepala} bukan Kepala Cabang aktif"))
+                del cabang_baru[kode]
+                berubah = True
+        sisa = []
+        for no, karyawan in karyawan_baru:
+            if karyawan.cabang_tugas_id and karyawan.cabang_tugas_id not in cabang_ada \
+                    and karyawan.cabang_tugas_id not in cabang_baru:
+                galat.append(('karyawan', no, f"cabang {karyawan.cabang_tugas_id} gagal diimpor"))
+                id_manual.pop(karyawan.id_staff, None)
+                berubah = True
+            else:
+                sisa.append((no, karyawan))
+        karyawan_baru = sisa
+
+    hasil = {
+        'cabang': len(cabang_baru),
+        'karyawan': len(karyawan_baru),
+        'galat': sorted(galat, key=lambda g: (g[0], g[1])),
+    }
+    if not simpan:
+        return hasil
+
+    # 5. Simpan: cabang (tanpa kepala) -> karyawan -> isi kepala cabang
+    with transaction.atomic():
+        Cabang.objects.bulk_create([c for _, c, _ in cabang_baru.values()], batch_size=UKURAN_BATCH)
+        daftar = isi_id_staff([k for _, k in karyawan_baru])
+        Karyawan.objects.bulk_create(daftar, batch_size=UKURAN_BATCH)
+        dengan_kepala = []
+        for _, cabang, kepala in cabang_baru.values():
+            if kepala:
+                cabang.kepala_cabang_id = kepala
+                dengan_kepala.append(cabang)
+        Cabang.objects.bulk_update(dengan_kepala, ['kepala_cabang'], batch_size=UKURAN_BATCH)
+        invalidasi_akses()  # bulk_create/bulk_update tidak memicu signal
+    return hasil
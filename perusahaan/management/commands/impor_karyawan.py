@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from perusahaan.impor import KOLOM_CABANG, KOLOM_KARYAWAN, baca_csv, impor
+
+
+class Command(BaseCommand):
+    help = "Impor karyawan dan/atau cabang dari CSV. Baris yang salah dilaporkan, baris lain tetap disimpan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--karyawan', help=f"CSV karyawan, kolom: {', '.join(KOLOM_KARYAWAN)}.")
+        parser.add_argument('--cabang', help=f"CSV cabang, kolom: {', '.join(KOLOM_CABANG)}.")
+        parser.add_argument('--cek', action='store_true', help="Hanya validasi, jangan simpan.")
+
+    def handle(self, *args, **options):
+        if not options['karyawan'] and not options['cabang']:
+            raise CommandError("Isi --karyawan dan/atau --cabang.")
+        try:
+            baris_karyawan = baca_csv(options['karyawan']) if options['karyawan'] else []
+            baris_cabang = baca_csv(options['cabang']) if options['cabang'] else []
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f"Gagal membaca CSV: {e}")
+
+        mulai = time.perf_counter()
+        hasil = impor(baris_karyawan, baris_cabang, simpan=not options['cek'])
+        durasi = time.perf_counter() - mulai
+
+        for jenis, no, pesan in hasil['galat']:
+            self.stderr.write(f"{jenis} baris {no}: {pesan}")
+        aksi = "lolos validasi" if options['cek'] else "disimpan"
+        self.stdout.write(self.style.SUCCESS(
+            f"{hasil['cabang']} cabang dan {hasil['karyawan']} karyawan {aksi}, "
+            f"{len(hasil['galat'])} baris salah ({durasi:.2f} detik)."
+        ))
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:51
+
+from django.db import migrations, models
+
+
+def isi_urutan_id_staff(apps, schema_editor):
+    # Counter mulai dari nomor DSxxxx tertinggi yang sudah ada
+    Karyawan = apps.get_model('perusahaan', 'Karyawan')
+    UrutanNomor = apps.get_model('perusahaan', 'UrutanNomor')
+    tertinggi = 0
+    for id_staff in Karyawan.objects.filter(id_staff__startswith='DS').values_list('id_staff', flat=True).iterator():
+        if id_staff[2:].isdigit():
+            tertinggi = max(tertinggi, int(id_staff[2:]))
+    UrutanNomor.objects.update_or_create(nama='id_staff', defaults={'nilai': tertinggi})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perusahaan', '0003_remove_karyawan_alamat_alter_karyawan_nomor_hp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UrutanNomor',
+            fields=[
+                ('nama', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('nilai', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Urutan Nomor',
+            },
+        ),
+        migrations.RunPython(isi_urutan_id_staff, migrations.RunPython.noop),
+    ]
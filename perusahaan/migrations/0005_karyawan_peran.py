@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def isi_peran(apps, schema_editor):
+    # Klasifikasi jabatan lama sekali jalan, per nilai jabatan yang berbeda
+    # (aturan sama dengan perusahaan/peran.py saat migrasi ini dibuat)
+    import re
+    Karyawan = apps.get_model('perusahaan', 'Karyawan')
+    for jabatan in list(Karyawan.objects.values_list('jabatan', flat=True).distinct()):
+        teks = re.sub(r'[\s.]+', ' ', (jabatan or '').lower())
+        if 'kepala cabang' in teks or 'ka cabang' in teks or 'kacab' in teks:
+            peran = 'KACAB'
+        elif 'mitra' in teks:
+            peran = 'MITRA'
+        else:
+            continue
+        Karyawan.objects.filter(jabatan=jabatan).update(peran=peran)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perusahaan', '0004_urutannomor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='karyawan',
+            name='peran',
+            field=models.CharField(choices=[('MITRA', 'Mitra'), ('KACAB', 'Kepala Cabang'), ('LAINNYA', 'Lainnya')], default='LAINNYA', editable=False, max_length=10),
+        ),
+        migrations.RunPython(isi_peran, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cabang',
+            name='kepala_cabang',
+            field=models.ForeignKey(blank=True, limit_choices_to={'peran': 'KACAB'}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cabang_dipimpin', to='perusahaan.karyawan'),
+        ),
+        migrations.AddIndex(
+            model_name='karyawan',
+            index=models.Index(fields=['peran', 'status', 'cabang_tugas'], name='karyawan_peran_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:02
+
+import re
+
+from django.db import migrations, models
+
+# Index GIN pg_trgm untuk pencarian admin (perusahaan/cari.py). Ekspresi UPPER(...)
+# sama persis dengan SQL `icontains`/`istartswith` Django di Postgres, jadi index terpakai.
+INDEX_TRIGRAM = [
+    ('karyawan_nama_trgm', 'perusahaan_karyawan', 'UPPER("nama_lengkap"::text) gin_trgm_ops'),
+    ('karyawan_id_staff_trgm', 'perusahaan_karyawan', 'UPPER("id_staff"::text) gin_trgm_ops'),
+    ('karyawan_hp_normal_trgm', 'perusahaan_karyawan', '"nomor_hp_normal" gin_trgm_ops'),
+    ('cabang_nama_trgm', 'perusahaan_cabang', 'UPPER("nama_cabang"::text) gin_trgm_ops'),
+    ('cabang_kode_trgm', 'perusahaan_cabang', 'UPPER("kode_cabang"::text) gin_trgm_ops'),
+]
+
+
+def isi_nomor_hp_normal(apps, schema_editor):
+    # Sama dengan perusahaan.cari.normalisasi_hp saat migrasi ini dibuat
+    Karyawan = apps.get_model('perusahaan', 'Karyawan')
+    ubah = []
+    for karyawan in Karyawan.objects.only('id_staff', 'nomor_hp').iterator():
+        digit = re.sub(r'\D', '', karyawan.nomor_hp or '')
+        if digit.startswith('0'):
+            digit = '62' + digit[1:]
+        elif digit.startswith('8'):
+            digit = '62' + digit
+        karyawan.nomor_hp_normal = digit
+        ubah.append(karyawan)
+    Karyawan.objects.bulk_update(ubah, ['nomor_hp_normal'], batch_size=500)
+
+
+def buat_index_trigram(apps, schema_editor):
+    # Hanya Postgres; SQLite (test) tetap pakai pencarian biasa
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nama, tabel, ekspresi in INDEX_TRIGRAM:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{nama}" ON "{tabel}" USING gin ({ekspresi})')
+
+
+def hapus_index_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nama, _, _ in INDEX_TRIGRAM:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{nama}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perusahaan', '0005_karyawan_peran'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='karyawan',
+            name='nomor_hp_normal',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(isi_nomor_hp_normal, migrations.RunPython.noop),
+        migrations.RunPython(buat_index_trigram, hapus_index_trigram),
+    ]
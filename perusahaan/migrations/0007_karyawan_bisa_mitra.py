@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def isi_bisa_mitra(apps, schema_editor):
+    # Jabatan rangkap ("Kepala Cabang / Mitra") tetap bisa dipilih sebagai mitra
+    # seperti sebelum 0005 (aturan sama dengan perusahaan/peran.py saat migrasi ini dibuat)
+    import re
+    Karyawan = apps.get_model('perusahaan', 'Karyawan')
+    for jabatan in list(Karyawan.objects.values_list('jabatan', flat=True).distinct()):
+        if 'mitra' in re.sub(r'[\s.]+', ' ', (jabatan or '').lower()):
+            Karyawan.objects.filter(jabatan=jabatan).update(bisa_mitra=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perusahaan', '0006_karyawan_nomor_hp_normal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='karyawan',
+            name='bisa_mitra',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(isi_bisa_mitra, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='karyawan',
+            index=models.Index(fields=['bisa_mitra', 'status', 'cabang_tugas'], name='karyawan_mitra_idx'),
+        ),
+    ]
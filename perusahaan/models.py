@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from .cari import normalisasi_hp
+from .peran import KEPALA_CABANG, LAINNYA, PERAN_PILIHAN, bisa_mitra_dari_jabatan, peran_dari_jabatan
 
 class Departemen(models.Model):
     kode_departemen = models.CharField(max_length=10, primary_key=True) # pk
@@ -25,19 +27,26 @@ class Karyawan(models.Model):
                                 help_text="ID Staff otomatis dibuatkan oleh sistem.")
     nama_lengkap = models.CharField(max_length=255)
     nomor_hp = models.CharField(max_length=15, unique=False)
+    # Nomor HP format 62xxx (perusahaan/cari.py), supaya 0812... dan +62812... sama-sama ketemu
+    nomor_hp_normal = models.CharField(max_length=20, blank=True, editable=False)
     departemen = models.ForeignKey(Departemen, on_delete=models.SET_NULL, null=True) # on delete penting banget
     jabatan = models.CharField(max_length=100)
+    # Diisi otomatis dari jabatan (perusahaan/peran.py), dipakai semua filter mitra/kacab
+    peran = models.CharField(max_length=10, choices=PERAN_PILIHAN, default=LAINNYA, editable=False)
+    # Boleh dipilih sebagai mitra (jabatan memuat "mitra", termasuk kacab rangkap mitra)
+    bisa_mitra = models.BooleanField(default=False, editable=False)
     tanggal_masuk = models.DateField()
     status = models.CharField(max_length=10, choices=STATUS_PILIHAN, default='AKTIF')
     cabang_tugas = models.ForeignKey('Cabang', on_delete=models.SET_NULL, null=True, blank=True, related_name='staff_cabang')
 
     def save(self, *args, **kwargs):
+        self.peran = peran_dari_jabatan(self.jabatan)
+        self.bisa_mitra = bisa_mitra_dari_jabatan(self.jabatan)
+        self.nomor_hp_normal = normalisasi_hp(self.nomor_hp)
         if not self.id_staff:
-            # Menggunakan count() sebagai basis nomor urut
-            nomor_baru = Karyawan.objects.count() + 1
-            while Karyawan.objects.filter(id_staff=f'DS{nomor_baru:04d}').exists():
-                nomor_baru += 1
-            self.id_staff = f'DS{nomor_baru:04d}'
+            # Nomor urut diambil dari counter UrutanNomor (perusahaan/urutan.py)
+            from .urutan import alokasi_id_staff
+            self.id_staff = alokasi_id_staff()[0]
         super(Karyawan, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -45,6 +54,22 @@ class Karyawan(models.Model):
     
     class Meta:
         verbose_name_plural = "Karyawan"
+        indexes = [
+            # pilihan mitra: peran + aktif + cabang tugas
+            models.Index(fields=['peran', 'status', 'cabang_tugas'], name='karyawan_peran_idx'),
+            models.Index(fields=['bisa_mitra', 'status', 'cabang_tugas'], name='karyawan_mitra_idx'),
+        ]
+
+class UrutanNomor(models.Model):
+    # Counter nomor urut (mis. ID Staff), dinaikkan dengan row lock supaya aman dipakai bersamaan
+    nama = models.CharField(max_length=50, primary_key=True)
+    nilai = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nama}: {self.nilai}"
+
+    class Meta:
+        verbose_name_plural = "Urutan Nomor"
 
 class Cabang(models.Model):
     kode_cabang = models.CharField(max_length=10, primary_key=True) # pk
@@ -55,7 +80,7 @@ class Cabang(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        limit_choices_to={'jabatan__icontains': 'kepala cabang'},
+        limit_choices_to={'peran': KEPALA_CABANG},
         related_name='cabang_dipimpin'
     )
 
@@ -0,0 +1,62 @@
+import re
+from django.core.cache import cache
+from django.db.models import Q
+from .akses import versi_akses
+
+# Peran karyawan diturunkan dari teks bebas `jabatan` saat disimpan (Karyawan.save,
+# impor CSV). Filter cukup `peran='MITRA'` yang dilayani index, bukan
+# `jabatan__icontains` yang selalu scan seluruh tabel.
+# Jabatan rangkap ("Kepala Cabang / Mitra") berperan KACAB tapi tetap boleh dipilih
+# sebagai mitra: kelayakan mitra disimpan terpisah di flag `bisa_mitra`.
+MITRA = 'MITRA'
+KEPALA_CABANG = 'KACAB'
+LAINNYA = 'LAINNYA'
+PERAN_PILIHAN = [
+    (MITRA, 'Mitra'),
+    (KEPALA_CABANG, 'Kepala Cabang'),
+    (LAINNYA, 'Lainnya'),
+]
+
+WAKTU_CACHE = 600  # detik
+
+
+def _teks(jabatan):
+    return re.sub(r'[\s.]+', ' ', (jabatan or '').lower())
+
+
+def peran_dari_jabatan(jabatan):
+    # "Kepala  Cabang", "Ka. Cabang", "KACAB Sleman" -> KACAB; "Mitra Jualan" -> MITRA
+    teks = _teks(jabatan)
+    if 'kepala cabang' in teks or 'ka cabang' in teks or 'kacab' in teks:
+        return KEPALA_CABANG
+    if 'mitra' in teks:
+        return MITRA
+    return LAINNYA
+
+
+def bisa_mitra_dari_jabatan(jabatan):
+    # Sama dengan aturan lama `jabatan__icontains='mitra'`, termasuk jabatan rangkap
+    return 'mitra' in _teks(jabatan)
+
+
+def anggota_peran():
+    # {peran: frozenset id_staff} untuk cek cepat di form, ikut versi akses
+    # (berganti setiap data Karyawan berubah, lihat perusahaan/signals.py).
+    # MITRA berisi semua yang bisa_mitra, termasuk kacab dengan jabatan rangkap.
+    kunci = f"perusahaan:peran:{versi_akses()}"
+    hasil = cache.get(kunci)
+    if hasil is None:
+        from .models import Karyawan
+
+        hasil = {MITRA: set(), KEPALA_CABANG: set()}
+        qs = Karyawan.objects.filter(Q(peran=KEPALA_CABANG) | Q(bisa_mitra=True)).values_list(
+            'id_staff', 'peran', 'bisa_mitra',
+        )
+        for id_staff, peran, bisa_mitra in qs.iterator():
+            if peran == KEPALA_CABANG:
+                hasil[KEPALA_CABANG].add(id_staff)
+            if bisa_mitra:
+                hasil[MITRA].add(id_staff)
+        hasil = {peran: frozenset(isi) for peran, isi in hasil.items()}
+        cache.set(kunci, hasil, WAKTU_CACHE)
+    return hasil
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .akses import invalidasi_akses
+from .models import Cabang, Karyawan
+
+# Kepala cabang / akun login karyawan berubah: cache akses cabang dibuang
+@receiver([post_save, post_delete], sender=Cabang)
+@receiver([post_save, post_delete], sender=Karyawan)
+def akses_berubah(sender, **kwargs):
+    invalidasi_akses()
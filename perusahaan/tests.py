@@ -1,3 +1,300 @@
-from django.test import TestCase
+import datetime
+import importlib
+import io
+import threading
+from unittest import mock, skipUnless
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from .akses import cabang_diizinkan, cakupan, saring_cabang
+from .cari import cari_cabang, cari_karyawan
+from .impor import baca_csv, impor
+from .models import Cabang, Karyawan, UrutanNomor
+from .peran import KEPALA_CABANG, MITRA, anggota_peran
+from .urutan import alokasi_id_staff, isi_id_staff
 
-# Create your tests here.
+def karyawan_baru(**kwargs):
+    data = {'nama_lengkap': 'Mitra', 'nomor_hp': '0812', 'jabatan': 'Mitra', 'tanggal_masuk': datetime.date(2026, 1, 1)}
+    data.update(kwargs)
+    return Karyawan(**data)
+
+
+class AlokasiIdStaffTest(TestCase):
+    def test_format_dan_urutan(self):
+        a = karyawan_baru()
+        a.save()
+        b = karyawan_baru()
+        b.save()
+        self.assertEqual([a.id_staff, b.id_staff], ['DS0001', 'DS0002'])
+
+    def test_lewati_id_manual_dan_tidak_pakai_ulang(self):
+        karyawan_baru(id_staff='DS0002').save()
+        self.assertEqual(alokasi_id_staff(3), ['DS0001', 'DS0003', 'DS0004'])
+        Karyawan.objects.filter(id_staff='DS0002').delete()
+        self.assertEqual(alokasi_id_staff(), ['DS0005'])
+
+    def test_blok_untuk_bulk_create(self):
+        daftar = isi_id_staff([karyawan_baru(nama_lengkap=f'M{i}') for i in range(5)])
+        Karyawan.objects.bulk_create(daftar)
+        self.assertEqual(sorted(Karyawan.objects.values_list('id_staff', flat=True)),
+                         [f'DS{i:04d}' for i in range(1, 6)])
+        self.assertEqual(UrutanNomor.objects.get(nama='id_staff').nilai, 5)
+
+
+class PeranTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.mitra = karyawan_baru(jabatan='Mitra Jualan')
+        self.rangkap = karyawan_baru(jabatan='Kepala Cabang / Mitra')
+        self.kacab = karyawan_baru(jabatan='Ka. Cabang')
+        for k in (self.mitra, self.rangkap, self.kacab):
+            k.save()
+
+    def test_jabatan_rangkap_tetap_mitra(self):
+        self.assertEqual((self.rangkap.peran, self.rangkap.bisa_mitra), (KEPALA_CABANG, True))
+        self.assertEqual((self.kacab.peran, self.kacab.bisa_mitra), (KEPALA_CABANG, False))
+        self.assertEqual(anggota_peran()[MITRA], {self.mitra.pk, self.rangkap.pk})
+        self.assertEqual(anggota_peran()[KEPALA_CABANG], {self.rangkap.pk, self.kacab.pk})
+
+        from operasional.models import DetailLH
+        pilihan = Karyawan.objects.complex_filter(DetailLH._meta.get_field('mitra').get_limit_choices_to())
+        self.assertEqual(set(pilihan.values_list('pk', flat=True)), {self.mitra.pk, self.rangkap.pk})
+        pilihan = Karyawan.objects.complex_filter(Cabang._meta.get_field('kepala_cabang').get_limit_choices_to())
+        self.assertEqual(set(pilihan.values_list('pk', flat=True)), {self.rangkap.pk, self.kacab.pk})
+
+    def test_migrasi_isi_bisa_mitra(self):
+        # Data lama sebelum 0007: semua bisa_mitra=False
+        Karyawan.objects.update(bisa_mitra=False)
+        migrasi = importlib.import_module('perusahaan.migrations.0007_karyawan_bisa_mitra')
+        migrasi.isi_bisa_mitra(apps, None)
+        self.assertEqual(
+            set(Karyawan.objects.filter(bisa_mitra=True).values_list('pk', flat=True)),
+            {self.mitra.pk, self.rangkap.pk},
+        )
+
+
+class ImporTest(TestCase):
+    KARYAWAN = (
+        "id_staff,nama_lengkap,nomor_hp,departemen,jabatan,tanggal_masuk,status,cabang_tugas\n"
+        "KC0001,Budi,0812-111,,Kepala Cabang,2026-01-05,,SLM\n"
+        ",Sari,0812-222,,Mitra,05/01/2026,,SLM\n"
+        ",Tono,0812-333,,Mitra,2026-01-05,,BTL\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        karyawan_baru(id_staff='DS0100', jabatan='Mitra').save()
+        karyawan_baru(id_staff='DS0101', jabatan='Kepala Cabang', status='RESIGN').save()
+        karyawan_baru(id_staff='DS0102', jabatan='Ka. Cabang').save()
+
+    def csv(self, teks):
+        return baca_csv(io.StringIO(teks))
+
+    def test_sukses(self):
+        cabang = self.csv(
+            "kode_cabang;nama_cabang;kepala_cabang\n"
+            "SLM;Sleman;KC0001\n"
+            "BTL;Bantul;DS0102\n"
+        )
+        hasil = impor(self.csv(self.KARYAWAN), cabang)
+        self.assertEqual(hasil, {'cabang': 2, 'karyawan': 3, 'galat': []})
+        self.assertEqual(Cabang.objects.get(pk='SLM').kepala_cabang_id, 'KC0001')
+        self.assertEqual(Cabang.objects.get(pk='BTL').kepala_cabang_id, 'DS0102')
+        sari = Karyawan.objects.get(nama_lengkap='Sari')
+        self.assertEqual((sari.cabang_tugas_id, sari.peran, sari.nomor_hp_normal), ('SLM', MITRA, '62812222'))
+        self.assertTrue(Karyawan.objects.get(nama_lengkap='Tono').id_staff.startswith('DS'))
+
+    def test_baris_salah_dilaporkan_baris_lain_disimpan(self):
+        cabang = self.csv(
+            "kode_cabang,nama_cabang,kepala_cabang\n"
+            "SLM,Sleman,KC0001\n"
+            "SLM,Sleman Lagi,\n"
+            "BTL,Bantul,DS0100\n"
+            "KLP,Kulon Progo,DS0101\n"
+            "GK,,\n"
+        )
+        hasil = impor(self.csv(self.KARYAWAN), cabang)
+        self.assertEqual(hasil['galat'], [
+            ('cabang', 3, "kode cabang SLM sudah ada"),
+            ('cabang', 4, "kepala cabang DS0100 bukan Kepala Cabang aktif"),
+            ('cabang', 5, "kepala cabang DS0101 bukan Kepala Cabang aktif"),
+            ('cabang', 6, "kolom wajib kosong: nama_cabang"),
+            ('karyawan', 4, "cabang BTL gagal diimpor"),
+        ])
+        self.assertEqual(list(Cabang.objects.values_list('pk', flat=True)), ['SLM'])
+        self.assertEqual(set(Karyawan.objects.filter(cabang_tugas='SLM').values_list('nama_lengkap', flat=True)),
+                         {'Budi', 'Sari'})
+
+    def test_kepala_baru_bukan_kacab(self):
+        karyawan = self.csv(
+            "id_staff,nama_lengkap,nomor_hp,jabatan,tanggal_masuk,status,cabang_tugas\n"
+            "KC0002,Rina,0812-444,Mitra,2026-01-05,,SLM\n"
+            "KC0003,Dodi,0812-555,Kepala Cabang,2026-01-05,cuti,\n"
+        )
+        cabang = self.csv("kode_cabang,nama_cabang,kepala_cabang\nSLM,Sleman,KC0002\nBTL,Bantul,KC0003\n")
+        hasil = impor(karyawan, cabang, simpan=False)
+        self.assertEqual(hasil['galat'], [
+            ('cabang', 2, "kepala cabang KC0002 bukan Kepala Cabang aktif"),
+            ('cabang', 3, "kepala cabang KC0003 bukan Kepala Cabang aktif"),
+            ('karyawan', 2, "cabang SLM gagal diimpor"),
+        ])
+        self.assertEqual((hasil['cabang'], hasil['karyawan']), (0, 1))
+
+    def test_gagal_simpan_batal_semua(self):
+        cabang = self.csv("kode_cabang,nama_cabang,kepala_cabang\nSLM,Sleman,KC0001\nBTL,Bantul,DS0102\n")
+        with mock.patch.object(Cabang.objects, 'bulk_update', side_effect=RuntimeError("putus")):
+            with self.assertRaises(RuntimeError):
+                impor(self.csv(self.KARYAWAN), cabang)
+        self.assertFalse(Cabang.objects.exists())
+        self.assertEqual(Karyawan.objects.count(), 3)
+
+
+class AksesCabangTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('kacab')
+        self.kacab = karyawan_baru(id_staff='DS0500', jabatan='Kepala Cabang', user=self.user)
+        self.kacab.save()
+        Cabang.objects.create(kode_cabang='SLM', nama_cabang='Sleman', kepala_cabang=self.kacab)
+        Cabang.objects.create(kode_cabang='BTL', nama_cabang='Bantul')
+
+    def query_cabang(self, fungsi):
+        with CaptureQueriesContext(connection) as q:
+            hasil = fungsi()
+        return hasil, sum('perusahaan_cabang' in x['sql'] for x in q.captured_queries)
+
+    def test_sekali_per_request(self):
+        hasil, jumlah = self.query_cabang(lambda: cabang_diizinkan(self.user))
+        self.assertEqual((hasil, jumlah), (frozenset({'SLM'}), 1))
+        # Pemanggilan berikutnya di request yang sama memakai memo di objek user
+        with self.assertNumQueries(0):
+            self.assertEqual(cakupan(self.user), 'cabang:SLM')
+            qs = saring_cabang(Cabang.objects.all(), self.user, lookup='pk')
+        self.assertEqual(list(qs.values_list('pk', flat=True)), ['SLM'])
+
+    def test_request_berikutnya_dari_cache(self):
+        cabang_diizinkan(self.user)
+        user = User.objects.get(pk=self.user.pk)  # request baru, objek user baru
+        hasil, jumlah = self.query_cabang(lambda: cabang_diizinkan(user))
+        self.assertEqual((hasil, jumlah), (frozenset({'SLM'}), 0))
+
+    def test_perubahan_cabang_membuang_cache(self):
+        cabang_diizinkan(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            btl = Cabang.objects.get(pk='BTL')
+            btl.kepala_cabang = self.kacab
+            btl.save()
+        # Request yang sedang berjalan tetap konsisten dengan memonya
+        self.assertEqual(cabang_diizinkan(self.user), frozenset({'SLM'}))
+        user = User.objects.get(pk=self.user.pk)
+        hasil, jumlah = self.query_cabang(lambda: cabang_diizinkan(user))
+        self.assertEqual((hasil, jumlah), (frozenset({'SLM', 'BTL'}), 1))
+
+    def test_superuser_semua_cabang(self):
+        admin = User.objects.create_superuser('admin')
+        with self.assertNumQueries(0):
+            self.assertIsNone(cabang_diizinkan(admin))
+            self.assertEqual(cakupan(admin), 'semua')
+        qs = Cabang.objects.all()
+        self.assertIs(saring_cabang(qs, admin), qs)
+
+
+class CariTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.agus = karyawan_baru(id_staff='DS0001', nama_lengkap='Agus Santoso', nomor_hp='0812-3456-7890')
+        self.santoso = karyawan_baru(id_staff='DS0002', nama_lengkap='Santoso Budi', nomor_hp='0857-1111')
+        self.budi = karyawan_baru(id_staff='DS0010', nama_lengkap='Budi Hartono', nomor_hp='0813-2222')
+        for k in (self.agus, self.santoso, self.budi):
+            k.save()
+        Cabang.objects.create(kode_cabang='SLM01', nama_cabang='Sleman Utara', kepala_cabang=self.budi)
+        Cabang.objects.create(kode_cabang='SLM02', nama_cabang='Sleman Selatan', kepala_cabang=self.agus)
+        self.admin = User.objects.create_superuser('admin')
+        self.client.force_login(self.admin)
+
+    def cari(self, teks):
+        return sorted(k.pk for k in cari_karyawan(Karyawan.objects.all(), teks))
+
+    def test_setiap_kata_harus_cocok(self):
+        self.assertEqual(self.cari('budi'), ['DS0002', 'DS0010'])
+        self.assertEqual(self.cari('budi hartono'), ['DS0010'])
+        self.assertEqual(self.cari('hartono santoso'), [])
+        self.assertEqual(self.cari('"santoso budi"'), ['DS0002'])
+        # id_staff dicari di tengah, sama dengan search_fields lama
+        self.assertEqual(self.cari('0010'), ['DS0010'])
+        self.assertEqual(self.cari('agus +62812'), ['DS0001'])
+
+    def test_cabang_per_kata(self):
+        cari = lambda teks: sorted(c.pk for c in cari_cabang(Cabang.objects.all(), teks))
+        self.assertEqual(cari('sleman'), ['SLM01', 'SLM02'])
+        self.assertEqual(cari('sleman hartono'), ['SLM01'])
+        self.assertEqual(cari('lm02 agus'), ['SLM02'])
+        self.assertEqual(cari('utara agus'), [])
+        self.assertEqual(cari('0812-3456'), ['SLM02'])
+
+    def test_urutan_admin(self):
+        url = reverse('admin:perusahaan_karyawan_changelist')
+        # Tanpa `o`: awalan nama (kemiripan) lebih dulu
+        respons = self.client.get(url, {'q': 'santoso'})
+        self.assertEqual([k.pk for k in respons.context['cl'].result_list], ['DS0002', 'DS0001'])
+        # Urutan kolom pilihan user tidak ditimpa kemiripan
+        respons = self.client.get(url, {'q': 'santoso', 'o': '1'})
+        self.assertEqual([k.pk for k in respons.context['cl'].result_list], ['DS0001', 'DS0002'])
+        self.assertNotIn('kemiripan', str(respons.context['cl'].queryset.query))
+
+        url = reverse('admin:perusahaan_cabang_changelist')
+        respons = self.client.get(url, {'q': 'sleman budi', 'o': '-1'})
+        self.assertEqual([c.pk for c in respons.context['cl'].result_list], ['SLM01'])
+
+
+@skipUnless(connection.vendor == 'postgresql', "Butuh pg_trgm (PostgreSQL)")
+class CariTrigramTest(TestCase):
+    def setUp(self):
+        for id_staff, nama in [('DS0001', 'Budi Santoso Wijayakusuma'), ('DS0002', 'Budi Santoso'),
+                               ('DS0003', 'Santoso Budiman'), ('DS0004', 'Budi Hartono')]:
+            karyawan_baru(id_staff=id_staff, nama_lengkap=nama).save()
+
+    def test_urut_kemiripan_per_kata(self):
+        hasil = [k.pk for k in cari_karyawan(Karyawan.objects.all(), 'budi santoso')]
+        self.assertEqual(hasil[0], 'DS0002')
+        self.assertEqual(sorted(hasil), ['DS0001', 'DS0002', 'DS0003'])
+
+    def test_tanpa_urut(self):
+        qs = cari_karyawan(Karyawan.objects.order_by('pk'), 'budi santoso', urut=False)
+        self.assertEqual([k.pk for k in qs], ['DS0001', 'DS0002', 'DS0003'])
+
+
+@skipUnless(connection.vendor == 'postgresql', "Butuh row lock database sungguhan (PostgreSQL)")
+class AlokasiIdStaffBersamaanTest(TransactionTestCase):
+    JUMLAH_THREAD = 8
+    PER_THREAD = 5
+
+    def test_tidak_ada_id_kembar(self):
+        mulai = threading.Barrier(self.JUMLAH_THREAD)
+        galat = []
+
+        def tambah():
+            try:
+                mulai.wait()
+                for _ in range(self.PER_THREAD):
+                    karyawan_baru().save()
+            except Exception as e:
+                galat.append(e)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=tambah) for _ in range(self.JUMLAH_THREAD)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(galat, [])
+        total = self.JUMLAH_THREAD * self.PER_THREAD
+        self.assertEqual(Karyawan.objects.count(), total)
+        self.assertEqual(sorted(Karyawan.objects.values_list('id_staff', flat=True)),
+                         [f'DS{i:04d}' for i in range(1, total + 1)])
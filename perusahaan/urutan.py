@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models import F
+
+# ID Staff (DS0001, DS0002, ...) diambil dari counter UrutanNomor, bukan count().
+# Counter dinaikkan sekaligus sebanyak yang diminta (satu UPDATE yang mengunci baris),
+# jadi dua admin yang menambah karyawan bersamaan tidak bisa dapat nomor yang sama
+# dan onboarding massal cukup sekali jalan untuk N nomor.
+URUTAN_ID_STAFF = 'id_staff'
+PREFIX_ID_STAFF = 'DS'
+
+
+def format_id_staff(nomor):
+    return f'{PREFIX_ID_STAFF}{nomor:04d}'
+
+
+def nomor_id_staff(id_staff):
+    # 'DS0012' -> 12, ID di luar format DSxxxx -> None
+    if id_staff and id_staff.startswith(PREFIX_ID_STAFF) and id_staff[len(PREFIX_ID_STAFF):].isdigit():
+        return int(id_staff[len(PREFIX_ID_STAFF):])
+    return None
+
+
+def _pesan_blok(jumlah):
+    from .models import UrutanNomor
+
+    with transaction.atomic():
+        diperbarui = UrutanNomor.objects.filter(nama=URUTAN_ID_STAFF).update(nilai=F('nilai') + jumlah)
+        if not diperbarui:
+            # Baris counter belum ada (database baru), mulai dari nomor tertinggi yang sudah terpakai
+            UrutanNomor.objects.get_or_create(nama=URUTAN_ID_STAFF, defaults={'nilai': nomor_tertinggi()})
+            UrutanNomor.objects.filter(nama=URUTAN_ID_STAFF).update(nilai=F('nilai') + jumlah)
+        akhir = UrutanNomor.objects.values_list('nilai', flat=True).get(nama=URUTAN_ID_STAFF)
+    return range(akhir - jumlah + 1, akhir + 1)
+
+
+def nomor_tertinggi(karyawan_qs=None):
+    from .models import Karyawan
+
+    if karyawan_qs is None:
+        karyawan_qs = Karyawan.objects.all()
+    ids = karyawan_qs.filter(id_staff__startswith=PREFIX_ID_STAFF).values_list('id_staff', flat=True)
+    return max((n for n in map(nomor_id_staff, ids.iterator()) if n is not None), default=0)
+
+
+def alokasi_id_staff(jumlah=1):
+    from .models import Karyawan
+
+    hasil = []
+    while len(hasil) < jumlah:
+        kandidat = [format_id_staff(n) for n in _pesan_blok(jumlah - len(hasil))]
+        # ID yang pernah diisi manual lewat admin dilewati (satu query untuk satu blok)
+        terpakai = set(Karyawan.objects.filter(id_staff__in=kandidat).values_list('id_staff', flat=True))
+        hasil.extend(k for k in kandidat if k not in terpakai)
+    return hasil
+
+
+def isi_id_staff(daftar_karyawan):
+    # Untuk bulk_create: isi ID semua karyawan yang masih kosong dengan satu blok nomor
+    kosong = [k for k in daftar_karyawan if not k.id_staff]
+    for karyawan, id_staff in zip(kosong, alokasi_id_staff(len(kosong)) if kosong else []):
+        karyawan.id_staff = id_staff
+    return daftar_karyawan
@@ -14,12 +14,23 @@ class TierBonusCabangInline(admin.TabularInline):
 @admin.register(AturanPerusahaan)
 class AturanPerusahaanAdmin(admin.ModelAdmin):
     inlines = [TierBonusMitraInline, TierBonusCabangInline]
+    list_display = ('nama_aturan', 'berlaku_mulai', 'berlaku_sampai', 'harga_per_gram_target')
     
     fieldsets = (
-        ('Info Dasar', {'fields': ('nama_aturan',)}),
+        ('Info Dasar', {'fields': ('nama_aturan', ('berlaku_mulai', 'berlaku_sampai'))}),
         ('Parameter Produksi', {'fields': ('konstanta_adonan_jadi', 'harga_per_gram_target')}),
         ('Skema Gaji', {'fields': ('gaji_pokok_training', 'gaji_pokok_tetap', 'insentif_kehadiran')}),
     )
 
-    def has_add_permission(self, request):
-        return False if AturanPerusahaan.objects.exists() else True
\ No newline at end of file
+    def get_changeform_initial_data(self, request):
+        # Versi baru disalin dari versi yang berlaku sekarang, tinggal ubah yang perlu
+        from .aturan import get_aturan
+        aturan = get_aturan()
+        return {
+            'konstanta_adonan_jadi': aturan['konstanta_adonan'],
+            'harga_per_gram_target': aturan['harga'],
+            'gaji_pokok_training': aturan['gaji_training'],
+            'gaji_pokok_tetap': aturan['gaji_tetap'],
+            'insentif_kehadiran': aturan['insentif_kehadiran'],
+            **super().get_changeform_initial_data(request),
+        }
\ No newline at end of file
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class SistemConfig(AppConfig):
     name = 'sistem'
-    verbose_name = 'SISTEM'
\ No newline at end of file
+    verbose_name = 'SISTEM'
+
+    def ready(self):
+        from . import signals  # noqa: F401 daftarkan invalidasi cache aturan
\ No newline at end of file
@@ -0,0 +1,149 @@
+import datetime
+import time
+import uuid
+from bisect import bisect_right
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+# Snapshot aturan perusahaan disimpan per proses (per worker gunicorn).
+# Antar worker disinkronkan lewat satu kunci versi di cache bersama:
+# tiap kali admin menyimpan aturan, versinya diganti dan worker lain
+# akan memuat ulang saat cek versi berikutnya.
+#
+# Aturan punya masa berlaku (berlaku_mulai/berlaku_sampai). Snapshot-nya berupa
+# linimasa interval yang menutup seluruh rentang tanggal (celah diisi
+# ATURAN_DEFAULT), terurut menurut tanggal mulai, jadi aturan untuk satu tanggal
+# dicari dengan bisect tanpa query.
+KUNCI_VERSI = 'sistem:aturan:versi'
+INTERVAL_CEK = 30  # detik, jeda maksimal sebelum cek versi lagi
+
+ATURAN_DEFAULT = {
+    'harga': 92,
+    'konstanta_adonan': 2.5,
+    'gaji_training': 1800000,
+    'gaji_tetap': 2000000,
+    'insentif_kehadiran': 150000,
+    'tier_mitra': (),
+    'tier_cabang': (),
+}
+
+_lokal = {'versi': None, 'data': None, 'dicek': 0.0}
+
+
+def _isi_aturan(aturan):
+    return {
+        'harga': aturan.harga_per_gram_target,
+        'konstanta_adonan': aturan.konstanta_adonan_jadi,
+        'gaji_training': aturan.gaji_pokok_training,
+        'gaji_tetap': aturan.gaji_pokok_tetap,
+        'insentif_kehadiran': aturan.insentif_kehadiran,
+        # Tier diurutkan dari ambang terkecil supaya gampang dicari
+        'tier_mitra': tuple(sorted(
+            (t.min_omset_harian, t.nominal_bonus_pekanan) for t in aturan.bonus_mitra.all()
+        )),
+        'tier_cabang': tuple(sorted(
+            (t.min_mitra_berangkat, t.nominal_bonus_cabang) for t in aturan.bonus_cabang.all()
+        )),
+    }
+
+
+def _muat_aturan():
+    from .models import AturanPerusahaan
+
+    daftar = sorted(
+        AturanPerusahaan.objects.prefetch_related('bonus_mitra', 'bonus_cabang'),
+        key=lambda a: (a.berlaku_mulai or datetime.date.min, a.pk),
+    )
+    linimasa = []  # (mulai, sampai, data), bersambung dari date.min s/d date.max
+    kursor = datetime.date.min
+    for aturan in daftar:
+        if kursor is None:
+            break  # versi sebelumnya berlaku tanpa batas akhir
+        mulai = max(aturan.berlaku_mulai or datetime.date.min, kursor)
+        sampai = aturan.berlaku_sampai or datetime.date.max
+        if sampai < mulai:
+            continue  # tertutup seluruhnya oleh versi sebelumnya
+        if mulai > kursor:
+            linimasa.append((kursor, mulai - datetime.timedelta(days=1), dict(ATURAN_DEFAULT)))
+        linimasa.append((mulai, sampai, _isi_aturan(aturan)))
+        kursor = sampai + datetime.timedelta(days=1) if sampai < datetime.date.max else None
+    if kursor is not None:
+        linimasa.append((kursor, datetime.date.max, dict(ATURAN_DEFAULT)))
+    return {'mulai': [m for m, _, _ in linimasa], 'linimasa': linimasa}
+
+
+def _versi_bersama():
+    versi = cache.get(KUNCI_VERSI)
+    if versi is None:
+        # Belum ada versi (cache baru/kosong), pasang satu untuk semua worker
+        cache.add(KUNCI_VERSI, uuid.uuid4().hex, None)
+        versi = cache.get(KUNCI_VERSI)
+    return versi
+
+
+def _indeks():
+    sekarang = time.monotonic()
+    if _lokal['data'] is not None and sekarang - _lokal['dicek'] < INTERVAL_CEK:
+        return _lokal['data']
+
+    versi = _versi_bersama()
+    if _lokal['data'] is None or versi != _lokal['versi']:
+        _lokal['data'] = _muat_aturan()
+        _lokal['versi'] = versi
+    _lokal['dicek'] = sekarang
+    return _lokal['data']
+
+
+def _tanggal(nilai):
+    # LHCabang.tanggal default-nya timezone.now, jadi bisa berupa datetime sebelum disimpan
+    if isinstance(nilai, datetime.datetime):
+        return timezone.localtime(nilai).date() if timezone.is_aware(nilai) else nilai.date()
+    return nilai
+
+
+def get_aturan(tanggal=None):
+    # Aturan yang berlaku pada tanggal itu (default: hari ini)
+    indeks = _indeks()
+    tanggal = _tanggal(tanggal or timezone.localdate())
+    return indeks['linimasa'][bisect_right(indeks['mulai'], tanggal) - 1][2]
+
+
+def aturan_per_tanggal(daftar_tanggal):
+    # Banyak tanggal sekaligus: urutkan lalu jalan bersama linimasa (satu lintasan)
+    linimasa = _indeks()['linimasa']
+    hasil, posisi = {}, 0
+    for tanggal in sorted({_tanggal(t) for t in daftar_tanggal}):
+        while linimasa[posisi][1] < tanggal:
+            posisi += 1
+        hasil[tanggal] = linimasa[posisi][2]
+    return hasil
+
+
+def rentang_aturan(dari=None, sampai=None):
+    # Potongan linimasa yang beririsan dengan [dari, sampai]: [(mulai, sampai, aturan)].
+    # Ujung yang tidak dibatasi dikembalikan sebagai None.
+    dari, sampai = dari or datetime.date.min, sampai or datetime.date.max
+    hasil = []
+    for mulai, akhir, aturan in _indeks()['linimasa']:
+        if akhir < dari or mulai > sampai:
+            continue
+        mulai, akhir = max(mulai, dari), min(akhir, sampai)
+        hasil.append((
+            None if mulai == datetime.date.min else mulai,
+            None if akhir == datetime.date.max else akhir,
+            aturan,
+        ))
+    return hasil
+
+
+def invalidasi_aturan():
+    # Worker ini langsung buang snapshot-nya sendiri
+    _lokal['data'] = None
+
+    # Worker lain baru diberi tahu setelah data benar-benar tersimpan
+    def _ganti_versi():
+        cache.set(KUNCI_VERSI, uuid.uuid4().hex, None)
+        _lokal['data'] = None
+
+    transaction.on_commit(_ganti_versi)
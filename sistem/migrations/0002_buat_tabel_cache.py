@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:12
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def buat_tabel_cache(apps, schema_editor):
+    # Tabel untuk DatabaseCache (settings.CACHES), aman dijalankan berulang
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sistem', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(buat_tabel_cache, migrations.RunPython.noop),
+    ]
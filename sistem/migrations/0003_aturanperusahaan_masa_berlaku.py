@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sistem', '0002_buat_tabel_cache'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='aturanperusahaan',
+            options={'ordering': [models.OrderBy(models.F('berlaku_mulai'), nulls_first=True)], 'verbose_name_plural': 'Aturan Perusahaan'},
+        ),
+        migrations.AddField(
+            model_name='aturanperusahaan',
+            name='berlaku_mulai',
+            field=models.DateField(blank=True, help_text='Kosongkan jika berlaku sejak awal.', null=True),
+        ),
+        migrations.AddField(
+            model_name='aturanperusahaan',
+            name='berlaku_sampai',
+            field=models.DateField(blank=True, help_text='Kosongkan jika masih berlaku.', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='aturanperusahaan',
+            constraint=models.CheckConstraint(condition=models.Q(('berlaku_mulai__isnull', True), ('berlaku_sampai__isnull', True), ('berlaku_sampai__gte', models.F('berlaku_mulai')), _connector='OR'), name='aturan_masa_berlaku_valid'),
+        ),
+    ]
@@ -1,8 +1,15 @@
+import datetime
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Q
 
 # Create your models here.
 class AturanPerusahaan(models.Model):
     nama_aturan = models.CharField(max_length=100, default="Konfigurasi Utama")
+
+    # Masa berlaku: kosong = sejak awal / sampai sekarang
+    berlaku_mulai = models.DateField(null=True, blank=True, help_text="Kosongkan jika berlaku sejak awal.")
+    berlaku_sampai = models.DateField(null=True, blank=True, help_text="Kosongkan jika masih berlaku.")
     
     # Produksi
     konstanta_adonan_jadi = models.FloatField(default=2.5)
@@ -15,9 +22,51 @@ class AturanPerusahaan(models.Model):
 
     class Meta:
         verbose_name_plural = verbose_name_plural = "Aturan Perusahaan"
+        ordering = [models.F('berlaku_mulai').asc(nulls_first=True)]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(berlaku_mulai__isnull=True) | Q(berlaku_sampai__isnull=True)
+                | Q(berlaku_sampai__gte=models.F('berlaku_mulai')),
+                name='aturan_masa_berlaku_valid',
+            ),
+        ]
 
     def __str__(self):
-        return self.nama_aturan
+        mulai = self.berlaku_mulai.strftime('%d/%m/%Y') if self.berlaku_mulai else 'awal'
+        sampai = self.berlaku_sampai.strftime('%d/%m/%Y') if self.berlaku_sampai else 'sekarang'
+        return f"{self.nama_aturan} ({mulai} - {sampai})"
+
+    def _versi_terbuka_sebelumnya(self):
+        # Versi tanpa batas akhir yang mulai sebelum versi ini: otomatis ditutup saat disimpan
+        if not self.berlaku_mulai:
+            return AturanPerusahaan.objects.none()
+        return AturanPerusahaan.objects.exclude(pk=self.pk).filter(
+            Q(berlaku_mulai__isnull=True) | Q(berlaku_mulai__lt=self.berlaku_mulai),
+            berlaku_sampai__isnull=True,
+        )
+
+    def clean(self):
+        if self.berlaku_mulai and self.berlaku_sampai and self.berlaku_sampai < self.berlaku_mulai:
+            raise ValidationError({'berlaku_sampai': "Tanggal akhir tidak boleh sebelum tanggal mulai."})
+        # Masa berlaku tidak boleh tumpang tindih dengan versi lain
+        bentrok = AturanPerusahaan.objects.exclude(pk=self.pk).exclude(
+            pk__in=self._versi_terbuka_sebelumnya().values('pk'),
+        )
+        if self.berlaku_sampai:
+            bentrok = bentrok.filter(Q(berlaku_mulai__isnull=True) | Q(berlaku_mulai__lte=self.berlaku_sampai))
+        if self.berlaku_mulai:
+            bentrok = bentrok.filter(Q(berlaku_sampai__isnull=True) | Q(berlaku_sampai__gte=self.berlaku_mulai))
+        bentrok = bentrok.first()
+        if bentrok:
+            raise ValidationError(f"Masa berlaku bertabrakan dengan {bentrok}.")
+
+    def save(self, *args, **kwargs):
+        # Versi baru menutup versi lama yang masih terbuka sehari sebelum mulai berlaku
+        if self.berlaku_mulai:
+            self._versi_terbuka_sebelumnya().update(
+                berlaku_sampai=self.berlaku_mulai - datetime.timedelta(days=1),
+            )
+        super().save(*args, **kwargs)
 
 class TierBonusMitra(models.Model):
     aturan = models.ForeignKey(AturanPerusahaan, on_delete=models.CASCADE, related_name='bonus_mitra')
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .aturan import invalidasi_aturan
+from .models import AturanPerusahaan, TierBonusMitra, TierBonusCabang
+
+# Inline tier disimpan setelah induknya, jadi tier juga perlu memicu invalidasi
+@receiver([post_save, post_delete], sender=AturanPerusahaan)
+@receiver([post_save, post_delete], sender=TierBonusMitra)
+@receiver([post_save, post_delete], sender=TierBonusCabang)
+def aturan_berubah(sender, **kwargs):
+    invalidasi_aturan()
@@ -1,3 +1,118 @@
+import datetime
+from unittest import mock
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.test import TestCase
+from .aturan import (
+    ATURAN_DEFAULT, INTERVAL_CEK, KUNCI_VERSI, aturan_per_tanggal, get_aturan, invalidasi_aturan, rentang_aturan,
+)
+from .models import AturanPerusahaan
 
-# Create your tests here.
+
+class CacheAturanTest(TestCase):
+    # Snapshot aturan per proses, dicek ulang ke versi bersama paling cepat tiap INTERVAL_CEK
+    def setUp(self):
+        self.aturan = AturanPerusahaan.objects.create(harga_per_gram_target=100)
+        invalidasi_aturan()
+        self.addCleanup(invalidasi_aturan)  # snapshot per proses jangan terbawa ke test lain
+        jam = mock.patch('sistem.aturan.time.monotonic', return_value=1000.0)
+        self.jam = jam.start()
+        self.addCleanup(jam.stop)
+
+    def test_dimuat_sekali(self):
+        self.assertEqual(get_aturan()['harga'], 100)
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertEqual(get_aturan(datetime.date(2026, 10, 18))['harga'], 100)
+
+    def test_perubahan_worker_lain_menunggu_interval(self):
+        get_aturan()
+        # Worker lain menyimpan aturan: baris berubah, versi bersama diganti setelah commit
+        AturanPerusahaan.objects.filter(pk=self.aturan.pk).update(harga_per_gram_target=120)
+        cache.set(KUNCI_VERSI, 'versi-lain', None)
+        self.jam.return_value = 1000.0 + INTERVAL_CEK - 1
+        self.assertEqual(get_aturan()['harga'], 100)  # masih snapshot lama
+        self.jam.return_value = 1000.0 + INTERVAL_CEK
+        self.assertEqual(get_aturan()['harga'], 120)
+
+    def test_simpan_di_worker_ini_langsung_berlaku(self):
+        get_aturan()
+        self.aturan.harga_per_gram_target = 130
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aturan.save()
+        self.assertEqual(get_aturan()['harga'], 130)
+        versi = cache.get(KUNCI_VERSI)
+        # Tier juga memicu invalidasi (inline disimpan setelah induknya)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aturan.bonus_mitra.create(min_omset_harian=100000, nominal_bonus_pekanan=50000)
+        self.assertNotEqual(cache.get(KUNCI_VERSI), versi)
+        self.assertEqual(get_aturan()['tier_mitra'], ((100000, 50000),))
+
+
+class VersiAturanTest(TestCase):
+    # Aturan bermasa berlaku: dicari per tanggal dari linimasa di memori
+    def setUp(self):
+        invalidasi_aturan()
+        self.addCleanup(invalidasi_aturan)
+
+    def buat(self, harga, mulai=None, sampai=None):
+        aturan = AturanPerusahaan(harga_per_gram_target=harga, berlaku_mulai=mulai, berlaku_sampai=sampai)
+        aturan.full_clean()
+        with self.captureOnCommitCallbacks(execute=True):
+            aturan.save()
+        return aturan
+
+    def test_versi_baru_menutup_versi_lama(self):
+        lama = self.buat(90)
+        self.buat(95, mulai=datetime.date(2026, 10, 1))
+        lama.refresh_from_db()
+        self.assertEqual(lama.berlaku_sampai, datetime.date(2026, 9, 30))
+        get_aturan()  # muat linimasa sekali, pencarian berikutnya tanpa query
+        with self.assertNumQueries(0):
+            self.assertEqual(get_aturan(datetime.date(2020, 1, 1))['harga'], 90)
+            self.assertEqual(get_aturan(datetime.date(2026, 9, 30))['harga'], 90)
+            self.assertEqual(get_aturan(datetime.date(2026, 10, 1))['harga'], 95)
+            self.assertEqual(get_aturan(datetime.date(2030, 1, 1))['harga'], 95)
+        hasil = aturan_per_tanggal([datetime.date(2026, 10, 5), datetime.date(2026, 9, 1)])
+        self.assertEqual({t: a['harga'] for t, a in hasil.items()},
+                         {datetime.date(2026, 9, 1): 90, datetime.date(2026, 10, 5): 95})
+        self.assertEqual(
+            [(m, s, a['harga']) for m, s, a in rentang_aturan(datetime.date(2026, 9, 1), None)],
+            [(datetime.date(2026, 9, 1), datetime.date(2026, 9, 30), 90), (datetime.date(2026, 10, 1), None, 95)],
+        )
+
+    def test_celah_pakai_default(self):
+        self.buat(100, mulai=datetime.date(2026, 6, 1), sampai=datetime.date(2026, 6, 30))
+        self.assertEqual(get_aturan(datetime.date(2026, 5, 31)), ATURAN_DEFAULT)
+        self.assertEqual(get_aturan(datetime.date(2026, 6, 15))['harga'], 100)
+        self.assertEqual(get_aturan(datetime.date(2026, 7, 1)), ATURAN_DEFAULT)
+
+    def test_tumpang_tindih_ditolak(self):
+        self.buat(100, mulai=datetime.date(2026, 6, 1), sampai=datetime.date(2026, 6, 30))
+        for mulai, sampai in [(datetime.date(2026, 6, 15), datetime.date(2026, 7, 10)),
+                              (None, datetime.date(2026, 6, 1)),
+                              (datetime.date(2026, 5, 1), None)]:
+            with self.assertRaises(ValidationError):
+                AturanPerusahaan(berlaku_mulai=mulai, berlaku_sampai=sampai).full_clean()
+        with self.assertRaises(ValidationError):
+            AturanPerusahaan(berlaku_mulai=datetime.date(2026, 7, 2), berlaku_sampai=datetime.date(2026, 7, 1)).full_clean()
+        # Bersambung tanpa irisan boleh
+        AturanPerusahaan(berlaku_mulai=datetime.date(2026, 7, 1)).full_clean()
+
+    def test_laporan_lama_pakai_harga_lama(self):
+        from django.contrib.auth.models import User
+        from operasional.models import DetailLH, LHCabang
+        from perusahaan.models import Cabang, Karyawan
+
+        self.buat(90)
+        self.buat(100, mulai=datetime.date(2026, 10, 1))
+        admin = User.objects.create_superuser('admin')
+        cabang = Cabang.objects.create(kode_cabang='C1', nama_cabang='Cabang 1')
+        mitra = Karyawan.objects.create(nama_lengkap='Mitra', nomor_hp='0812', jabatan='Mitra',
+                                        tanggal_masuk=datetime.date(2026, 1, 1))
+        target = {}
+        for tanggal in (datetime.date(2026, 9, 30), datetime.date(2026, 10, 1)):
+            laporan = LHCabang.objects.create(cabang=cabang, tanggal=tanggal, dibuat_oleh=admin)
+            detail = DetailLH.objects.create(laporan_induk=laporan, mitra=mitra, adonan_bawa_gr=1000)
+            target[tanggal] = detail.target_minimal_rp
+        self.assertEqual(target, {datetime.date(2026, 9, 30): 90000, datetime.date(2026, 10, 1): 100000})